@@ -0,0 +1,63 @@
+from datetime import date, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import Session
+
+from app.models import AttendanceRollup, Student
+
+# Dashboards read the (day, hour, status) rollup, so their cost grows with the number of
+# days covered rather than the number of scans
+
+
+def overview(db: Session, today: date) -> Dict[str, int]:
+    """Student total plus successful check-ins today / this week / this month, in one query"""
+    day = AttendanceRollup.day
+    week_start = today - timedelta(days=today.weekday())
+    month_start = today.replace(day=1)
+
+    def total(condition):
+        return func.coalesce(func.sum(case((condition, AttendanceRollup.count), else_=0)), 0)
+
+    row = db.execute(
+        select(
+            select(func.count(Student.id)).scalar_subquery(),
+            total(day == today),
+            total(day >= week_start),
+            total(day >= month_start),
+        ).where(AttendanceRollup.status == "success", day >= min(week_start, month_start))
+    ).one()
+    return {
+        "total_students": row[0] or 0,
+        "attendance_today": int(row[1]),
+        "attendance_week": int(row[2]),
+        "attendance_month": int(row[3]),
+    }
+
+
+def daily_counts(db: Session, start: date, end: date, status: str = "success") -> Dict[date, int]:
+    """Check-ins per calendar day for start..end (inclusive); days without rows are omitted"""
+    rows = db.execute(
+        select(AttendanceRollup.day, func.sum(AttendanceRollup.count))
+        .where(AttendanceRollup.status == status, AttendanceRollup.day >= start, AttendanceRollup.day <= end)
+        .group_by(AttendanceRollup.day)
+    ).all()
+    return {day: int(count) for day, count in rows}
+
+
+def hourly_counts(db: Session, start: Optional[date] = None, end: Optional[date] = None,
+                  status: str = "success") -> List[int]:
+    """Check-ins per hour of day (0-23), optionally limited to start..end (inclusive)"""
+    stmt = (
+        select(AttendanceRollup.hour, func.sum(AttendanceRollup.count))
+        .where(AttendanceRollup.status == status)
+        .group_by(AttendanceRollup.hour)
+    )
+    if start:
+        stmt = stmt.where(AttendanceRollup.day >= start)
+    if end:
+        stmt = stmt.where(AttendanceRollup.day <= end)
+    counts = [0] * 24
+    for hour, count in db.execute(stmt).all():
+        counts[hour] = int(count)
+    return counts
@@ -0,0 +1,413 @@
+import os
+import time
+import tempfile
+import threading
+import numpy as np
+from typing import Dict, Optional, Tuple
+
+from app.database import SQLALCHEMY_DATABASE_URL
+from app.gallery_snapshot import database_key, snapshot_root
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return (matrix / (norms + 1e-7)).astype(np.float32)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indices of the k largest scores, best first"""
+    if k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    top = np.argpartition(-scores, k - 1)[:k]
+    return top[np.argsort(-scores[top], kind="stable")]
+
+
+class IVFIndex:
+    """
+    Inverted-file index for cosine similarity over unit vectors.
+    Vectors are clustered around spherical k-means centroids; a query only scans the
+    lists of its `n_probe` closest centroids.
+    """
+
+    def __init__(self, n_lists: Optional[int] = None, n_probe: int = 8,
+                 train_iterations: int = 15, max_train_points: int = 50000, seed: int = 0):
+        self.n_lists = n_lists
+        self.n_probe = n_probe
+        self.train_iterations = train_iterations
+        self.max_train_points = max_train_points
+        self.seed = seed
+
+        self.centroids = np.empty((0, 0), dtype=np.float32)
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.ids = np.empty(0, dtype=np.int64)
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.trained_size = 0
+
+        # Vectors grouped by list: order[offsets[l]:offsets[l + 1]] are the rows of list l
+        self._order = np.empty(0, dtype=np.int64)
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._dirty = False
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1] if self.vectors.ndim == 2 else 0
+
+    def _train(self, vectors: np.ndarray) -> np.ndarray:
+        """Spherical k-means on (a sample of) the vectors"""
+        rng = np.random.default_rng(self.seed)
+        n_lists = self.n_lists or int(np.clip(4 * np.sqrt(len(vectors)), 1, 4096))
+        n_lists = min(n_lists, len(vectors))
+
+        sample = vectors
+        if len(vectors) > self.max_train_points:
+            sample = vectors[rng.choice(len(vectors), self.max_train_points, replace=False)]
+
+        centroids = sample[rng.choice(len(sample), n_lists, replace=False)].copy()
+        for _ in range(self.train_iterations):
+            labels = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, labels, sample)
+            counts = np.bincount(labels, minlength=n_lists)
+
+            # Re-seed empty lists with random points so every centroid stays useful
+            empty = counts == 0
+            if empty.any():
+                sums[empty] = sample[rng.choice(len(sample), int(empty.sum()))]
+            centroids = _unit_rows(sums)
+        return centroids
+
+    def _assign(self, vectors: np.ndarray) -> np.ndarray:
+        return np.argmax(vectors @ self.centroids.T, axis=1).astype(np.int32)
+
+    def _regroup(self):
+        self._order = np.argsort(self.assignments, kind="stable")
+        counts = np.bincount(self.assignments, minlength=len(self.centroids))
+        self._offsets = np.concatenate(([0], np.cumsum(counts)))
+        self._dirty = False
+
+    def build(self, vectors: np.ndarray, ids: np.ndarray):
+        """Train centroids and index every vector from scratch"""
+        vectors = _unit_rows(np.asarray(vectors, dtype=np.float32))
+        self.vectors = vectors
+        self.ids = np.asarray(ids, dtype=np.int64)
+        if len(vectors) == 0:
+            self.centroids = np.empty((0, vectors.shape[1]), dtype=np.float32)
+            self.assignments = np.empty(0, dtype=np.int32)
+        else:
+            self.centroids = self._train(vectors)
+            self.assignments = self._assign(vectors)
+        self.trained_size = len(vectors)
+        self._regroup()
+
+    def add(self, vectors: np.ndarray, ids: np.ndarray):
+        """Index new vectors against the existing centroids"""
+        vectors = _unit_rows(np.atleast_2d(np.asarray(vectors, dtype=np.float32)))
+        if len(self.centroids) == 0:
+            self.build(vectors, ids)
+            return
+        self.vectors = np.vstack([self.vectors, vectors])
+        self.ids = np.concatenate([self.ids, np.asarray(ids, dtype=np.int64)])
+        self.assignments = np.concatenate([self.assignments, self._assign(vectors)])
+        self._dirty = True
+
+    def remove(self, ids: np.ndarray):
+        """Drop vectors by id (they can be added again with new values)"""
+        keep = ~np.isin(self.ids, np.asarray(ids, dtype=np.int64))
+        if keep.all():
+            return
+        self.vectors = self.vectors[keep]
+        self.ids = self.ids[keep]
+        self.assignments = self.assignments[keep]
+        self._dirty = True
+
+    def copy(self) -> "IVFIndex":
+        """
+        Shallow copy. Arrays are replaced, never modified in place, so the copy is a
+        consistent view that can be saved or searched while the original keeps changing.
+        """
+        if self._dirty:
+            self._regroup()  # Searching the copy then never writes to it
+        other = IVFIndex(self.n_lists, self.n_probe, self.train_iterations, self.max_train_points, self.seed)
+        other.centroids = self.centroids
+        other.vectors = self.vectors
+        other.ids = self.ids
+        other.assignments = self.assignments
+        other.trained_size = self.trained_size
+        other._order, other._offsets, other._dirty = self._order, self._offsets, self._dirty
+        return other
+
+    def search(self, query: np.ndarray, k: int, n_probe: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Approximate top-k (ids, cosine scores) for one query vector"""
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        if self._dirty:
+            self._regroup()
+
+        query = np.asarray(query, dtype=np.float32).ravel()
+        query = query / (np.linalg.norm(query) + 1e-7)
+
+        lists = _top_k(self.centroids @ query, min(n_probe or self.n_probe, len(self.centroids)))
+        rows = np.concatenate([self._order[self._offsets[l]:self._offsets[l + 1]] for l in lists])
+
+        scores = self.vectors[rows] @ query
+        best = _top_k(scores, k)
+        return self.ids[rows[best]], scores[best]
+
+    def save(self, path: str):
+        """Persist the index atomically (private temp file per writer, then rename)"""
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(
+                    f,
+                    centroids=self.centroids,
+                    vectors=self.vectors,
+                    ids=self.ids,
+                    assignments=self.assignments,
+                    params=np.array([self.n_probe, self.trained_size], dtype=np.int64),
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    @classmethod
+    def load(cls, path: str) -> "IVFIndex":
+        with np.load(path) as data:
+            n_probe, trained_size = data["params"].tolist()
+            index = cls(n_probe=int(n_probe))
+            index.centroids = data["centroids"]
+            index.vectors = data["vectors"]
+            index.ids = data["ids"]
+            index.assignments = data["assignments"]
+            index.trained_size = int(trained_size)
+        index._regroup()
+        return index
+
+
+def benchmark(index: IVFIndex, vectors: np.ndarray, ids: np.ndarray, queries: np.ndarray,
+              k: int = 10, n_probe: Optional[int] = None) -> Dict:
+    """Recall@k and per-query latency of the index against an exact scan"""
+    exact_matrix = _unit_rows(np.asarray(vectors, dtype=np.float32))
+    ids = np.asarray(ids)
+
+    exact_time = 0.0
+    ann_time = 0.0
+    hits = 0
+    for query in queries:
+        q = query / (np.linalg.norm(query) + 1e-7)
+
+        start = time.perf_counter()
+        exact_ids = ids[_top_k(exact_matrix @ q, k)]
+        exact_time += time.perf_counter() - start
+
+        start = time.perf_counter()
+        ann_ids, _ = index.search(q, k, n_probe)
+        ann_time += time.perf_counter() - start
+
+        hits += len(np.intersect1d(exact_ids, ann_ids))
+
+    n = max(1, len(queries))
+    return {
+        "gallery_size": len(vectors),
+        "queries": len(queries),
+        "k": k,
+        "n_probe": n_probe or index.n_probe,
+        "n_lists": len(index.centroids),
+        "recall_at_k": round(hits / (n * k), 4),
+        "exact_ms_per_query": round(exact_time / n * 1000, 3),
+        "ann_ms_per_query": round(ann_time / n * 1000, 3),
+    }
+
+
+class EyeAnnService:
+    """
+    Keeps an IVF index in step with the template gallery and turns it into
+    candidate rows for the fused matcher.
+
+    Every new gallery object is reconciled against the index: new ids are added, ids
+    that disappeared or whose vector changed are replaced, and an index that mostly
+    disagrees with the gallery (e.g. a file left from a reset database) is rebuilt.
+    Once the index has doubled since training, centroids are retrained in a background
+    thread while searches keep using the current index.
+
+    The index holds decrypted eye templates, so it is only written next to the gallery
+    snapshot (tmpfs or GALLERY_SNAPSHOT_DIR) or to an explicit ANN_INDEX_PATH; otherwise
+    it lives in memory only. Writes happen in the background, `persist_delay` seconds
+    after the last change.
+    """
+
+    # Share of indexed entries that may be stale before the index is rebuilt instead
+    STALE_REBUILD_RATIO = 0.5
+
+    def __init__(self, path: Optional[str] = None, persist_delay: float = 5.0):
+        self.path = path or default_index_path()
+        self.persist_delay = persist_delay
+        self.index: Optional[IVFIndex] = None
+        self._synced_gallery = None
+        self._lock = threading.Lock()
+        self._persist_timer = None
+        self._rebuild_thread = None
+        self.searches = 0
+        self.builds = 0
+        self.updated = 0
+        self.removed = 0
+        self.persisted = 0
+
+    def _load_or_build(self, gallery):
+        if self.index is None and self.path and os.path.exists(self.path):
+            try:
+                self.index = IVFIndex.load(self.path)
+            except Exception as e:
+                print(f"Failed to load ANN index from {self.path}: {e}")
+
+        if self.index is None or self.index.dim != gallery.eye_matrix.shape[1]:
+            self._rebuild(gallery)
+
+    def _rebuild(self, gallery):
+        self.index = IVFIndex()
+        self.index.build(gallery.eye_matrix, gallery.student_ids)
+        self.builds += 1
+        self._schedule_persist()
+
+    def _reconcile(self, gallery):
+        """Apply the differences between the index and the gallery"""
+        index = self.index
+        ids = np.asarray(gallery.student_ids, dtype=np.int64)
+        vectors = _unit_rows(np.asarray(gallery.eye_matrix, dtype=np.float32))
+
+        # Index row of every gallery id (if indexed)
+        order = np.argsort(index.ids, kind="stable")
+        sorted_ids = index.ids[order]
+        pos = np.minimum(np.searchsorted(sorted_ids, ids), max(len(sorted_ids) - 1, 0))
+        known = (sorted_ids[pos] == ids) if len(sorted_ids) else np.zeros(len(ids), dtype=bool)
+
+        changed = np.zeros(len(ids), dtype=bool)
+        if known.any():
+            indexed = index.vectors[order[pos[known]]]
+            changed[known] = np.abs(indexed - vectors[known]).max(axis=1) > 1e-4
+        removed = ~np.isin(index.ids, ids)
+
+        stale = int(removed.sum() + changed.sum())
+        if stale and stale > self.STALE_REBUILD_RATIO * len(index):
+            self._rebuild(gallery)  # Not this gallery's index
+            return
+
+        if stale:
+            index.remove(np.concatenate([index.ids[removed], ids[changed]]))
+            self.removed += int(removed.sum())
+            self.updated += int(changed.sum())
+        add = ~known | changed
+        if add.any():
+            index.add(vectors[add], ids[add])
+            # Centroids drift as the gallery grows; retrain once it doubles
+            if len(index) > 2 * max(1, index.trained_size):
+                self._schedule_rebuild(gallery)
+        if stale or add.any():
+            self._schedule_persist()
+
+    def _schedule_rebuild(self, gallery):
+        """Retrain in a background thread; the incremental index serves searches meanwhile"""
+        if self._rebuild_thread is not None:
+            return
+        self._rebuild_thread = threading.Thread(target=self._rebuild_in_background, args=(gallery,), daemon=True)
+        self._rebuild_thread.start()
+
+    def _rebuild_in_background(self, gallery):
+        index = IVFIndex()
+        try:
+            index.build(gallery.eye_matrix, gallery.student_ids)
+        except Exception as e:
+            print(f"Failed to rebuild ANN index: {e}")
+            index = None
+        with self._lock:
+            self._rebuild_thread = None
+            if index is None:
+                return
+            self.index = index
+            self.builds += 1
+            # Catch up with galleries synced while training
+            if self._synced_gallery is not None and self._synced_gallery is not gallery:
+                self._reconcile(self._synced_gallery)
+            self._schedule_persist()
+
+    def sync(self, gallery):
+        """Bring the index up to date with a (possibly new) gallery object"""
+        with self._lock:
+            self._sync(gallery)
+
+    def _sync(self, gallery):
+        if self._synced_gallery is gallery:
+            return
+        self._load_or_build(gallery)
+        self._reconcile(gallery)
+        self._synced_gallery = gallery
+
+    def _schedule_persist(self):
+        """Write the index file later, off the verify path; bursts of changes share one write"""
+        if self.path is None or self._persist_timer is not None:
+            return
+        self._persist_timer = threading.Timer(self.persist_delay, self.persist)
+        self._persist_timer.daemon = True
+        self._persist_timer.start()
+
+    def persist(self):
+        """Write the current index to disk now"""
+        with self._lock:
+            if self._persist_timer is not None:
+                self._persist_timer.cancel()
+                self._persist_timer = None
+            if self.index is None or self.path is None:
+                return
+            index = self.index.copy()
+        # Written outside the lock; the copy is not affected by later syncs
+        try:
+            index.save(self.path)
+            self.persisted += 1
+        except Exception as e:
+            print(f"Failed to save ANN index to {self.path}: {e}")
+
+    def candidates(self, gallery, eye_features: Dict, k: int, n_probe: int) -> np.ndarray:
+        """Gallery rows of the approximate top-k eye matches"""
+        with self._lock:
+            self._sync(gallery)
+            # Searched outside the lock; later syncs replace self.index, not this copy
+            index = self.index.copy()
+            self.searches += 1
+        probe = np.asarray(eye_features["feature_vector"], dtype=np.float32).ravel()
+        width = index.dim
+        probe = probe[:width] if len(probe) >= width else np.pad(probe, (0, width - len(probe)))
+
+        ids, _ = index.search(probe, k, n_probe)
+        return gallery.rows_for(ids)
+
+    def stats(self) -> Dict:
+        return {
+            "indexed": len(self.index) if self.index else 0,
+            "lists": len(self.index.centroids) if self.index else 0,
+            "builds": self.builds,
+            "updated": self.updated,
+            "removed": self.removed,
+            "persisted": self.persisted,
+            "searches": self.searches,
+        }
+
+
+def default_index_path() -> Optional[str]:
+    """ANN_INDEX_PATH, else beside the gallery snapshot; None keeps the index in memory"""
+    explicit = os.getenv("ANN_INDEX_PATH")
+    if explicit:
+        return explicit
+    root = snapshot_root()
+    if root is None:
+        return None
+    return os.path.join(root, database_key(SQLALCHEMY_DATABASE_URL), "eye_ivf.npz")
+
+
+# Global instance
+eye_ann = EyeAnnService()
@@ -0,0 +1,80 @@
+from collections import Counter
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import Integer, cast, delete, extract, func, insert, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import Attendance, AttendanceRollup
+
+
+def apply(session: Session, rows: Iterable[Dict]):
+    """
+    Add freshly inserted Attendance rows (dicts with timestamp + verification_status)
+    to the rollup. Call it in the transaction that inserts them, so both commit together.
+    """
+    buckets = Counter(
+        (row["timestamp"].date(), row["timestamp"].hour, row["verification_status"])
+        for row in rows if row.get("timestamp") is not None and row.get("verification_status")
+    )
+    if not buckets:
+        return
+    values = [{"day": day, "hour": hour, "status": status, "count": count}
+              for (day, hour, status), count in buckets.items()]
+
+    dialect = session.get_bind().dialect.name
+    if dialect in ("sqlite", "postgresql"):
+        stmt = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(AttendanceRollup)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["day", "hour", "status"],
+            set_={"count": AttendanceRollup.count + stmt.excluded.count},
+        )
+        session.execute(stmt, values)
+        return
+
+    # Other databases: update, then insert the buckets that did not exist yet
+    for value in values:
+        updated = session.execute(
+            update(AttendanceRollup)
+            .where(AttendanceRollup.day == value["day"], AttendanceRollup.hour == value["hour"],
+                   AttendanceRollup.status == value["status"])
+            .values(count=AttendanceRollup.count + value["count"])
+        )
+        if updated.rowcount == 0:
+            session.execute(insert(AttendanceRollup), [value])
+
+
+def rebuild(session: Session, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """
+    Regenerate rollup rows for start..end (inclusive; whole table when omitted) from the
+    raw attendance table with one INSERT ... SELECT ... GROUP BY. Returns the rollup size.
+    """
+    # date() is text on SQLite (which is how SQLAlchemy stores Date there) and DATE on PostgreSQL
+    day = func.date(Attendance.timestamp)
+    hour = cast(extract("hour", Attendance.timestamp), Integer)
+    source = (
+        select(day, hour, Attendance.verification_status, func.count())
+        .where(Attendance.timestamp.is_not(None), Attendance.verification_status.is_not(None))
+        .group_by(day, hour, Attendance.verification_status)
+    )
+    clear = delete(AttendanceRollup)
+    if start:
+        source = source.where(Attendance.timestamp >= datetime.combine(start, time.min))
+        clear = clear.where(AttendanceRollup.day >= start)
+    if end:
+        source = source.where(Attendance.timestamp < datetime.combine(end + timedelta(days=1), time.min))
+        clear = clear.where(AttendanceRollup.day <= end)
+
+    session.execute(clear)
+    session.execute(
+        insert(AttendanceRollup).from_select(["day", "hour", "status", "count"], source)
+    )
+    session.commit()
+    return session.scalar(select(func.count()).select_from(AttendanceRollup)) or 0
+
+
+def needs_backfill(session: Session) -> bool:
+    """True when attendance rows exist but the rollup was never built (first start after upgrade)"""
+    has_rollup = session.scalar(select(AttendanceRollup.day).limit(1)) is not None
+    return not has_rollup and session.scalar(select(Attendance.id).limit(1)) is not None
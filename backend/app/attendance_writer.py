@@ -0,0 +1,228 @@
+import os
+import time
+import queue
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+from app.models import Attendance
+from app import attendance_rollup
+
+# Rows from verifications arriving within this window share one INSERT + COMMIT (0 = write inline)
+ATTENDANCE_FLUSH_MS = float(os.getenv("ATTENDANCE_FLUSH_MS", "20"))
+ATTENDANCE_BATCH_SIZE = int(os.getenv("ATTENDANCE_BATCH_SIZE", "200"))
+
+_Item = Tuple[Engine, List[Dict], Future]
+
+
+def _insert(bind: Engine, rows: List[Dict]):
+    # The rollup is updated in the same transaction, so dashboards never drift from the rows
+    with Session(bind=bind) as session:
+        session.execute(insert(Attendance), rows)
+        attendance_rollup.apply(session, rows)
+        session.commit()
+
+
+class AttendanceWriter:
+    """
+    Write-behind queue for Attendance rows.
+
+    Callers hand over row dicts and get a Future that resolves once the rows are
+    committed, so a verification is only acknowledged after its attendance is durable.
+    A single thread groups whatever arrived within `flush_ms` (or `batch_size` rows)
+    into one executemany INSERT and one COMMIT per database; shutdown() drains the queue.
+    When the writer is disabled, stopped or full, rows are written inline instead.
+    """
+
+    def __init__(self, flush_ms: float = ATTENDANCE_FLUSH_MS, batch_size: int = ATTENDANCE_BATCH_SIZE,
+                 max_queue: int = 10000):
+        self.flush_ms = flush_ms
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Optional[_Item]]" = queue.Queue(maxsize=max_queue)
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._admit = threading.Lock()  # Guards _worker + enqueueing, never held by the worker
+
+        # Metrics
+        self.queued_rows = 0
+        self.inline_rows = 0
+        self.written_rows = 0
+        self.failed_rows = 0
+        self.flushes = 0
+        self.largest_flush = 0
+        self.flush_total = 0.0
+        self.flush_max = 0.0
+
+    @property
+    def enabled(self) -> bool:
+        return self.flush_ms > 0
+
+    def start(self):
+        with self._admit:
+            if self._worker is not None or not self.enabled:
+                return
+            self._worker = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+            self._worker.start()
+
+    def write(self, bind: Engine, rows: List[Dict]):
+        """Insert rows in one transaction on the calling thread (blocking)"""
+        if not rows:
+            return
+        _insert(bind, rows)
+        with self._lock:
+            self.inline_rows += len(rows)
+
+    def submit(self, bind: Engine, rows: List[Dict]) -> Future:
+        """Queue rows; the Future resolves when they are committed (or holds the insert error)"""
+        future: Future = Future()
+        if not rows:
+            future.set_result(0)
+            return future
+        with self._admit:
+            # Checked under the lock so nothing is queued behind shutdown()'s sentinel
+            if self._worker is not None:
+                try:
+                    self._queue.put_nowait((bind, rows, future))
+                    self.queued_rows += len(rows)
+                    return future
+                except queue.Full:
+                    pass
+        # Inline fallback: disabled, not started (tests, scripts) or backlogged
+        try:
+            self.write(bind, rows)
+            future.set_result(len(rows))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    async def record(self, bind: Engine, rows: List[Dict]):
+        """Await durability of rows from the event loop"""
+        future = self.submit(bind, rows)
+        if not future.done():
+            await asyncio.wrap_future(future)
+        future.result()
+
+    def _collect(self, first: _Item) -> Tuple[List[_Item], bool]:
+        """Gather items behind `first` until the window closes or the batch is full"""
+        batch = [first]
+        rows = len(first[1])
+        deadline = time.monotonic() + self.flush_ms / 1000
+        while rows < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+            rows += len(item[1])
+        return batch, False
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch, stopping = self._collect(item)
+            self._flush(batch)
+            if stopping:
+                # Drain what is still queued, then exit
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        return
+                    if item is not None:
+                        self._flush([item])
+
+    def _flush(self, batch: List[_Item]):
+        by_bind: Dict[Engine, List[_Item]] = {}
+        markers = []
+        for item in batch:
+            if item[1]:
+                by_bind.setdefault(item[0], []).append(item)
+            else:
+                markers.append(item[2])
+
+        for bind, items in by_bind.items():
+            rows = [row for _, item_rows, _ in items for row in item_rows]
+            start = time.perf_counter()
+            try:
+                _insert(bind, rows)
+            except Exception as e:
+                print(f"Batched attendance insert failed, retrying per verification: {e}")
+                self._flush_individually(bind, items)
+                continue
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.flushes += 1
+                self.written_rows += len(rows)
+                self.largest_flush = max(self.largest_flush, len(rows))
+                self.flush_total += elapsed
+                self.flush_max = max(self.flush_max, elapsed)
+            for _, item_rows, future in items:
+                future.set_result(len(item_rows))
+        for future in markers:
+            future.set_result(0)
+
+    def _flush_individually(self, bind: Engine, items: List[_Item]):
+        # One bad row must not fail the other verifications of the batch
+        for _, rows, future in items:
+            try:
+                _insert(bind, rows)
+            except Exception as e:
+                with self._lock:
+                    self.failed_rows += len(rows)
+                future.set_exception(e)
+                continue
+            with self._lock:
+                self.written_rows += len(rows)
+            future.set_result(len(rows))
+
+    def flush(self):
+        """Block until every row queued so far is committed"""
+        done: Future = Future()
+        with self._admit:
+            if self._worker is None:
+                return
+            # An empty item passes through the same queue, so it resolves after everything ahead of it
+            self._queue.put((None, [], done))
+        done.result()
+
+    def shutdown(self):
+        """Commit everything still queued and stop the writer thread"""
+        with self._admit:
+            worker, self._worker = self._worker, None
+            if worker is not None:
+                self._queue.put(None)
+        if worker is not None:
+            worker.join()
+
+    def stats(self) -> Dict:
+        return {
+            "enabled": self.enabled,
+            "flush_ms": self.flush_ms,
+            "batch_size": self.batch_size,
+            "queue_depth": self._queue.qsize(),
+            "queued_rows": self.queued_rows,
+            "inline_rows": self.inline_rows,
+            "written_rows": self.written_rows,
+            "failed_rows": self.failed_rows,
+            "flushes": self.flushes,
+            "largest_flush": self.largest_flush,
+            "avg_flush_rows": round(self.written_rows / self.flushes, 2) if self.flushes else 0.0,
+            "avg_flush_ms": round(self.flush_total / self.flushes * 1000, 2) if self.flushes else 0.0,
+            "max_flush_ms": round(self.flush_max * 1000, 2),
+        }
+
+
+# Global instance
+attendance_writer = AttendanceWriter()
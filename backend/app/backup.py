@@ -0,0 +1,177 @@
+import os
+import json
+import zlib
+import base64
+import gzip
+from datetime import datetime, timedelta
+from typing import IO, Callable, Dict, Iterator, List, Optional, Tuple
+
+from sqlalchemy import DateTime, Integer, LargeBinary, Table, insert, or_, select, text
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Attendance, AuditLog, StoredImage, Student
+from app import attendance_rollup
+
+BACKUP_VERSION = 1
+BACKUP_FETCH_SIZE = 1000
+RESTORE_BATCH_SIZE = 1000
+# Rows are stamped by the application before they commit; the next incremental starts this
+# far before the dump did, so rows whose transaction was still open are picked up again
+BACKUP_WATERMARK_MARGIN_SECONDS = float(os.getenv("BACKUP_WATERMARK_MARGIN_SECONDS", "300"))
+
+# Dump/restore order (parents first) and the column used as the incremental watermark
+BACKUP_TABLES: List[Tuple[Table, str]] = [
+    (Student.__table__, "created_at"),
+    (StoredImage.__table__, "created_at"),
+    (Attendance.__table__, "timestamp"),
+    (AuditLog.__table__, "timestamp"),
+]
+_TABLES = {table.name: table for table, _ in BACKUP_TABLES}
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return base64.b64encode(bytes(value)).decode()
+    return value
+
+
+def _decode_row(table: Table, row: Dict) -> Dict:
+    decoded = {}
+    for key, value in row.items():
+        column = table.columns.get(key)
+        if column is None:
+            continue  # Column dropped since the backup was taken
+        if value is not None and isinstance(column.type, DateTime):
+            value = datetime.fromisoformat(value)
+        elif value is not None and isinstance(column.type, LargeBinary):
+            value = base64.b64decode(value)
+        decoded[key] = value
+    return decoded
+
+
+def _line(obj: Dict) -> bytes:
+    return (json.dumps(obj, separators=(",", ":"), default=str) + "\n").encode()
+
+
+def iter_ndjson(session: Session, since: Optional[datetime] = None) -> Iterator[bytes]:
+    """
+    Backup as NDJSON lines:
+        {"backup": 1, "generated_at": ..., "since": ..., "until": ...}
+        {"table": "students"}            followed by one object per row
+        ...
+        {"end": true, "rows": {...}, "watermark": ...}
+
+    Every table is cut at `until`, the time the dump started, so rows created while the
+    tables are read one after another (e.g. a new student and its attendance) are left to
+    the next run instead of appearing without their parent. `watermark` is `until` minus
+    BACKUP_WATERMARK_MARGIN_SECONDS; pass it as `since` for the next incremental run. The
+    runs overlap by the margin, which restore absorbs by skipping existing primary keys.
+    """
+    until = datetime.utcnow()
+    watermark = until - timedelta(seconds=BACKUP_WATERMARK_MARGIN_SECONDS)
+    yield _line({"backup": BACKUP_VERSION, "generated_at": until.isoformat(),
+                 "since": since.isoformat() if since else None, "until": until.isoformat()})
+    counts = {}
+    for table, watermark_column in BACKUP_TABLES:
+        yield _line({"table": table.name})
+        column = table.columns[watermark_column]
+        stmt = select(table).order_by(*table.primary_key.columns)
+        if since is not None:
+            stmt = stmt.where(column >= since, column < until)
+        else:
+            stmt = stmt.where(or_(column < until, column.is_(None)))
+        count = 0
+        result = session.execute(stmt.execution_options(yield_per=BACKUP_FETCH_SIZE))
+        for row in result.mappings():
+            count += 1
+            yield _line({key: _encode(value) for key, value in row.items()})
+        counts[table.name] = count
+    yield _line({"end": True, "rows": counts, "watermark": watermark.isoformat()})
+
+
+def stream_backup(since: Optional[datetime] = None,
+                  session_factory: Callable[[], Session] = SessionLocal,
+                  chunk_bytes: int = 64 * 1024) -> Iterator[bytes]:
+    """gzip-compressed NDJSON backup, yielded in chunks while the tables are read"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    pending = []
+    size = 0
+    with session_factory() as session:
+        for line in iter_ndjson(session, since):
+            pending.append(line)
+            size += len(line)
+            if size >= chunk_bytes:
+                chunk = compressor.compress(b"".join(pending))
+                pending, size = [], 0
+                if chunk:
+                    yield chunk
+    yield compressor.compress(b"".join(pending)) + compressor.flush()
+
+
+def _insert_batch(session: Session, table: Table, rows: List[Dict]) -> int:
+    """Insert rows whose primary key is not present yet (restores can overlap)"""
+    pk = list(table.primary_key.columns)[0]
+    existing = set(session.execute(select(pk).where(pk.in_([row[pk.name] for row in rows]))).scalars())
+    fresh = [row for row in rows if row[pk.name] not in existing]
+    if fresh:
+        session.execute(insert(table), fresh)
+        if table is Attendance.__table__:
+            attendance_rollup.apply(session, fresh)
+    session.commit()
+    return len(fresh)
+
+
+def _reset_sequences(session: Session):
+    # Explicit ids leave PostgreSQL serial sequences behind; SQLite needs nothing
+    if session.get_bind().dialect.name != "postgresql":
+        return
+    for table, _ in BACKUP_TABLES:
+        pk = list(table.primary_key.columns)[0]
+        if not isinstance(pk.type, Integer):
+            continue
+        session.execute(text(
+            f"SELECT setval(pg_get_serial_sequence('{table.name}', '{pk.name}'), "
+            f"COALESCE((SELECT MAX({pk.name}) FROM {table.name}), 1))"
+        ))
+    session.commit()
+
+
+def restore(stream: IO[bytes], session_factory: Callable[[], Session] = SessionLocal,
+            batch_size: int = RESTORE_BATCH_SIZE) -> Dict[str, int]:
+    """
+    Load a (full or incremental) backup produced by stream_backup.
+    Rows are inserted in batches of `batch_size`; rows whose primary key already exists
+    are skipped, so restoring several incrementals on top of a full backup is safe.
+    Returns inserted rows per table.
+    """
+    inserted: Dict[str, int] = {}
+    table: Optional[Table] = None
+    batch: List[Dict] = []
+    with gzip.open(stream, "rt", encoding="utf-8") as lines, session_factory() as session:
+        header = json.loads(next(lines))
+        if header.get("backup") != BACKUP_VERSION:
+            raise ValueError(f"Unsupported backup format: {header}")
+        for line in lines:
+            obj = json.loads(line)
+            if obj.keys() == {"table"} or obj.get("end") is True:
+                if batch:
+                    inserted[table.name] += _insert_batch(session, table, batch)
+                    batch = []
+                if obj.get("end") is True:
+                    break
+                table = _TABLES.get(obj["table"])
+                if table is None:
+                    raise ValueError(f"Unknown table in backup: {obj['table']}")
+                inserted.setdefault(table.name, 0)
+                continue
+            batch.append(_decode_row(table, obj))
+            if len(batch) >= batch_size:
+                inserted[table.name] += _insert_batch(session, table, batch)
+                batch = []
+        else:
+            raise ValueError("Backup is truncated (no end marker)")
+        _reset_sequences(session)
+    return inserted
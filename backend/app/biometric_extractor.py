@@ -1,13 +1,17 @@
 # Biometric Extractor using MediaPipe Face Mesh
 import cv2
 import numpy as np
-from PIL import Image
-import base64
-from io import BytesIO
-from typing import Dict, List, Tuple, Any
+from typing import Dict, List, Tuple, Any, Optional
 import mediapipe as mp
 import math
 
+from app.fingerprint_matcher import (
+    DESCRIPTOR_BYTES, TEMPLATE_DESCRIPTORS, FingerprintMatcher, select_descriptors, to_descriptors
+)
+from app.image_pipeline import (
+    DETAIL_MAX_SIDE, EYE_WORKING_MAX_SIDE, THUMB_WORKING_MAX_SIDE, decode, fit, timed, to_bytes
+)
+
 # Robust loading of mediapipe solutions
 try:
     from mediapipe.python.solutions import face_mesh as mp_face_mesh
@@ -17,6 +21,19 @@ except ImportError:
     except ImportError:
         mp_face_mesh = mp.solutions.face_mesh
 
+# Canonical landmarks for head pose: nose tip, chin, outer eye corners, mouth corners
+HEAD_POSE_LANDMARKS = [1, 152, 33, 263, 61, 291]
+# Generic face model in camera axes (x right, y down, z away from camera), nose tip at origin
+HEAD_POSE_MODEL = np.array([
+    [0.0, 0.0, 0.0],
+    [0.0, 330.0, 65.0],
+    [-225.0, -170.0, 135.0],
+    [225.0, -170.0, 135.0],
+    [-150.0, 150.0, 125.0],
+    [150.0, 150.0, 125.0],
+], dtype=np.float64)
+
+
 class BiometricExtractor:
     """Extract biometric features using MediaPipe Face Mesh for high precision"""
     
@@ -38,30 +55,49 @@ class BiometricExtractor:
         self.RIGHT_IRIS = [473, 474, 475, 476, 477]
         self.RIGHT_EYE_CONTOUR = [263, 466, 388, 387, 386, 385, 384, 398, 362, 382, 381, 380, 374, 373, 390, 249]
 
-    def base64_to_image(self, base64_string: str) -> np.ndarray:
-        """Convert base64 string to OpenCV image"""
+    def base64_to_image(self, base64_string, max_side: int = DETAIL_MAX_SIDE) -> np.ndarray:
+        """Decode a base64 string (or raw bytes) straight to a BGR image, at most max_side"""
         try:
-            if ',' in base64_string:
-                base64_string = base64_string.split(',')[1]
-            
-            image_data = base64.b64decode(base64_string)
-            image = Image.open(BytesIO(image_data))
-            # Convert to RGB then BGR (OpenCV format)
-            if image.mode != 'RGB':
-                image = image.convert('RGB')
-            return cv2.cvtColor(np.array(image), cv2.COLOR_RGB2BGR)
+            return decode(to_bytes(base64_string), max_side)
         except Exception as e:
             raise ValueError(f"Failed to process image: {str(e)}")
 
-    def _get_landmarks(self, image: np.ndarray) -> Any:
-        # Convert BGR to RGB
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        results = self.face_mesh.process(image_rgb)
+    def _get_landmarks(self, image: np.ndarray, timings: Optional[Dict[str, float]] = None) -> Any:
+        # The only colour-order conversion in the pipeline: BGR to RGB for MediaPipe
+        with timed(timings, "eye_color"):
+            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        with timed(timings, "eye_landmarks"):
+            results = self.face_mesh.process(image_rgb)
         
         if not results.multi_face_landmarks:
             return None
         return results.multi_face_landmarks[0]
 
+    def get_head_pose(self, landmarks, img_w: int, img_h: int) -> Tuple[float, float, float]:
+        """
+        Estimate (pitch, yaw, roll) in degrees with solvePnP over the canonical landmarks.
+        Positive yaw: face turned to the subject's right; positive pitch: looking down.
+        """
+        points = landmarks.landmark if hasattr(landmarks, "landmark") else landmarks
+        image_points = np.array(
+            [(points[i].x, points[i].y) for i in HEAD_POSE_LANDMARKS], dtype=np.float64
+        ) * (img_w, img_h)
+
+        camera_matrix = np.array([
+            [img_w, 0, img_w / 2],
+            [0, img_w, img_h / 2],
+            [0, 0, 1],
+        ], dtype=np.float64)
+        ok, rvec, _ = cv2.solvePnP(
+            HEAD_POSE_MODEL, image_points, camera_matrix, np.zeros(4), flags=cv2.SOLVEPNP_ITERATIVE
+        )
+        if not ok:
+            raise ValueError("Head pose could not be estimated")
+
+        rotation, _ = cv2.Rodrigues(rvec)
+        pitch, yaw, roll = cv2.RQDecomp3x3(rotation)[0]
+        return float(pitch), float(yaw), float(roll)
+
     def _get_landmark_point(self, landmarks, idx, w, h) -> List[float]:
         lm = landmarks.landmark[idx]
         return [lm.x, lm.y, lm.z] # Normalized coordinates
@@ -74,10 +110,13 @@ class BiometricExtractor:
             return vector
         return (arr / norm).tolist()
 
-    def extract_eye_features(self, image: np.ndarray) -> Dict:
+    def extract_eye_features(self, image: np.ndarray, timings: Optional[Dict[str, float]] = None) -> Dict:
         """Extract eye features using MediaPipe Face Mesh"""
+        # Landmarks come from a downscaled copy; the full-resolution image is only used for the iris crop
+        with timed(timings, "eye_resize"):
+            working = fit(image, EYE_WORKING_MAX_SIDE)
+        landmarks = self._get_landmarks(working, timings)
         h, w, _ = image.shape
-        landmarks = self._get_landmarks(image)
         
         if not landmarks:
             raise ValueError("No face detected (MediaPipe)")
@@ -165,10 +204,15 @@ class BiometricExtractor:
             "quality_score": 0.95 # MediaPipe is high confidence
         }
 
-    def extract_fingerprint_features(self, image: np.ndarray) -> Dict:
+    def extract_fingerprint_features(self, image: np.ndarray, timings: Optional[Dict[str, float]] = None) -> Dict:
         """Extract fingerprint features using OpenCV (Standard ORB)"""
-        # (Unchanged from original implementation, just robust error handling)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        with timed(timings, "thumb_resize"):
+            image = fit(image, THUMB_WORKING_MAX_SIDE)
+        with timed(timings, "thumb_features"):
+            return self._fingerprint_features(image)
+
+    def _fingerprint_features(self, image: np.ndarray) -> Dict:
+        gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
         
         # Adaptive Thresholding for better ridge definition
         # clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
@@ -189,10 +233,12 @@ class BiometricExtractor:
             else:
                raise ValueError("No fingerprint features detected (Image too unclear)")
 
-        feature_vector = descriptors.flatten()[:1000]
+        # Keep the strongest keypoints: they are the ones a re-capture finds again
+        vector_bytes = TEMPLATE_DESCRIPTORS * DESCRIPTOR_BYTES
+        feature_vector = select_descriptors(keypoints, descriptors).flatten()
         # Pad if short
-        if len(feature_vector) < 1000:
-            feature_vector = np.pad(feature_vector, (0, 1000 - len(feature_vector)))
+        if len(feature_vector) < vector_bytes:
+            feature_vector = np.pad(feature_vector, (0, vector_bytes - len(feature_vector)))
 
         # Texture Histogram as secondary feature
         hist = cv2.calcHist([enhanced], [0], None, [256], [0, 256])
@@ -232,16 +278,9 @@ class BiometricExtractor:
 
     def compare_fingerprint_features(self, features1: Dict, features2: Dict) -> float:
         """Compare two fingerprint feature sets"""
-        # 1. Feature Vector Similarity (ORB descriptors)
-        vec1 = np.array(features1["feature_vector"])
-        vec2 = np.array(features2["feature_vector"])
-        
-        # Pad if needed
-        max_len = max(len(vec1), len(vec2))
-        if len(vec1) < max_len: vec1 = np.pad(vec1, (0, max_len - len(vec1)))
-        if len(vec2) < max_len: vec2 = np.pad(vec2, (0, max_len - len(vec2)))
-            
-        similarity = np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2) + 1e-7)
+        # 1. Descriptor Similarity (Hamming ratio-test over packed ORB descriptors)
+        matcher = FingerprintMatcher.from_descriptor_sets([to_descriptors(features2["feature_vector"])])
+        orb_score = float(matcher.scores(features1["feature_vector"])[0])
         
         # 2. Histogram Similarity
         hist1 = np.array(features1["texture_histogram"])
@@ -249,6 +288,6 @@ class BiometricExtractor:
         hist_sim = cv2.compareHist(hist1.astype(np.float32), hist2.astype(np.float32), cv2.HISTCMP_CORREL)
         
         # Weighted Score: 70% ORB, 30% Histogram
-        combined = (similarity + 1)/2 * 0.7 + max(0, hist_sim) * 0.3
+        combined = orb_score * 0.7 + max(0, hist_sim) * 0.3
         
         return float(max(0, min(1, combined)))
@@ -1,60 +1,53 @@
 from sqlalchemy.orm import Session
-from app.models import Student, Attendance
-from app.biometric_extractor import BiometricExtractor
+from app.models import Student
+from app.extraction_executor import extraction_executor
 from app.encryption import BiometricEncryption
-import cv2
-import json
-import os
+from app.template_cache import template_cache
+from app.gallery import BiometricGallery, cascade_stats
+from app.ann_index import eye_ann
+from app.template_codec import encode_eye_template, encode_thumb_template
+from app.verify_coalescer import VerifyCoalescer
+from app.image_store import image_store
+from app.attendance_writer import attendance_writer
+from app.checkin_index import recent_checkins
+from app.database import SessionLocal
+from starlette.concurrency import run_in_threadpool
+import random
+import asyncio
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List, Optional, Tuple, Union
 
 from app.config_service import config_service
 
-# Initialize extractors
-extractor = BiometricExtractor()
+# Initialize encryption
 encryptor = BiometricEncryption()
 
 async def register_student(
     db: Session,
     name: str,
     reg_no: str,
-    eye_image_b64: str,
-    thumb_image_b64: str
+    eye_image_b64: Union[str, bytes],
+    thumb_image_b64: Union[str, bytes]
 ) -> Dict:
-    """Register a new student with biometric data"""
+    """Register a new student with biometric data (base64 strings or raw image bytes)"""
     
     # Check if student already exists
     existing = db.query(Student).filter(Student.registration_number == reg_no).first()
     if existing:
         raise ValueError(f"Student with registration number {reg_no} already exists")
     
-    # Convert base64 to images
-    eye_image = extractor.base64_to_image(eye_image_b64)
-    thumb_image = extractor.base64_to_image(thumb_image_b64)
+    # Decode and extract features in the extraction pool (off the event loop)
+    extracted = await extraction_executor.extract(eye_image_b64, thumb_image_b64)
+    eye_features = extracted["eye_features"]
+    thumb_features = extracted["thumb_features"]
     
-    # Extract features
-    eye_features = extractor.extract_eye_features(eye_image)
-    thumb_features = extractor.extract_fingerprint_features(thumb_image)
-    
-    # Encrypt templates
-    eye_template_json = json.dumps(eye_features)
-    thumb_template_json = json.dumps(thumb_features)
-    
-    encrypted_eye = encryptor.encrypt_template(eye_template_json.encode())
-    encrypted_thumb = encryptor.encrypt_template(thumb_template_json.encode())
-    
-    # Save images
-    os.makedirs("biometric_storage/eye_scans", exist_ok=True)
-    os.makedirs("biometric_storage/thumb_scans", exist_ok=True)
-    
-    eye_filename = f"{reg_no}_{name.replace(' ', '_')}_eye.jpg"
-    thumb_filename = f"{reg_no}_{name.replace(' ', '_')}_thumb.jpg"
-    
-    eye_path = f"biometric_storage/eye_scans/{eye_filename}"
-    thumb_path = f"biometric_storage/thumb_scans/{thumb_filename}"
-    
-    cv2.imwrite(eye_path, eye_image)
-    cv2.imwrite(thumb_path, thumb_image)
+    # Scans go to the content-addressed store; files are compressed and written in the background
+    eye_url = await run_in_threadpool(image_store.save, db, eye_image_b64, "eye")
+    thumb_url = await run_in_threadpool(image_store.save, db, thumb_image_b64, "thumb")
+
+    # Encrypt templates (compact binary format)
+    encrypted_eye = encryptor.encrypt_template(encode_eye_template(eye_features))
+    encrypted_thumb = encryptor.encrypt_template(encode_thumb_template(thumb_features))
     
     # Create student record
     student = Student(
@@ -62,8 +55,8 @@ async def register_student(
         registration_number=reg_no,
         eye_template=encrypted_eye,
         thumb_template=encrypted_thumb,
-        eye_image_path=f"/biometric_storage/eye_scans/{eye_filename}",
-        thumb_image_path=f"/biometric_storage/thumb_scans/{thumb_filename}",
+        eye_image_path=eye_url,
+        thumb_image_path=thumb_url,
         eye_landmarks=eye_features.get("left_eye_landmarks"),
         thumb_minutiae=thumb_features.get("minutiae_points")
     )
@@ -71,131 +64,243 @@ async def register_student(
     db.add(student)
     db.commit()
     db.refresh(student)
+    template_cache.put(student.id, eye_features, thumb_features)
     
     return {"student_id": student.id, "message": "Registration successful"}
 
 
-async def verify_student(
-    db: Session,
-    eye_image_b64: str,
-    thumb_image_b64: str
-) -> Dict:
-    """Verify student identity using dual biometric authentication"""
-    
-    # Convert base64 to images
-    eye_image = extractor.base64_to_image(eye_image_b64)
-    thumb_image = extractor.base64_to_image(thumb_image_b64)
-    
-    # Extract features from captured images
-    try:
-        captured_eye_features = extractor.extract_eye_features(eye_image)
-        captured_thumb_features = extractor.extract_fingerprint_features(thumb_image)
-    except Exception as e:
-        # Fallback/Log the error but don't crash
-        print(f"Feature extraction warning: {str(e)}")
-        # If eye fails (e.g. no face), we can try to rely on fingerprint or fail
-        return {
-            "matched": False,
-            "message": f"Biometric extraction failed: {str(e)}"
-        }
-    
-    # Get all students
-    students = db.query(Student).all()
-    
-    best_match = None
-    best_eye_score = 0.0
-    best_thumb_score = 0.0
-    best_total_score = 0.0
-    
-    # Compare with each student
-    for student in students:
-        try:
-            # Decrypt templates
-            eye_template_json = encryptor.decrypt_template(student.eye_template).decode()
-            thumb_template_json = encryptor.decrypt_template(student.thumb_template).decode()
-            
-            stored_eye_features = json.loads(eye_template_json)
-            stored_thumb_features = json.loads(thumb_template_json)
-            
-            # Calculate similarity scores
-            eye_score = extractor.compare_eye_features(captured_eye_features, stored_eye_features)
-            thumb_score = extractor.compare_fingerprint_features(captured_thumb_features, stored_thumb_features)
-            
-            # Weighted Total Score (Eye is more reliable with MediaPipe)
-            # Eye: 60%, Thumb: 40%
-            total_score = (eye_score * 0.6) + (thumb_score * 0.4)
-            
-            if total_score > best_total_score:
-                best_total_score = total_score
-                best_match = student
-                best_eye_score = eye_score
-                best_thumb_score = thumb_score
-                
-        except Exception as e:
-            print(f"Error comparing student {student.id}: {e}")
-            continue
-
-    # Determination Logic
-    # Get dynamic thresholds
-    eye_threshold = config_service.get_float(db, "MIN_MATCH_SCORE")
-    # Thumb usually slightly lower or same, we can define a separate config or use same
-    # For now, let's assume one main threshold for match quality, or separate if defined
-    # Let's check if we have specific ones, else use default logic
-    
-    # We will use the config value as the base
-    base_threshold = eye_threshold # e.g. 0.6
-    
+def _find_best_match(db: Session, gallery: BiometricGallery, eye_features: Dict, thumb_features: Dict):
+    """Full scan, ANN candidates for large galleries, and/or eye-shortlist cascade (see config)"""
+    ann_min_size = config_service.get_int(db, "ANN_MIN_GALLERY_SIZE")
+    use_ann = 0 < ann_min_size <= len(gallery)
+    use_cascade = config_service.get_bool(db, "CASCADE_ENABLED")
+
+    if not use_ann and not use_cascade:
+        cascade_stats.full_requests += 1
+        return gallery.best_match(eye_features, thumb_features)
+
+    candidates = None
+    if use_ann:
+        cascade_stats.ann_requests += 1
+        candidates = eye_ann.candidates(
+            gallery, eye_features,
+            k=max(1, config_service.get_int(db, "ANN_CANDIDATES")),
+            n_probe=max(1, config_service.get_int(db, "ANN_PROBES"))
+        )
+
+    top_k = None
+    if use_cascade:
+        cascade_stats.cascade_requests += 1
+        top_k = max(1, config_service.get_int(db, "CASCADE_TOP_K"))
+
+    match = gallery.best_match(eye_features, thumb_features, top_k=top_k, candidates=candidates)
+
+    # Occasionally re-run exhaustively to measure how often the shortlist drops the true best match
+    if random.random() < config_service.get_float(db, "CASCADE_AUDIT_RATE"):
+        cascade_stats.record_audit(match, gallery.best_match(eye_features, thumb_features))
+
+    return match
+
+
+def _find_best_matches(db: Session, gallery: BiometricGallery, captures: List[Tuple[Dict, Dict]]):
+    """Batch counterpart of _find_best_match: one matrix-matrix product for the whole batch"""
+    ann_min_size = config_service.get_int(db, "ANN_MIN_GALLERY_SIZE")
+    if 0 < ann_min_size <= len(gallery):
+        # ANN candidate sets differ per capture
+        return [_find_best_match(db, gallery, eye, thumb) for eye, thumb in captures]
+
+    top_k = None
+    if config_service.get_bool(db, "CASCADE_ENABLED"):
+        cascade_stats.cascade_requests += len(captures)
+        top_k = max(1, config_service.get_int(db, "CASCADE_TOP_K"))
+    else:
+        cascade_stats.full_requests += len(captures)
+    matches = gallery.best_matches(captures, top_k=top_k)
+
+    if top_k:
+        audit_rate = config_service.get_float(db, "CASCADE_AUDIT_RATE")
+        for (eye, thumb), match in zip(captures, matches):
+            if random.random() < audit_rate:
+                cascade_stats.record_audit(match, gallery.best_match(eye, thumb))
+
+    return matches
+
+
+def _is_match(base_threshold: float, eye_score: float, thumb_score: float) -> bool:
     # Strict thresholds for individual biometrics (derived from base)
     # Eye is primary, so it should meet the base
     # Thumb can be slightly lower
-    
     is_match = (
-        best_eye_score >= base_threshold and 
-        best_thumb_score >= (base_threshold - 0.05)
+        eye_score >= base_threshold and 
+        thumb_score >= (base_threshold - 0.05)
     )
     
     # Adaptive threshold: if one is VERY high, allow slightly lower on other
     if not is_match:
-        if best_eye_score > 0.90 and best_thumb_score > 0.60:
+        if eye_score > 0.90 and thumb_score > 0.60:
             is_match = True
-        elif best_thumb_score > 0.90 and best_eye_score > 0.65:
+        elif thumb_score > 0.90 and eye_score > 0.65:
             is_match = True
+    return is_match
 
-    # Record attendance
-    if is_match and best_match:
-        attendance = Attendance(
-            student_id=best_match.id,
-            eye_match_score=best_eye_score,
-            thumb_match_score=best_thumb_score,
-            verification_status="success",
-            verification_method="dual_biometric"
+
+def _score(db: Session, captures: List[Tuple[Dict, Dict]]) -> Tuple[List[Dict], List[Dict]]:
+    """Match extracted captures against the gallery; returns (results, attendance rows to insert)"""
+    gallery = template_cache.get_gallery(db)
+    matches = _find_best_matches(db, gallery, captures)
+
+    ids = {match.student_id for match in matches if match}
+    students = {s.id: s for s in db.query(Student).filter(Student.id.in_(ids)).all()} if ids else {}
+
+    # Get dynamic thresholds
+    base_threshold = config_service.get_float(db, "MIN_MATCH_SCORE")
+    duplicate_window = config_service.get_float(db, "DUPLICATE_CHECKIN_WINDOW_SECONDS")
+
+    results = []
+    rows = []
+    now = datetime.utcnow()
+    for match in matches:
+        best_match = students.get(match.student_id) if match else None
+        best_eye_score = 0.0
+        best_thumb_score = 0.0
+        best_total_score = 0.0
+        if best_match:
+            best_eye_score = match.eye_score
+            best_thumb_score = match.thumb_score
+            best_total_score = match.total_score
+
+        # Record attendance
+        if _is_match(base_threshold, best_eye_score, best_thumb_score) and best_match:
+            # A repeat scan inside the window is answered from memory: no second row
+            duplicate = not recent_checkins.check_in(best_match.id, duplicate_window)
+            if not duplicate:
+                rows.append(dict(
+                    student_id=best_match.id,
+                    timestamp=now,
+                    eye_match_score=best_eye_score,
+                    thumb_match_score=best_thumb_score,
+                    verification_status="success",
+                    verification_method="dual_biometric"
+                ))
+            results.append({
+                "matched": True,
+                "duplicate": duplicate,
+                "student": best_match,
+                "eye_score": round(best_eye_score * 100, 1),
+                "thumb_score": round(best_thumb_score * 100, 1),
+                "confidence": "High" if best_total_score > 0.85 else "Medium"
+            })
+        else:
+            # Record failed attempt (only if some score was relevant)
+            if best_total_score > 0.4:
+                rows.append(dict(
+                    student_id=best_match.id if best_match else None,
+                    timestamp=now,
+                    eye_match_score=best_eye_score,
+                    thumb_match_score=best_thumb_score,
+                    verification_status="failed",
+                    verification_method="dual_biometric"
+                ))
+            results.append({
+                "matched": False,
+                "message": "Identity verification failed. Please try again.",
+                "eye_score": round(best_eye_score * 100, 1),
+                "thumb_score": round(best_thumb_score * 100, 1)
+            })
+
+    return results, rows
+
+
+def _score_and_record(db: Session, captures: List[Tuple[Dict, Dict]]) -> List[Dict]:
+    """Match extracted captures and write their attendance rows in one transaction"""
+    results, rows = _score(db, captures)
+    try:
+        attendance_writer.write(db.get_bind(), rows)
+    except Exception:
+        _release_checkins(rows)
+        raise
+    return results
+
+
+def _release_checkins(rows: List[Dict]):
+    # The rows were never written, so the next scan must count as a fresh check-in
+    for row in rows:
+        if row["verification_status"] == "success":
+            recent_checkins.forget(row["student_id"])
+
+
+def _score_coalesced(captures: List[Tuple[Dict, Dict]]) -> List[Dict]:
+    # Coalesced requests come from different sessions; the batch uses its own and keeps
+    # the matched Student rows loaded for the callers
+    db = SessionLocal(expire_on_commit=False)
+    try:
+        return _score_and_record(db, captures)
+    finally:
+        db.close()
+
+
+verify_coalescer = VerifyCoalescer(_score_coalesced)
+
+
+def _extraction_failed(error: Exception) -> Dict:
+    # Fallback/Log the error but don't crash
+    print(f"Feature extraction warning: {str(error)}")
+    # If eye fails (e.g. no face), we can try to rely on fingerprint or fail
+    return {
+        "matched": False,
+        "message": f"Biometric extraction failed: {str(error)}"
+    }
+
+
+async def verify_student(
+    db: Session,
+    eye_image_b64: Union[str, bytes],
+    thumb_image_b64: Union[str, bytes]
+) -> Dict:
+    """Verify student identity using dual biometric authentication (base64 strings or raw image bytes)"""
+    
+    # Extract features from captured images (in the extraction pool)
+    try:
+        extracted = await extraction_executor.extract(eye_image_b64, thumb_image_b64)
+    except Exception as e:
+        return _extraction_failed(e)
+    capture = (extracted["eye_features"], extracted["thumb_features"])
+
+    # Micro-batching: share one gallery pass with verifications arriving within the window
+    window_ms = config_service.get_int(db, "VERIFY_MICROBATCH_MS")
+    if window_ms > 0:
+        return await verify_coalescer.submit(capture[0], capture[1], window_ms)
+
+    # Score the capture against the enrolled gallery (worker thread, keeps the loop free);
+    # the attendance row joins the write-behind batch and is committed before we answer
+    results, rows = await run_in_threadpool(_score, db, [capture])
+    try:
+        await attendance_writer.record(db.get_bind(), rows)
+    except Exception:
+        _release_checkins(rows)
+        raise
+    return results[0]
+
+
+async def verify_batch(db: Session, captures: List[Tuple[Union[str, bytes], Union[str, bytes]]]) -> List[Dict]:
+    """Verify many (eye, thumb) captures: parallel extraction, one scoring pass, one transaction"""
+    extracted = await asyncio.gather(
+        *(extraction_executor.extract(eye, thumb) for eye, thumb in captures), return_exceptions=True
+    )
+
+    results: List[Optional[Dict]] = [None] * len(captures)
+    scored_items = []
+    for i, item in enumerate(extracted):
+        if isinstance(item, BaseException):
+            results[i] = _extraction_failed(item)
+        else:
+            scored_items.append(i)
+
+    if scored_items:
+        scored = await run_in_threadpool(
+            _score_and_record, db,
+            [(extracted[i]["eye_features"], extracted[i]["thumb_features"]) for i in scored_items]
         )
-        db.add(attendance)
-        db.commit()
-        
-        return {
-            "matched": True,
-            "student": best_match,
-            "eye_score": round(best_eye_score * 100, 1),
-            "thumb_score": round(best_thumb_score * 100, 1),
-            "confidence": "High" if best_total_score > 0.85 else "Medium"
-        }
-    else:
-        # Record failed attempt (only if some score was relevant)
-        if best_total_score > 0.4:
-            attendance = Attendance(
-                student_id=best_match.id if best_match else None,
-                eye_match_score=best_eye_score,
-                thumb_match_score=best_thumb_score,
-                verification_status="failed",
-                verification_method="dual_biometric"
-            )
-            db.add(attendance)
-            db.commit()
-        
-        return {
-            "matched": False,
-            "message": "Identity verification failed. Please try again.",
-            "eye_score": round(best_eye_score * 100, 1),
-            "thumb_score": round(best_thumb_score * 100, 1)
-        }
+        for i, result in zip(scored_items, scored):
+            results[i] = result
+    return results
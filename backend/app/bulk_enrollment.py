@@ -0,0 +1,349 @@
+import os
+import csv
+import time
+import uuid
+import shutil
+import zipfile
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import func, insert, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Student
+from app.encryption import BiometricEncryption
+from app.extraction_executor import init_worker, run_extraction
+from app.template_codec import encode_eye_template, encode_thumb_template
+from app.template_cache import template_cache
+from app.image_store import image_store
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".bmp"}
+MAX_REPORTED_FAILURES = 1000
+
+# Per worker process: open archives and the template encryptor
+_sources: Dict[str, "ImageSource"] = {}
+_encryptor: Optional[BiometricEncryption] = None
+
+
+class ImageSource:
+    """Eye/thumb images stored in a directory tree or a zip archive"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.is_zip = os.path.isfile(path) and zipfile.is_zipfile(path)
+        self._zip: Optional[zipfile.ZipFile] = None
+        if not self.is_zip and not os.path.isdir(path):
+            raise ValueError(f"Image source {path} is neither a directory nor a zip archive")
+
+    def names(self) -> List[str]:
+        """Relative paths of every image in the source"""
+        if self.is_zip:
+            with zipfile.ZipFile(self.path) as archive:
+                names = [info.filename for info in archive.infolist() if not info.is_dir()]
+        else:
+            names = []
+            for root, _, files in os.walk(self.path):
+                for filename in files:
+                    names.append(os.path.relpath(os.path.join(root, filename), self.path))
+        return [n for n in names if os.path.splitext(n)[1].lower() in IMAGE_EXTENSIONS]
+
+    def read(self, name: str) -> bytes:
+        if self.is_zip:
+            if self._zip is None:
+                self._zip = zipfile.ZipFile(self.path)
+            return self._zip.read(name)
+        with open(os.path.join(self.path, name), "rb") as f:
+            return f.read()
+
+
+def index_images(names: List[str]) -> Dict[str, Dict[str, str]]:
+    """
+    Map registration number -> {"eye": name, "thumb": name} for files named like the
+    enrollment storage does: <registration_number>_<anything>_eye.jpg / _thumb.jpg
+    """
+    index: Dict[str, Dict[str, str]] = {}
+    for name in names:
+        stem = os.path.splitext(os.path.basename(name))[0].lower()
+        kind = "eye" if stem.endswith("_eye") else "thumb" if stem.endswith("_thumb") else None
+        if kind:
+            index.setdefault(stem.split("_")[0], {})[kind] = name
+    return index
+
+
+def _enroll_worker(source_path: str, reg_no: str, name: str, eye_name: str, thumb_name: str) -> Dict:
+    """Read both images, extract, encode and encrypt templates (runs inside a pool worker)"""
+    global _encryptor
+    source = _sources.get(source_path)
+    if source is None:
+        source = _sources[source_path] = ImageSource(source_path)
+    if _encryptor is None:
+        _encryptor = BiometricEncryption()
+
+    eye_bytes, thumb_bytes = source.read(eye_name), source.read(thumb_name)
+    extracted = run_extraction(eye_bytes, thumb_bytes, time.time())
+    eye_features = extracted["eye_features"]
+    thumb_features = extracted["thumb_features"]
+
+    # A batch job is already off the request path: archive the scans right here
+    images = []
+    for kind, raw in (("eye", eye_bytes), ("thumb", thumb_bytes)):
+        digest, path = image_store.locate(raw)
+        image_store.writer.write(path, raw)
+        image_store.thumbnails.write(image_store.thumbnail_path(digest), raw)
+        images.append({"digest": digest, "path": path, "kind": kind, "source_bytes": len(raw)})
+    return {
+        "name": name,
+        "registration_number": reg_no,
+        "eye_template": _encryptor.encrypt_template(encode_eye_template(eye_features)),
+        "thumb_template": _encryptor.encrypt_template(encode_thumb_template(thumb_features)),
+        "eye_image_path": "/" + images[0]["path"],
+        "thumb_image_path": "/" + images[1]["path"],
+        "eye_landmarks": eye_features.get("left_eye_landmarks"),
+        "thumb_minutiae": thumb_features.get("minutiae_points"),
+        "_images": images,
+    }
+
+
+class EnrollmentJob:
+    """Progress and per-row failures of one bulk enrollment run"""
+
+    def __init__(self, csv_path: str, images_path: str):
+        self.id = uuid.uuid4().hex
+        self.csv_path = csv_path
+        self.images_path = images_path
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.total = 0
+        self.processed = 0
+        self.enrolled = 0
+        self.skipped = 0
+        self.failed = 0
+        self.failures: List[Dict] = []
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def fail_row(self, row_num: int, reg_no: Optional[str], error: str):
+        self.failed += 1
+        self.processed += 1
+        if len(self.failures) < MAX_REPORTED_FAILURES:
+            self.failures.append({"row": row_num, "registration_number": reg_no, "error": error})
+
+    def progress(self) -> Dict:
+        elapsed = ((self.finished_at or time.time()) - self.started_at) if self.started_at else 0.0
+        rate = self.processed / elapsed if elapsed > 0 else 0.0
+        remaining = self.total - self.processed
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "error": self.error,
+            "total": self.total,
+            "processed": self.processed,
+            "enrolled": self.enrolled,
+            "skipped": self.skipped,
+            "failed": self.failed,
+            "elapsed_seconds": round(elapsed, 1),
+            "rows_per_second": round(rate, 2),
+            "eta_seconds": round(remaining / rate, 1) if rate > 0 and self.status == "running" else None,
+            "failures": self.failures,
+        }
+
+
+def _existing_students(db: Session) -> Dict[str, Tuple[int, bool]]:
+    """registration_number -> (id, already has templates)"""
+    rows = db.query(Student.registration_number, Student.id, func.length(Student.eye_template)).all()
+    return {reg_no: (student_id, bool(size)) for reg_no, student_id, size in rows}
+
+
+def _write_chunk(db: Session, job: EnrollmentJob, rows: List[Tuple[int, Dict, Optional[int]]]) -> List[int]:
+    """Insert new students and fill placeholder rows in one transaction; returns the affected ids"""
+    # Manifest rows share the students' transaction, so a rollback drops both
+    images = {row_num: values.pop("_images") for row_num, values, _ in rows}
+    image_store.record(db, [image for row_images in images.values() for image in row_images])
+    inserts = [values for _, values, placeholder_id in rows if placeholder_id is None]
+    updates = [dict(values, id=placeholder_id) for _, values, placeholder_id in rows if placeholder_id is not None]
+    try:
+        if inserts:
+            db.execute(insert(Student), inserts)
+        if updates:
+            db.execute(update(Student), updates)
+        db.commit()
+    except IntegrityError:
+        # e.g. a student registered through the API meanwhile: isolate the offending rows
+        db.rollback()
+        ok = []
+        for row_num, values, placeholder_id in rows:
+            try:
+                image_store.record(db, images[row_num])
+                if placeholder_id is None:
+                    db.execute(insert(Student), [values])
+                else:
+                    db.execute(update(Student), [dict(values, id=placeholder_id)])
+                db.commit()
+                ok.append((row_num, values, placeholder_id))
+            except IntegrityError as e:
+                db.rollback()
+                job.processed -= 1  # counted again by fail_row
+                job.fail_row(row_num, values["registration_number"], f"Database rejected row: {e.orig}")
+        rows = ok
+
+    reg_nos = [values["registration_number"] for _, values, _ in rows]
+    job.enrolled += len(rows)
+    if not reg_nos:
+        return []
+    return [sid for (sid,) in db.query(Student.id).filter(Student.registration_number.in_(reg_nos))]
+
+
+def run_enrollment(job: EnrollmentJob,
+                   session_factory: Callable[[], Session] = SessionLocal,
+                   workers: Optional[int] = None,
+                   chunk_size: int = 200,
+                   on_progress: Optional[Callable[[EnrollmentJob], None]] = None):
+    """
+    Enroll every CSV row (name, registration_number[, eye_image, thumb_image]) whose
+    images are found in the source. Rows already holding templates are skipped, so a
+    crashed or cancelled run can simply be started again.
+    """
+    if workers is None:
+        workers = int(os.getenv("BULK_ENROLL_WORKERS", str(os.cpu_count() or 1)))
+    job.status = "running"
+    job.started_at = time.time()
+    db = session_factory()
+    pool = None
+    placeholders_filled: List[int] = []
+    try:
+        source = ImageSource(job.images_path)
+        available = source.names()
+        by_name = set(available)
+        by_reg_no = index_images(available)
+        existing = _existing_students(db)
+
+        with open(job.csv_path, newline="", encoding="utf-8-sig") as f:
+            csv_rows = list(enumerate(csv.DictReader(f), start=2))
+        job.total = len(csv_rows)
+
+        tasks = []
+        seen = set()
+        for row_num, row in csv_rows:
+            name = (row.get("name") or "").strip()
+            reg_no = (row.get("registration_number") or "").strip()
+            if not name or not reg_no:
+                job.fail_row(row_num, reg_no or None, "Missing name or registration_number")
+                continue
+            if reg_no in seen:
+                job.fail_row(row_num, reg_no, "Duplicate registration_number in CSV")
+                continue
+            seen.add(reg_no)
+
+            student_id, enrolled = existing.get(reg_no, (None, False))
+            if enrolled:
+                job.skipped += 1
+                job.processed += 1
+                continue
+
+            found = by_reg_no.get(reg_no.lower(), {})
+            eye_name = (row.get("eye_image") or "").strip() or found.get("eye")
+            thumb_name = (row.get("thumb_image") or "").strip() or found.get("thumb")
+            if eye_name not in by_name or thumb_name not in by_name:
+                job.fail_row(row_num, reg_no, "Eye or thumb image not found")
+                continue
+            tasks.append((row_num, reg_no, name, eye_name, thumb_name, student_id))
+
+        pool = ProcessPoolExecutor(
+            max_workers=max(1, workers),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=init_worker,
+        )
+        # Bounded in-flight window keeps encrypted templates from piling up in memory
+        window = max(1, workers) * 4
+        pending = {}
+        buffer: List[Tuple[int, Dict, Optional[int]]] = []
+        queued = iter(tasks)
+
+        def submit_next():
+            task = next(queued, None)
+            if task is not None:
+                row_num, reg_no, name, eye_name, thumb_name, student_id = task
+                future = pool.submit(_enroll_worker, job.images_path, reg_no, name, eye_name, thumb_name)
+                pending[future] = (row_num, reg_no, student_id)
+
+        for _ in range(window):
+            submit_next()
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                row_num, reg_no, student_id = pending.pop(future)
+                try:
+                    buffer.append((row_num, future.result(), student_id))
+                    job.processed += 1
+                except Exception as e:
+                    job.fail_row(row_num, reg_no, str(e))
+                submit_next()
+
+            if len(buffer) >= chunk_size or (not pending and buffer):
+                ids = _write_chunk(db, job, buffer)
+                filled = {sid for _, _, sid in buffer if sid is not None}
+                placeholders_filled.extend(i for i in ids if i in filled)
+                template_cache.refresh(db, ids)
+                buffer = []
+                if on_progress:
+                    on_progress(job)
+
+        job.status = "completed"
+    except Exception as e:
+        job.status = "failed"
+        job.error = str(e)
+        print(f"Bulk enrollment {job.id} failed: {e}")
+    finally:
+        if pool is not None:
+            pool.shutdown(wait=True, cancel_futures=True)
+        # Filled placeholders keep their ids, so other workers only see them through a new snapshot
+        if placeholders_filled and template_cache.snapshots is not None:
+            try:
+                template_cache.get_gallery(db)
+                template_cache.refresh(db, placeholders_filled)
+                template_cache.publish()
+            except Exception as e:
+                print(f"Failed to publish enrolled templates: {e}")
+        db.close()
+        job.finished_at = time.time()
+        if on_progress:
+            on_progress(job)
+    return job
+
+
+class EnrollmentJobs:
+    """Bulk enrollment jobs started from the admin API (one background thread each)"""
+
+    def __init__(self):
+        self._jobs: Dict[str, EnrollmentJob] = {}
+        self._lock = threading.Lock()
+
+    def start(self, csv_path: str, images_path: str, cleanup_dir: Optional[str] = None, **kwargs) -> EnrollmentJob:
+        """Run a job in the background; `cleanup_dir` (uploaded files) is removed when it ends"""
+        job = EnrollmentJob(csv_path, images_path)
+        with self._lock:
+            if any(j.status in ("pending", "running") for j in self._jobs.values()):
+                raise ValueError("A bulk enrollment job is already running")
+            self._jobs[job.id] = job
+
+        def target():
+            try:
+                run_enrollment(job, **kwargs)
+            finally:
+                if cleanup_dir:
+                    shutil.rmtree(cleanup_dir, ignore_errors=True)
+
+        threading.Thread(target=target, daemon=True).start()
+        return job
+
+    def get(self, job_id: str) -> Optional[EnrollmentJob]:
+        return self._jobs.get(job_id)
+
+
+# Global instance
+enrollment_jobs = EnrollmentJobs()
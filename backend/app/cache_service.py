@@ -1,86 +1,266 @@
 import redis
 import json
 import os
+import time
+import inspect
+import asyncio
 import functools
-import hashlib
-from datetime import datetime
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import Request
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+# In-process tier: entries live at most this long (Redis keeps the full TTL) so workers
+# never serve each other's stale data for long
+CACHE_L1_TTL_SECONDS = float(os.getenv("CACHE_L1_TTL_SECONDS", "10"))
+CACHE_L1_MAX_ENTRIES = int(os.getenv("CACHE_L1_MAX_ENTRIES", "1024"))
+# Reconnect backoff after a Redis error: 1s, 2s, 4s ... capped here
+CACHE_RECONNECT_MAX_SECONDS = float(os.getenv("CACHE_RECONNECT_MAX_SECONDS", "60"))
+
+# Endpoint arguments that never change the response
+_SKIPPED_ARGS = {"db", "current_user", "request"}
+_MISSING = object()
+
+
+class LRUCache:
+    """Thread-safe TTL + LRU map for the in-process tier"""
+
+    def __init__(self, max_entries: int = CACHE_L1_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return _MISSING
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key: str, value: Any, ttl: float):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
 
 class CacheService:
+    """
+    Two-tier response cache: an in-process TTL/LRU (L1) in front of Redis (L2).
+
+    Concurrent misses for one key are coalesced so the endpoint runs once. A Redis
+    error disables L2 only until the next reconnect attempt (exponential backoff);
+    L1 keeps working in the meantime.
+    """
+
     def __init__(self):
         self.redis_url = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+        self.l1 = LRUCache()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._backoff = 1.0
+        self._retry_at = 0.0
+        self._counters: Dict[str, Dict[str, float]] = {}
+        self.client = None
+        self.enabled = False
+        self._connect()
+
+    def _connect(self):
         try:
-            self.client = redis.from_url(self.redis_url, decode_responses=True)
+            self.client = redis.from_url(self.redis_url, decode_responses=True,
+                                         socket_connect_timeout=0.5, socket_timeout=0.5)
             self.enabled = True
+            self._backoff = 1.0
             print(f"Connected to Redis at {self.redis_url}")
         except Exception as e:
             print(f"Failed to connect to Redis: {e}")
+            self._disable()
+
+    def _disable(self):
+        # Called with a failing client: try again after the backoff instead of giving up for good
+        with self._lock:
             self.enabled = False
+            self._retry_at = time.monotonic() + self._backoff
+            self._backoff = min(self._backoff * 2, CACHE_RECONNECT_MAX_SECONDS)
+
+    def _available(self) -> bool:
+        if self.enabled:
+            return True
+        with self._lock:
+            if time.monotonic() < self._retry_at:
+                return False
+            self._retry_at = time.monotonic() + self._backoff  # One reconnect attempt at a time
+        try:
+            client = self.client or redis.from_url(self.redis_url, decode_responses=True,
+                                                   socket_connect_timeout=0.5, socket_timeout=0.5)
+            client.ping()
+        except Exception as e:
+            print(f"Redis still unavailable: {e}")
+            self._disable()
+            return False
+        self.client = client
+        self.enabled = True
+        self._backoff = 1.0
+        print(f"Reconnected to Redis at {self.redis_url}")
+        return True
 
     def get(self, key: str):
-        if not self.enabled: return None
+        if not self._available(): return None
         try:
             return self.client.get(key)
         except Exception as e:
             print(f"Redis get failed: {e}")
-            self.enabled = False
+            self._disable()
             return None
 
     def set(self, key: str, value: str, ttl: int = 60):
-        if not self.enabled: return
+        if not self._available(): return
         try:
             self.client.setex(key, ttl, value)
         except Exception as e:
             print(f"Redis set failed: {e}")
-            self.enabled = False
+            self._disable()
+
+    def _count(self, prefix: str, counter: str, amount: float = 1):
+        with self._lock:
+            counters = self._counters.setdefault(prefix, {})
+            counters[counter] = counters.get(counter, 0) + amount
+
+    def _key(self, name: str, signature: inspect.Signature, args, kwargs, request: Optional[Request]) -> str:
+        """Function name, request path and every argument that shapes the response, in signature order"""
+        bound = signature.bind_partial(*args, **kwargs)
+        bound.apply_defaults()
+        key_parts = [name]
+        if request is not None:
+            key_parts.append(request.url.path)
+        for k, v in bound.arguments.items():
+            if k in _SKIPPED_ARGS or isinstance(v, (Session, Request)):
+                continue
+            key_parts.append(f"{k}:{v}")
+        return ":".join(key_parts)
+
+    async def _lookup(self, prefix: str, key: str, l1_ttl: float) -> Any:
+        value = self.l1.get(key)
+        if value is not _MISSING:
+            self._count(prefix, "l1_hits")
+            return value
+        start = time.perf_counter()
+        cached = await run_in_threadpool(self.get, key)
+        self._count(prefix, "l2_ms", (time.perf_counter() - start) * 1000)
+        self._count(prefix, "l2_lookups")
+        if cached:
+            value = json.loads(cached)
+            self._count(prefix, "l2_hits")
+            # Later hits in this worker skip the Redis round trip
+            self.l1.set(key, value, l1_ttl)
+            return value
+        return _MISSING
 
     def cache_response(self, ttl: int = 60):
         """
-        Decorator to cache API responses.
-        Generates a key based on function name + args + kwargs.
+        Decorator to cache API responses (sync or async endpoints).
+        The key is the function name + request path + bound arguments (see _key).
         """
+        l1_ttl = min(ttl, CACHE_L1_TTL_SECONDS)
+
         def decorator(func):
-            @functools.wraps(func)
-            async def wrapper(*args, **kwargs):
-                if not self.enabled:
-                    return func(*args, **kwargs)
-
-                # Generate Cache Key
-                # Filter out 'db' session and 'current_user' from args to avoid un-hashable objects
-                # This is a naive implementation; usually we use the Request URL
-                
-                # Better approach: Use a predefined prefix or let the caller specify
-                # For now, let's use a meaningful key structure
-                
-                # Construct key from args (skipping dependencies)
-                key_parts = [func.__name__]
-                for k, v in kwargs.items():
-                    if k not in ['db', 'current_user', 'request']:
-                        key_parts.append(f"{k}:{v}")
-                
-                cache_key = ":".join(key_parts)
-                
-                # Check Cache
-                cached = self.get(cache_key)
-                if cached:
-                    return json.loads(cached)
-                
-                # Execute Function
-                # Handle both async and sync
-                if asyncio.iscoroutinefunction(func):
+            signature = inspect.signature(func)
+            is_async = asyncio.iscoroutinefunction(func)
+            request_arg = next((p.name for p in signature.parameters.values() if p.annotation is Request), None)
+            prefix = func.__name__
+
+            async def fill(key, args, kwargs):
+                start = time.perf_counter()
+                if is_async:
                     result = await func(*args, **kwargs)
                 else:
-                    result = func(*args, **kwargs)
-                
-                # Cache Result
-                # We need to ensure result is JSON serializable
+                    # Sync endpoints do blocking DB work: keep it off the event loop
+                    result = await run_in_threadpool(func, *args, **kwargs)
+                self._count(prefix, "compute_ms", (time.perf_counter() - start) * 1000)
+
+                # Cache Result (only JSON-serializable responses)
                 try:
-                    self.set(cache_key, json.dumps(result), ttl)
-                except Exception as e:
+                    encoded = json.dumps(result)
+                except (TypeError, ValueError) as e:
                     print(f"Cache encoding failed: {e}")
-                
+                    return result
+                self.l1.set(key, result, l1_ttl)
+                await run_in_threadpool(self.set, key, encoded, ttl)
                 return result
+
+            def finished(key, task):
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+                if not task.cancelled():
+                    task.exception()  # Retrieved here in case every waiter went away
+
+            @functools.wraps(func)
+            async def wrapper(*args, **kwargs):
+                request = kwargs.pop("_cache_request", None)
+                if request_arg is not None:
+                    request = kwargs.get(request_arg, request)
+                key = self._key(prefix, signature, args, kwargs, request)
+
+                value = await self._lookup(prefix, key, l1_ttl)
+                if value is not _MISSING:
+                    return value
+
+                # Single flight: concurrent misses share one computation, which runs as its
+                # own task so a disconnecting first caller does not cancel it for the others
+                task = self._inflight.get(key)
+                if task is not None:
+                    self._count(prefix, "coalesced")
+                else:
+                    self._count(prefix, "misses")
+                    task = asyncio.ensure_future(fill(key, args, kwargs))
+                    self._inflight[key] = task
+                    task.add_done_callback(functools.partial(finished, key))
+                return await asyncio.shield(task)
+
+            if request_arg is None:
+                # Ask FastAPI for the Request too, so the path is part of the key
+                params = [p for p in signature.parameters.values() if p.kind != inspect.Parameter.VAR_KEYWORD]
+                params.append(inspect.Parameter("_cache_request", inspect.Parameter.KEYWORD_ONLY,
+                                                annotation=Request, default=None))
+                params += [p for p in signature.parameters.values() if p.kind == inspect.Parameter.VAR_KEYWORD]
+                wrapper.__signature__ = signature.replace(parameters=params)
             return wrapper
         return decorator
 
-import asyncio
+    def stats(self) -> Dict:
+        with self._lock:
+            counters = {prefix: dict(values) for prefix, values in self._counters.items()}
+        per_prefix = {}
+        for prefix, c in counters.items():
+            hits = c.get("l1_hits", 0) + c.get("l2_hits", 0)
+            lookups = hits + c.get("misses", 0) + c.get("coalesced", 0)
+            per_prefix[prefix] = {
+                "l1_hits": int(c.get("l1_hits", 0)),
+                "l2_hits": int(c.get("l2_hits", 0)),
+                "misses": int(c.get("misses", 0)),
+                "coalesced": int(c.get("coalesced", 0)),
+                "hit_rate": round(hits / lookups, 3) if lookups else 0.0,
+                "avg_l2_ms": round(c.get("l2_ms", 0) / c["l2_lookups"], 2) if c.get("l2_lookups") else 0.0,
+                "avg_compute_ms": round(c.get("compute_ms", 0) / c["misses"], 2) if c.get("misses") else 0.0,
+            }
+        return {
+            "redis_enabled": self.enabled,
+            "l1_entries": len(self.l1),
+            "inflight": len(self._inflight),
+            "prefixes": per_prefix,
+        }
+
+
+# Global instance
 cache_service = CacheService()
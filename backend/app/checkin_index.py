@@ -0,0 +1,96 @@
+import time
+import threading
+from datetime import datetime, timedelta
+from typing import Dict
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.models import Attendance
+
+
+class RecentCheckins:
+    """
+    Students who checked in successfully within the duplicate window.
+
+    Maps student_id -> time.monotonic() deadline; a matched scan before the deadline is
+    a repeat and is answered without another Attendance row or SSE broadcast.
+    Expired entries are swept at most every `sweep_interval` seconds, on access.
+    """
+
+    def __init__(self, sweep_interval: float = 60.0):
+        self.sweep_interval = sweep_interval
+        self._deadlines: Dict[int, float] = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.monotonic() + sweep_interval
+
+        # Metrics
+        self.checkins = 0
+        self.duplicates = 0
+        self.rebuilt = 0
+
+    def _sweep(self, now: float):
+        if now < self._next_sweep:
+            return
+        self._deadlines = {sid: deadline for sid, deadline in self._deadlines.items() if deadline > now}
+        self._next_sweep = now + self.sweep_interval
+
+    def check_in(self, student_id: int, window_seconds: float) -> bool:
+        """Record a successful match; False when it repeats one inside the window"""
+        if window_seconds <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            self._sweep(now)
+            deadline = self._deadlines.get(student_id)
+            if deadline is not None and deadline > now:
+                self.duplicates += 1
+                return False
+            self._deadlines[student_id] = now + window_seconds
+            self.checkins += 1
+            return True
+
+    def forget(self, student_id: int):
+        """Undo a check_in whose attendance row could not be written"""
+        with self._lock:
+            self._deadlines.pop(student_id, None)
+
+    def rebuild(self, db: Session, window_seconds: float):
+        """Reload the window from recent successful attendance rows (after a restart)"""
+        with self._lock:
+            self._deadlines = {}
+        if window_seconds <= 0:
+            return
+        utcnow = datetime.utcnow()
+        rows = (
+            db.query(Attendance.student_id, func.max(Attendance.timestamp))
+            .filter(Attendance.verification_status == "success",
+                    Attendance.timestamp >= utcnow - timedelta(seconds=window_seconds))
+            .group_by(Attendance.student_id)
+            .all()
+        )
+        now = time.monotonic()
+        with self._lock:
+            for student_id, last_seen in rows:
+                # Attendance timestamps are wall-clock UTC; convert the remaining time once
+                remaining = window_seconds - (utcnow - last_seen).total_seconds()
+                if remaining > 0:
+                    self._deadlines[student_id] = now + remaining
+            self.rebuilt = len(self._deadlines)
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            active = sum(1 for deadline in self._deadlines.values() if deadline > now)
+            tracked = len(self._deadlines)
+        return {
+            "active": active,
+            "tracked": tracked,
+            "checkins": self.checkins,
+            "duplicates": self.duplicates,
+            "rebuilt_from_db": self.rebuilt,
+        }
+
+
+# Global instance
+recent_checkins = RecentCheckins()
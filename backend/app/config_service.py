@@ -6,7 +6,16 @@ DEFAULT_CONFIGS = {
     "MIN_MATCH_SCORE": {"value": "0.6", "description": "Minimum score (0-1) for biometric match"},
     "LIVENESS_THRESHOLD": {"value": "0.7", "description": "Threshold (0-1) for liveness confidence"},
     "REGISTRATION_ENABLED": {"value": "true", "description": "Enable/Disable new student registration"},
-    "MAINTENANCE_MODE": {"value": "false", "description": "Enable maintenance mode (only admins can access)"}
+    "MAINTENANCE_MODE": {"value": "false", "description": "Enable maintenance mode (only admins can access)"},
+    "CASCADE_ENABLED": {"value": "false", "description": "Shortlist students by eye score before fingerprint matching"},
+    "CASCADE_TOP_K": {"value": "50", "description": "Number of eye-ranked students kept for fingerprint matching"},
+    "CASCADE_AUDIT_RATE": {"value": "0.02", "description": "Fraction (0-1) of cascade/ANN verifications re-checked with a full scan"},
+    "ANN_MIN_GALLERY_SIZE": {"value": "20000", "description": "Use the approximate eye index once this many students are enrolled (0 = never)"},
+    "ANN_CANDIDATES": {"value": "200", "description": "Candidates returned by the eye index for fused scoring"},
+    "ANN_PROBES": {"value": "16", "description": "Inverted lists scanned per eye index query"},
+    "VERIFY_MICROBATCH_MS": {"value": "0", "description": "Coalesce concurrent /api/verify calls arriving within this many ms (0 = off)"},
+    "VERIFY_BATCH_MAX_ITEMS": {"value": "32", "description": "Maximum captures accepted by /api/verify/batch"},
+    "DUPLICATE_CHECKIN_WINDOW_SECONDS": {"value": "300", "description": "Repeat check-ins by a student within this many seconds are not recorded again (0 = off)"}
 }
 
 class ConfigService:
@@ -63,6 +72,14 @@ class ConfigService:
         except:
             return float(DEFAULT_CONFIGS.get(key, {}).get("value", 0.0))
 
+    def get_int(self, db: Session, key: str) -> int:
+        """Helper to get integer config"""
+        val = self.get_config(db, key)
+        try:
+            return int(float(val))
+        except:
+            return int(float(DEFAULT_CONFIGS.get(key, {}).get("value", 0)))
+
     def get_bool(self, db: Session, key: str) -> bool:
         """Helper to get boolean config"""
         val = self.get_config(db, key)
@@ -0,0 +1,168 @@
+import os
+import time
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Optional, Union
+
+from app.biometric_extractor import BiometricExtractor
+from app.extractor_pool import extractor_pool
+from app.image_pipeline import THUMB_WORKING_MAX_SIDE, timed
+
+# Warm extractor owned by each pool worker process
+_worker_extractor: Optional[BiometricExtractor] = None
+
+
+def init_worker():
+    """Pool initializer: build the FaceMesh graph once per worker process (any process pool)"""
+    global _worker_extractor
+    _worker_extractor = BiometricExtractor()
+
+
+def _warmup() -> int:
+    return os.getpid()
+
+
+def _extract(extractor: BiometricExtractor,
+             eye_data: Union[str, bytes], thumb_data: Union[str, bytes], submitted_at: float) -> Dict:
+    started_at = time.time()
+    compute_start = time.perf_counter()
+
+    timings: Dict[str, float] = {}
+    with timed(timings, "decode_eye"):
+        eye_image = extractor.base64_to_image(eye_data)
+    with timed(timings, "decode_thumb"):
+        thumb_image = extractor.base64_to_image(thumb_data, THUMB_WORKING_MAX_SIDE)
+
+    eye_features = extractor.extract_eye_features(eye_image, timings)
+    thumb_features = extractor.extract_fingerprint_features(thumb_image, timings)
+
+    return {
+        "eye_features": eye_features,
+        "thumb_features": thumb_features,
+        "queue_wait": max(0.0, started_at - submitted_at),
+        "compute": time.perf_counter() - compute_start,
+        "stages": timings,
+    }
+
+
+def run_extraction(eye_data: Union[str, bytes], thumb_data: Union[str, bytes], submitted_at: float) -> Dict:
+    """Decode both captures and extract features (runs inside a worker set up by init_worker)"""
+    global _worker_extractor
+    if _worker_extractor is None:
+        _worker_extractor = BiometricExtractor()
+    return _extract(_worker_extractor, eye_data, thumb_data, submitted_at)
+
+
+def _run_inline(eye_data, thumb_data, submitted_at) -> Dict:
+    """Fallback when the process pool is disabled: borrow from the in-process extractor pool"""
+    with extractor_pool.checkout() as extractor:
+        return _extract(extractor, eye_data, thumb_data, submitted_at)
+
+
+class ExtractionExecutor:
+    """
+    Runs biometric extraction off the asyncio event loop.
+    By default (EXTRACTION_WORKERS unset or 0) it uses threads borrowing from the
+    in-process ExtractorPool, so no extra processes are started on small hosts. Setting
+    EXTRACTION_WORKERS to N starts a process pool of N workers, each keeping a warm
+    BiometricExtractor.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        if workers is None:
+            workers = int(os.getenv("EXTRACTION_WORKERS", "0"))
+        self.workers = max(0, workers)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.compute_total = 0.0
+        self.compute_max = 0.0
+        self.stage_totals: Dict[str, float] = {}
+
+    def _get_pool(self) -> Optional[ProcessPoolExecutor]:
+        if self.workers == 0:
+            return None
+        with self._lock:
+            if self._pool is None:
+                # spawn: never fork a process that already holds MediaPipe / DB threads
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=init_worker,
+                )
+            return self._pool
+
+    def start(self):
+        """Create the pool and warm every worker so the first requests skip graph setup"""
+        pool = self._get_pool()
+        if pool is None:
+            extractor_pool.warm()
+            return
+        for _ in range(self.workers):
+            pool.submit(_warmup)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True, cancel_futures=True)
+                self._pool = None
+
+    async def extract(self, eye_data: Union[str, bytes], thumb_data: Union[str, bytes]) -> Dict:
+        """Extract eye + fingerprint features from base64 strings or raw image bytes"""
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        func = run_extraction if pool is not None else _run_inline
+
+        self.in_flight += 1
+        try:
+            result = await loop.run_in_executor(pool, func, eye_data, thumb_data, time.time())
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); drop the pool so the next call starts a fresh one
+            self.failed += 1
+            with self._lock:
+                if self._pool is pool:
+                    self._pool = None
+            pool.shutdown(wait=False)
+            raise
+        except Exception:
+            self.failed += 1
+            raise
+        finally:
+            self.in_flight -= 1
+
+        self.completed += 1
+        self.queue_wait_total += result["queue_wait"]
+        self.queue_wait_max = max(self.queue_wait_max, result["queue_wait"])
+        self.compute_total += result["compute"]
+        self.compute_max = max(self.compute_max, result["compute"])
+        for stage, seconds in result["stages"].items():
+            self.stage_totals[stage] = self.stage_totals.get(stage, 0.0) + seconds
+        return result
+
+    def stats(self) -> Dict:
+        done = max(1, self.completed)
+        return {
+            "mode": "process_pool" if self.workers else "thread_extractor_pool",
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_queue_wait_ms": round(self.queue_wait_total / done * 1000, 2),
+            "max_queue_wait_ms": round(self.queue_wait_max * 1000, 2),
+            "avg_compute_ms": round(self.compute_total / done * 1000, 2),
+            "max_compute_ms": round(self.compute_max * 1000, 2),
+            "avg_stage_ms": {stage: round(total / done * 1000, 2) for stage, total in self.stage_totals.items()},
+        }
+
+
+# Global instance
+extraction_executor = ExtractionExecutor()
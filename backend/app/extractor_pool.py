@@ -0,0 +1,123 @@
+import os
+import time
+import queue
+import threading
+import contextlib
+from typing import Callable, Dict, Optional
+
+from app.biometric_extractor import BiometricExtractor
+
+
+class ExtractorPool:
+    """
+    Bounded pool of BiometricExtractor instances.
+    MediaPipe graphs must not run concurrent process() calls, so every caller checks an
+    extractor out, uses it exclusively and checks it back in.
+    """
+
+    def __init__(self, size: Optional[int] = None,
+                 factory: Callable[[], BiometricExtractor] = BiometricExtractor,
+                 timeout: float = 30.0):
+        if size is None:
+            size = int(os.getenv("EXTRACTOR_POOL_SIZE", str(min(4, os.cpu_count() or 1))))
+        self.size = max(1, size)
+        self.factory = factory
+        self.timeout = timeout
+        self._idle: "queue.LifoQueue[BiometricExtractor]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._started_at = time.perf_counter()
+
+        # Metrics
+        self.checkouts = 0
+        self.timeouts = 0
+        self.busy = 0
+        self.peak_busy = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.busy_time_total = 0.0
+
+    def _acquire(self, timeout: float) -> BiometricExtractor:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                create = True
+            else:
+                create = False
+        if create:
+            try:
+                return self.factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            self.timeouts += 1
+            raise RuntimeError(f"No biometric extractor available after {timeout:.0f}s (pool size {self.size})")
+
+    @contextlib.contextmanager
+    def checkout(self, timeout: Optional[float] = None):
+        """Borrow an extractor for exclusive use"""
+        wait_start = time.perf_counter()
+        extractor = self._acquire(self.timeout if timeout is None else timeout)
+        waited = time.perf_counter() - wait_start
+
+        with self._lock:
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+            self.busy += 1
+            self.peak_busy = max(self.peak_busy, self.busy)
+
+        busy_start = time.perf_counter()
+        try:
+            yield extractor
+        finally:
+            with self._lock:
+                self.busy -= 1
+                self.busy_time_total += time.perf_counter() - busy_start
+            self._idle.put(extractor)
+
+    def warm(self):
+        """Pre-create every instance so no request pays for graph construction"""
+        while True:
+            with self._lock:
+                if self._created >= self.size:
+                    return
+                self._created += 1
+            try:
+                extractor = self.factory()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            self._idle.put(extractor)
+
+    def stats(self) -> Dict:
+        elapsed = max(1e-9, time.perf_counter() - self._started_at)
+        checkouts = max(1, self.checkouts)
+        return {
+            "size": self.size,
+            "created": self._created,
+            "idle": self._idle.qsize(),
+            "busy": self.busy,
+            "peak_busy": self.peak_busy,
+            "checkouts": self.checkouts,
+            "timeouts": self.timeouts,
+            "avg_wait_ms": round(self.wait_total / checkouts * 1000, 2),
+            "max_wait_ms": round(self.wait_max * 1000, 2),
+            "utilisation": round(self.busy_time_total / (self.size * elapsed), 4),
+            "cpu_count": os.cpu_count(),
+        }
+
+
+# Global instance
+extractor_pool = ExtractorPool()
@@ -0,0 +1,145 @@
+import numpy as np
+from typing import Sequence
+
+# ORB descriptors are 256-bit strings packed into 32 bytes
+DESCRIPTOR_BYTES = 32
+MAX_DISTANCE = DESCRIPTOR_BYTES * 8
+
+# Templates keep the strongest keypoints' descriptors (64 x 32 = 2048 bytes); older
+# templates hold the first 31 (1000 bytes) and are still matched as-is
+TEMPLATE_DESCRIPTORS = 64
+
+# Fraction of descriptors passing the ratio test at which a print counts as a full match.
+# Genuine re-captures (small rotation, shift, sensor noise) land at 0.4-0.7 and unrelated
+# prints below 0.05, so this maps genuine thumbs back to the 0.85-1.0 range the
+# MIN_MATCH_SCORE thresholds were set for.
+FULL_MATCH_FRACTION = 0.4
+
+# Upper bound for the (batch, width, probe, 32) XOR block built per distance batch
+BATCH_BYTES = 16 * 1024 * 1024
+
+# Bit count of every byte value, used to popcount XOR-ed descriptors
+POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+# Same for 16-bit words: half the lookups per descriptor
+_WORDS = np.arange(1 << 16)
+POPCOUNT_TABLE_16 = POPCOUNT_TABLE[_WORDS & 0xFF] + POPCOUNT_TABLE[_WORDS >> 8]
+
+
+def to_descriptors(feature_vector) -> np.ndarray:
+    """
+    Unflatten a stored ORB feature vector into (k, 32) packed descriptors.
+    Trailing partial descriptors and all-zero rows (padding / placeholder output) are dropped.
+    """
+    vec = np.asarray(feature_vector)
+    if vec.dtype != np.uint8:
+        vec = vec.astype(np.uint8)
+    count = len(vec) // DESCRIPTOR_BYTES
+    descriptors = vec[:count * DESCRIPTOR_BYTES].reshape(count, DESCRIPTOR_BYTES)
+    return descriptors[descriptors.any(axis=1)]
+
+
+def select_descriptors(keypoints, descriptors: np.ndarray, limit: int = TEMPLATE_DESCRIPTORS) -> np.ndarray:
+    """Descriptors of the `limit` strongest keypoints, strongest first (stable on re-captures)"""
+    order = np.argsort([-kp.response for kp in keypoints], kind="stable")[:limit]
+    return descriptors[order]
+
+
+class FingerprintMatcher:
+    """
+    Hamming-distance matcher over the packed ORB descriptors of a whole gallery.
+    Each student contributes up to `width` descriptors; distances are computed in batches
+    with vectorized XOR + table popcount, and the score is the fraction of descriptors
+    that pass the ratio test, scaled so that `full_match_fraction` scores 1.0.
+    """
+
+    def __init__(self, descriptors: np.ndarray, counts: np.ndarray,
+                 ratio: float = 0.75, max_match_distance: int = 64, batch_size: int = 256,
+                 full_match_fraction: float = FULL_MATCH_FRACTION):
+        self.descriptors = descriptors  # (N, width, 32) uint8, valid rows first
+        self.counts = counts            # (N,) number of valid descriptors per student
+        self.ratio = ratio
+        self.max_match_distance = max_match_distance
+        self.batch_size = batch_size
+        self.full_match_fraction = full_match_fraction
+
+    @classmethod
+    def from_descriptor_sets(cls, descriptor_sets: Sequence[np.ndarray], **kwargs) -> "FingerprintMatcher":
+        width = max((len(d) for d in descriptor_sets), default=0)
+        packed = np.zeros((len(descriptor_sets), width, DESCRIPTOR_BYTES), dtype=np.uint8)
+        counts = np.zeros(len(descriptor_sets), dtype=np.int32)
+        for i, desc in enumerate(descriptor_sets):
+            packed[i, :len(desc)] = desc
+            counts[i] = len(desc)
+        return cls(packed, counts, **kwargs)
+
+    @classmethod
+    def stacked(cls, first: "FingerprintMatcher", second: "FingerprintMatcher") -> "FingerprintMatcher":
+        """Concatenate two matchers, padding descriptor slots to the wider one"""
+        width = max(first.descriptors.shape[1], second.descriptors.shape[1])
+        pad = lambda d: np.pad(d, ((0, 0), (0, width - d.shape[1]), (0, 0)))
+        return cls(
+            np.concatenate([pad(first.descriptors), pad(second.descriptors)]),
+            np.concatenate([first.counts, second.counts]),
+            ratio=first.ratio, max_match_distance=first.max_match_distance, batch_size=first.batch_size,
+            full_match_fraction=first.full_match_fraction
+        )
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    @property
+    def nbytes(self) -> int:
+        return self.descriptors.nbytes + self.counts.nbytes
+
+    def distances(self, probe: np.ndarray, start: int, stop: int) -> np.ndarray:
+        """Hamming distances (B, width, P) between a probe and students [start, stop)"""
+        block = self.descriptors[start:stop]
+        words = np.ascontiguousarray(block).view(np.uint16)
+        probe_words = np.ascontiguousarray(probe).view(np.uint16)
+        xor = np.bitwise_xor(words[:, :, None, :], probe_words[None, None, :, :])
+        dist = POPCOUNT_TABLE_16[xor].sum(axis=-1, dtype=np.uint16)
+
+        # Padding descriptors must never win a match
+        width = block.shape[1]
+        invalid = np.arange(width)[None, :] >= self.counts[start:stop, None]
+        dist[invalid] = MAX_DISTANCE + 1
+        return dist
+
+    def scores(self, probe_feature_vector) -> np.ndarray:
+        """Ratio-test match score (0-1) of a probe against every student"""
+        probe = to_descriptors(probe_feature_vector)
+        total = len(self)
+        result = np.zeros(total, dtype=np.float32)
+        width = self.descriptors.shape[1]
+        if total == 0 or width == 0 or len(probe) == 0:
+            return result
+
+        batch_size = max(1, min(self.batch_size, BATCH_BYTES // (width * len(probe) * DESCRIPTOR_BYTES)))
+        for start in range(0, total, batch_size):
+            stop = min(start + batch_size, total)
+            dist = self.distances(probe, start, stop)
+
+            # Best and second best gallery descriptor for every probe descriptor
+            if width > 1:
+                two = np.partition(dist, 1, axis=1)
+                d1, d2 = two[:, 0, :], two[:, 1, :]
+            else:
+                d1 = dist[:, 0, :]
+                d2 = np.full_like(d1, MAX_DISTANCE + 1)
+
+            good = (d1 <= self.max_match_distance) & (d1 < self.ratio * d2)
+            matched = good.sum(axis=1)
+
+            possible = np.minimum(len(probe), self.counts[start:stop])
+            fraction = matched / np.maximum(possible, 1)
+            result[start:stop] = np.minimum(1.0, fraction / self.full_match_fraction)
+
+        return result
+
+    def subset(self, indices: np.ndarray) -> "FingerprintMatcher":
+        """Matcher restricted to the given gallery rows (e.g. a cascade shortlist)"""
+        return FingerprintMatcher(
+            self.descriptors[indices], self.counts[indices],
+            ratio=self.ratio, max_match_distance=self.max_match_distance, batch_size=self.batch_size,
+            full_match_fraction=self.full_match_fraction
+        )
@@ -0,0 +1,279 @@
+import numpy as np
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.fingerprint_matcher import FingerprintMatcher, to_descriptors
+
+# Fusion weights (Eye is more reliable with MediaPipe)
+EYE_WEIGHT = 0.6
+THUMB_WEIGHT = 0.4
+
+
+def _as_vector(values) -> np.ndarray:
+    return np.asarray(values, dtype=np.float32).ravel()
+
+
+def _unit_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale every row to unit length (zero rows stay zero)"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / (norms + 1e-7)
+
+
+def _centered_unit_rows(matrix: np.ndarray) -> np.ndarray:
+    """Center and scale rows so a dot product equals HISTCMP_CORREL"""
+    if matrix.size == 0:
+        return matrix
+    centered = matrix - matrix.mean(axis=1, keepdims=True)
+    return _unit_rows(centered)
+
+
+def _stack(vectors: List[np.ndarray], width: int) -> np.ndarray:
+    """Stack variable-length vectors into a zero-padded float32 matrix"""
+    matrix = np.zeros((len(vectors), width), dtype=np.float32)
+    for i, vec in enumerate(vectors):
+        n = min(len(vec), width)
+        matrix[i, :n] = vec[:n]
+    return matrix
+
+
+def _vstack_padded(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """Stack two row matrices, zero padding the narrower one"""
+    width = max(a.shape[1], b.shape[1])
+    a = np.pad(a, ((0, 0), (0, width - a.shape[1])))
+    b = np.pad(b, ((0, 0), (0, width - b.shape[1])))
+    return np.vstack([a, b])
+
+
+def _fit_probe(vec: np.ndarray, width: int, center: bool = False) -> np.ndarray:
+    """
+    Normalize a captured vector and fit it to the gallery width.
+    Normalizing before truncation keeps the legacy zero-padding semantics:
+    extra dimensions still count towards the probe norm.
+    """
+    if center:
+        vec = vec - vec.mean()
+    vec = vec / (np.linalg.norm(vec) + 1e-7)
+    if len(vec) >= width:
+        return vec[:width]
+    return np.pad(vec, (0, width - len(vec)))
+
+
+def _eye_similarity_to_score(similarity: np.ndarray) -> np.ndarray:
+    """Map cosine (-1..1) to 0..1 and boost near-exact geometry matches"""
+    scores = (similarity + 1) / 2
+    return np.where(scores > 0.95, np.minimum(1.0, scores * 1.05), scores)
+
+
+def _fuse_thumb(orb_score: np.ndarray, hist_sim: np.ndarray) -> np.ndarray:
+    """Weighted Score: 70% ORB, 30% Histogram"""
+    return np.clip(orb_score * 0.7 + np.maximum(0, hist_sim) * 0.3, 0, 1)
+
+
+class MatchResult:
+    """Best gallery candidate for a capture"""
+
+    def __init__(self, student_id: int, eye_score: float, thumb_score: float, total_score: float):
+        self.student_id = student_id
+        self.eye_score = eye_score
+        self.thumb_score = thumb_score
+        self.total_score = total_score
+
+
+class BiometricGallery:
+    """
+    Matrix view of every enrolled template.
+    Eye vectors and texture histograms are stored as pre-normalized float32 matrices so a
+    capture is scored against all students with one matrix-vector product; ORB descriptors
+    are matched with batched Hamming distances.
+    """
+
+    def __init__(self, student_ids, eye_matrix, fingerprints: FingerprintMatcher, hist_matrix):
+        self.student_ids = np.asarray(student_ids, dtype=np.int64)
+        self.eye_matrix = eye_matrix
+        self.fingerprints = fingerprints
+        self.hist_matrix = hist_matrix
+        self._row_lookup = None
+
+    @classmethod
+    def from_templates(cls, templates: Iterable[Tuple[int, Dict, Dict]]) -> "BiometricGallery":
+        """Build a gallery from (student_id, eye_features, thumb_features) tuples"""
+        ids, eyes, thumbs, hists = [], [], [], []
+        for student_id, eye_features, thumb_features in templates:
+            ids.append(student_id)
+            eyes.append(_as_vector(eye_features["feature_vector"]))
+            thumbs.append(to_descriptors(thumb_features["feature_vector"]))
+            hists.append(_as_vector(thumb_features["texture_histogram"]))
+
+        eye_width = max((len(v) for v in eyes), default=0)
+        hist_width = max((len(v) for v in hists), default=0)
+
+        return cls(
+            ids,
+            _unit_rows(_stack(eyes, eye_width)),
+            FingerprintMatcher.from_descriptor_sets(thumbs),
+            _centered_unit_rows(_stack(hists, hist_width)),
+        )
+
+    def merged(self, templates: Iterable[Tuple[int, Dict, Dict]], remove_ids: Iterable[int] = ()) -> "BiometricGallery":
+        """New gallery with `templates` replacing or extending rows and `remove_ids` dropped"""
+        update = BiometricGallery.from_templates(templates)
+        dropped = np.concatenate([update.student_ids, np.asarray(list(remove_ids), dtype=np.int64)])
+        keep = ~np.isin(self.student_ids, dropped)
+        if keep.all() and len(update) == 0:
+            return self
+
+        return BiometricGallery(
+            np.concatenate([self.student_ids[keep], update.student_ids]),
+            _vstack_padded(self.eye_matrix[keep], update.eye_matrix),
+            FingerprintMatcher.stacked(self.fingerprints.subset(keep), update.fingerprints),
+            _vstack_padded(self.hist_matrix[keep], update.hist_matrix),
+        )
+
+    def __len__(self) -> int:
+        return len(self.student_ids)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(m.nbytes for m in (self.student_ids, self.eye_matrix, self.fingerprints, self.hist_matrix))
+
+    def rows_for(self, student_ids) -> np.ndarray:
+        """Gallery row index of each student id (unknown ids are dropped)"""
+        if self._row_lookup is None:
+            self._row_lookup = {int(sid): row for row, sid in enumerate(self.student_ids)}
+        rows = [self._row_lookup.get(int(sid)) for sid in student_ids]
+        return np.array([r for r in rows if r is not None], dtype=np.int64)
+
+    def eye_scores(self, eye_features: Dict, candidates: Optional[np.ndarray] = None) -> np.ndarray:
+        """Eye similarity (0-1) of a capture against every student (or only `candidates`)"""
+        eye_matrix = self.eye_matrix if candidates is None else self.eye_matrix[candidates]
+        probe = _fit_probe(_as_vector(eye_features["feature_vector"]), eye_matrix.shape[1])
+        return _eye_similarity_to_score(eye_matrix @ probe)
+
+    def thumb_scores(self, thumb_features: Dict, candidates: Optional[np.ndarray] = None) -> np.ndarray:
+        """Fingerprint similarity (0-1) of a capture against every student (or only `candidates`)"""
+        fingerprints = self.fingerprints
+        hist_matrix = self.hist_matrix
+        if candidates is not None:
+            fingerprints = fingerprints.subset(candidates)
+            hist_matrix = hist_matrix[candidates]
+
+        orb_score = fingerprints.scores(thumb_features["feature_vector"])
+
+        hist_probe = _fit_probe(
+            _as_vector(thumb_features["texture_histogram"]), hist_matrix.shape[1], center=True
+        )
+        return _fuse_thumb(orb_score, hist_matrix @ hist_probe)
+
+    def shortlist(self, eye_scores: np.ndarray, top_k: int) -> np.ndarray:
+        """Indices of the `top_k` best eye scores, best first"""
+        if top_k >= len(eye_scores):
+            return np.argsort(-eye_scores, kind="stable")
+        top = np.argpartition(-eye_scores, top_k - 1)[:top_k]
+        return top[np.argsort(-eye_scores[top], kind="stable")]
+
+    def best_match(self, eye_features: Dict, thumb_features: Dict,
+                   top_k: Optional[int] = None,
+                   candidates: Optional[np.ndarray] = None) -> Optional[MatchResult]:
+        """
+        Score a capture and return the top fused candidate.
+        With `top_k`, students are ranked by the cheap eye score first and fingerprints
+        are only compared for that shortlist (cascade mode). `candidates` restricts
+        scoring to rows chosen elsewhere (e.g. by the ANN index).
+        """
+        if len(self) == 0 or (candidates is not None and len(candidates) == 0):
+            return None
+
+        eye = self.eye_scores(eye_features, candidates)
+        if top_k and top_k < len(eye):
+            shortlist = self.shortlist(eye, top_k)
+            eye = eye[shortlist]
+            candidates = shortlist if candidates is None else candidates[shortlist]
+
+        thumb = self.thumb_scores(thumb_features, candidates)
+        return self._pick(eye, thumb, candidates)
+
+    def best_matches(self, captures: List[Tuple[Dict, Dict]],
+                     top_k: Optional[int] = None) -> List[Optional[MatchResult]]:
+        """
+        best_match for many (eye_features, thumb_features) captures at once.
+        Eye and histogram similarities of the whole batch come from one matrix-matrix
+        product each; fingerprints are still matched per capture.
+        """
+        if not captures:
+            return []
+        if len(self) == 0:
+            return [None] * len(captures)
+
+        eye_probes = np.stack([
+            _fit_probe(_as_vector(eye["feature_vector"]), self.eye_matrix.shape[1]) for eye, _ in captures
+        ], axis=1)
+        hist_probes = np.stack([
+            _fit_probe(_as_vector(thumb["texture_histogram"]), self.hist_matrix.shape[1], center=True)
+            for _, thumb in captures
+        ], axis=1)
+        eye_all = _eye_similarity_to_score(self.eye_matrix @ eye_probes)
+        hist_all = self.hist_matrix @ hist_probes
+
+        results = []
+        for col, (_, thumb_features) in enumerate(captures):
+            eye = eye_all[:, col]
+            hist = hist_all[:, col]
+            fingerprints = self.fingerprints
+            candidates = None
+            if top_k and top_k < len(eye):
+                candidates = self.shortlist(eye, top_k)
+                eye, hist = eye[candidates], hist[candidates]
+                fingerprints = fingerprints.subset(candidates)
+
+            thumb = _fuse_thumb(fingerprints.scores(thumb_features["feature_vector"]), hist)
+            results.append(self._pick(eye, thumb, candidates))
+        return results
+
+    def _pick(self, eye: np.ndarray, thumb: np.ndarray, candidates: Optional[np.ndarray]) -> Optional[MatchResult]:
+        total = eye * EYE_WEIGHT + thumb * THUMB_WEIGHT
+
+        best = int(np.argmax(total))
+        if total[best] <= 0:
+            return None
+
+        row = best if candidates is None else int(candidates[best])
+        return MatchResult(
+            student_id=int(self.student_ids[row]),
+            eye_score=float(eye[best]),
+            thumb_score=float(thumb[best]),
+            total_score=float(total[best]),
+        )
+
+
+class CascadeStats:
+    """Counters for cascade verification and its shortlist quality"""
+
+    def __init__(self):
+        self.cascade_requests = 0
+        self.ann_requests = 0
+        self.full_requests = 0
+        self.audited = 0
+        self.shortlist_misses = 0
+
+    def record_audit(self, cascade_match: Optional[MatchResult], full_match: Optional[MatchResult]):
+        """Compare a cascade result against an exhaustive scan of the same capture"""
+        self.audited += 1
+        cascade_id = cascade_match.student_id if cascade_match else None
+        full_id = full_match.student_id if full_match else None
+        # Inside the shortlist both paths score identically, so a different winner
+        # means the true best match was cut by the eye ranking
+        if cascade_id != full_id:
+            self.shortlist_misses += 1
+
+    def stats(self) -> Dict:
+        return {
+            "cascade_requests": self.cascade_requests,
+            "ann_requests": self.ann_requests,
+            "full_requests": self.full_requests,
+            "audited": self.audited,
+            "shortlist_misses": self.shortlist_misses,
+            "shortlist_miss_rate": round(self.shortlist_misses / self.audited, 4) if self.audited else 0.0,
+        }
+
+
+# Global instance
+cascade_stats = CascadeStats()
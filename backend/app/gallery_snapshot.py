@@ -0,0 +1,199 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import threading
+import contextlib
+import numpy as np
+from typing import Dict, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: no flock, so workers cannot coordinate publishing (snapshots stay off)
+    fcntl = None
+
+from app.gallery import BiometricGallery
+from app.fingerprint_matcher import FingerprintMatcher
+
+# Arrays written per generation; every worker maps them read-only so the pages are shared
+_ARRAYS = ("student_ids", "eye_matrix", "hist_matrix", "fp_descriptors", "fp_counts")
+
+
+def _is_tmpfs(path: str) -> bool:
+    """True when `path` lives on a RAM-backed filesystem (Linux /proc/mounts)"""
+    path = os.path.realpath(path)
+    best, fstype = "", None
+    try:
+        with open("/proc/mounts") as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 3:
+                    continue
+                mount_point = fields[1].replace("\\040", " ")
+                inside = path == mount_point or path.startswith(mount_point.rstrip("/") + "/")
+                if inside and len(mount_point) > len(best):
+                    best, fstype = mount_point, fields[2]
+    except OSError:
+        return False
+    return fstype in ("tmpfs", "ramfs")
+
+
+def snapshot_root() -> Optional[str]:
+    """
+    Where snapshots may be written, or None to keep the gallery in process memory only.
+
+    The snapshot holds decrypted templates, so without an explicit GALLERY_SNAPSHOT_DIR
+    it is only written to tmpfs (/dev/shm), never to a persistent temp dir.
+    """
+    if fcntl is None:
+        return None
+    explicit = os.getenv("GALLERY_SNAPSHOT_DIR")
+    if explicit:
+        return explicit
+    if os.path.isdir("/dev/shm") and _is_tmpfs("/dev/shm"):
+        return os.path.join("/dev/shm", "holo_gallery")
+    return None
+
+
+def database_key(database_url: str) -> str:
+    """Per-database directory name under the snapshot root"""
+    return hashlib.sha256(database_url.encode()).hexdigest()[:12]
+
+
+class GallerySnapshotStore:
+    """
+    Generations of the decrypted, packed gallery as memory-mapped .npy files.
+
+    Layout:
+        <root>/<db key>/gen-000042/*.npy   arrays of one generation
+        <root>/<db key>/CURRENT            JSON pointer {"generation", "max_id", ...}
+
+    A writer fills a temp directory, renames it to gen-N and then atomically replaces
+    CURRENT, so readers only ever see complete generations.
+    """
+
+    def __init__(self, database_url: str, root: str, keep_generations: int = 2):
+        if fcntl is None:
+            raise RuntimeError("Gallery snapshots need fcntl.flock (not available on this platform)")
+        self.directory = os.path.join(root, database_key(database_url))
+        self.keep_generations = keep_generations
+        self._pointer_stat = None
+        self._pointer = None
+        self._thread_lock = threading.RLock()
+        self._lock_file = None
+        self._lock_depth = 0
+
+        self.published = 0
+        self.mapped = 0
+
+    @property
+    def _pointer_path(self) -> str:
+        return os.path.join(self.directory, "CURRENT")
+
+    def _generation_path(self, generation: int) -> str:
+        return os.path.join(self.directory, f"gen-{generation:06d}")
+
+    @contextlib.contextmanager
+    def lock(self):
+        """Cross-process lock so only one worker builds or publishes at a time (re-entrant)"""
+        with self._thread_lock:
+            if self._lock_depth == 0:
+                os.makedirs(self.directory, exist_ok=True)
+                self._lock_file = open(os.path.join(self.directory, ".lock"), "w")
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._lock_depth += 1
+            try:
+                yield
+            finally:
+                self._lock_depth -= 1
+                if self._lock_depth == 0:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+                    self._lock_file.close()
+                    self._lock_file = None
+
+    def current(self) -> Optional[Dict]:
+        """Pointer of the newest generation (re-read only when the file changes)"""
+        try:
+            st = os.stat(self._pointer_path)
+        except FileNotFoundError:
+            return None
+        key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if key != self._pointer_stat:
+            try:
+                with open(self._pointer_path) as f:
+                    self._pointer = json.load(f)
+                self._pointer_stat = key
+            except (OSError, ValueError):
+                return None
+        return self._pointer
+
+    def publish(self, gallery: BiometricGallery, max_id: int, unreadable=()) -> int:
+        """Write `gallery` as the next generation and point CURRENT at it"""
+        with self.lock():
+            pointer = self.current()
+            generation = (pointer["generation"] if pointer else 0) + 1
+
+            tmp_dir = tempfile.mkdtemp(prefix=".gen-", dir=self.directory)
+            arrays = {
+                "student_ids": gallery.student_ids,
+                "eye_matrix": gallery.eye_matrix,
+                "hist_matrix": gallery.hist_matrix,
+                "fp_descriptors": gallery.fingerprints.descriptors,
+                "fp_counts": gallery.fingerprints.counts,
+            }
+            for name, array in arrays.items():
+                np.save(os.path.join(tmp_dir, f"{name}.npy"), np.ascontiguousarray(array))
+            target = self._generation_path(generation)
+            if os.path.exists(target):
+                shutil.rmtree(target)  # Leftover from a writer that crashed before CURRENT
+            os.rename(tmp_dir, target)
+
+            tmp_pointer = f"{self._pointer_path}.tmp"
+            with open(tmp_pointer, "w") as f:
+                json.dump({
+                    "generation": generation,
+                    "max_id": int(max_id),
+                    "students": len(gallery),
+                    "unreadable": sorted(int(i) for i in unreadable),
+                    "created_at": time.time(),
+                }, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_pointer, self._pointer_path)
+
+            self._prune(generation)
+            self.published += 1
+            return generation
+
+    def _prune(self, newest: int):
+        # Mapped files stay valid after unlink, so old generations can go at once
+        for name in os.listdir(self.directory):
+            if name.startswith("gen-"):
+                generation = int(name[4:])
+                if generation <= newest - self.keep_generations:
+                    shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+
+    def load(self, pointer: Dict) -> BiometricGallery:
+        """Map a generation read-only"""
+        path = self._generation_path(pointer["generation"])
+        arrays = {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r") for name in _ARRAYS}
+        self.mapped += 1
+        return BiometricGallery(
+            arrays["student_ids"],
+            arrays["eye_matrix"],
+            FingerprintMatcher(arrays["fp_descriptors"], arrays["fp_counts"]),
+            arrays["hist_matrix"],
+        )
+
+    def stats(self) -> Dict:
+        pointer = self.current()
+        return {
+            "directory": self.directory,
+            "generation": pointer["generation"] if pointer else None,
+            "students": pointer["students"] if pointer else 0,
+            "published": self.published,
+            "mapped": self.mapped,
+        }
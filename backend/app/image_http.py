@@ -0,0 +1,129 @@
+import os
+import re
+import stat
+from email.utils import formatdate
+from typing import Mapping, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Receive, Scope, Send
+
+# Content-addressed files never change, so browsers may keep them for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+_DIGEST_NAME = re.compile(r"^([0-9a-f]{64})\.\w+$")
+_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeFileResponse(FileResponse):
+    """FileResponse that streams only `length` bytes starting at `offset`"""
+
+    def __init__(self, path: str, offset: int, length: int, **kwargs):
+        super().__init__(path, **kwargs)
+        self.offset = offset
+        self.length = length
+        self.headers["content-length"] = str(length)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            await file.seek(self.offset)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await file.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+
+def _etag_matches(header: str, etag: str) -> bool:
+    """Weak comparison, as If-None-Match requires"""
+    candidates = [tag.strip() for tag in header.split(",")]
+    return "*" in candidates or any((tag[2:] if tag.startswith("W/") else tag) == etag for tag in candidates)
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    (offset, length) of a single `bytes=` range. Returns None when the header should be
+    ignored (malformed or multi-range) and raises ValueError when it is unsatisfiable.
+    """
+    match = _RANGE.match(header.strip())
+    if not match or not any(match.groups()):
+        return None
+    start, end = match.groups()
+    if not start:
+        # Suffix range: the last N bytes
+        length = min(int(end), size)
+        if length == 0:
+            raise ValueError("Empty suffix range")
+        return size - length, length
+    offset = int(start)
+    if offset >= size:
+        raise ValueError("Range starts past the end of the file")
+    last = min(int(end), size - 1) if end else size - 1
+    if last < offset:
+        return None
+    return offset, last - offset + 1
+
+
+def immutable_file_response(request_headers: Mapping[str, str], path: str, etag: str,
+                            stat_result: Optional[os.stat_result] = None) -> Response:
+    """
+    Serve a file that never changes: strong ETag, immutable Cache-Control,
+    If-None-Match -> 304 and single byte-range requests -> 206.
+    """
+    stat_result = stat_result or os.stat(path)
+    size = stat_result.st_size
+    headers = {
+        "etag": etag,
+        "cache-control": IMMUTABLE_CACHE_CONTROL,
+        "accept-ranges": "bytes",
+        "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+    }
+
+    if_none_match = request_headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+
+    range_header = request_headers.get("range")
+    if_range = request_headers.get("if-range")
+    # If-Range needs a strong match; a stale validator gets the whole file
+    if range_header and (not if_range or if_range.strip() == etag):
+        try:
+            byte_range = parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "content-range": f"bytes */{size}"})
+        if byte_range is not None:
+            offset, length = byte_range
+            headers["content-range"] = f"bytes {offset}-{offset + length - 1}/{size}"
+            return RangeFileResponse(path, offset, length, status_code=206, headers=headers,
+                                     stat_result=stat_result)
+
+    return FileResponse(path, headers=headers, stat_result=stat_result)
+
+
+class ImmutableStaticFiles(StaticFiles):
+    """
+    StaticFiles for biometric_storage: content-addressed objects and thumbnails are
+    served with their digest as a strong ETag, immutable caching and range support.
+    Legacy flat files keep the default mtime-based revalidation.
+    """
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        match = _DIGEST_NAME.match(os.path.basename(full_path))
+        if status_code != 200 or match is None or not stat.S_ISREG(stat_result.st_mode):
+            return super().file_response(full_path, stat_result, scope, status_code)
+        parts = os.path.normpath(full_path).split(os.sep)
+        etag = f'"{match.group(1)}"'
+        if "thumbs" in parts:
+            # Same digest, different bytes: tag thumbnails with their size
+            etag = f'"{match.group(1)}-{parts[parts.index("thumbs") + 1]}"'
+        return immutable_file_response(Headers(scope=scope), str(full_path), etag, stat_result)
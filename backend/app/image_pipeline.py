@@ -0,0 +1,86 @@
+import os
+import time
+import base64
+import binascii
+import contextlib
+import cv2
+import numpy as np
+from io import BytesIO
+from PIL import Image
+from typing import Dict, Optional, Tuple, Union
+
+# Longest side fed to FaceMesh (it works on a ~256px face crop internally)
+EYE_WORKING_MAX_SIDE = int(os.getenv("EYE_WORKING_MAX_SIDE", "960"))
+# Longest side fed to ORB; captures up to this size are processed unchanged
+THUMB_WORKING_MAX_SIDE = int(os.getenv("THUMB_WORKING_MAX_SIDE", "1280"))
+# Eye captures are decoded up to this size so the iris crop keeps its detail
+DETAIL_MAX_SIDE = int(os.getenv("DETAIL_MAX_SIDE", "4096"))
+
+# libjpeg can decode at 1/2, 1/4 and 1/8 scale directly, skipping most of the IDCT work
+_REDUCED_MODES = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+@contextlib.contextmanager
+def timed(timings: Optional[Dict[str, float]], stage: str):
+    """Add the duration of the block (seconds) to timings[stage]"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def to_bytes(data: Union[str, bytes]) -> bytes:
+    """Raw encoded image bytes from a base64 string / data URL, or bytes as-is"""
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return bytes(data)
+    if "," in data:
+        data = data.split(",", 1)[1]
+    try:
+        return base64.b64decode(data)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"Invalid base64 image data: {e}")
+
+
+def image_size(buffer: bytes) -> Optional[Tuple[int, int]]:
+    """(width, height) from the image header without decoding pixels"""
+    try:
+        with Image.open(BytesIO(buffer)) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def decode(buffer: bytes, max_side: int) -> np.ndarray:
+    """
+    Decode once to BGR, at the smallest reduced scale whose longest side is still
+    >= max_side, then area-downscale the remainder.
+    """
+    mode = cv2.IMREAD_COLOR
+    size = image_size(buffer)
+    if size is not None:
+        longest = max(size)
+        for factor, reduced_mode in _REDUCED_MODES:
+            if longest // factor >= max_side:
+                mode = reduced_mode
+                break
+
+    image = cv2.imdecode(np.frombuffer(buffer, np.uint8), mode)
+    if image is None:
+        raise ValueError("Failed to process image: unsupported or corrupt image data")
+    return fit(image, max_side)
+
+
+def fit(image: np.ndarray, max_side: int) -> np.ndarray:
+    """Downscale so the longest side is at most max_side (never upscales)"""
+    h, w = image.shape[:2]
+    longest = max(h, w)
+    if longest <= max_side:
+        return image
+    scale = max_side / longest
+    return cv2.resize(image, (max(1, round(w * scale)), max(1, round(h * scale))), interpolation=cv2.INTER_AREA)
@@ -0,0 +1,162 @@
+import os
+import re
+import hashlib
+from typing import Dict, Iterable, Optional, Tuple, Union
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from app.models import StoredImage
+from app.image_pipeline import to_bytes
+from app.image_writer import ImageWriter, image_writer
+
+STORAGE_ROOT = "biometric_storage"
+# Longest side of the derivatives served to the admin grid
+THUMBNAIL_MAX_SIDE = int(os.getenv("THUMBNAIL_MAX_SIDE", "256"))
+THUMBNAIL_QUALITY = int(os.getenv("THUMBNAIL_QUALITY", "80"))
+
+_DIGEST = re.compile(r"^[0-9a-f]{64}$")
+# Session.info key: digest -> (path, raw) of scans to write once the transaction commits
+_PENDING = "image_store_pending"
+
+
+class ImageStore:
+    """
+    Content-addressed, sharded store for biometric scans.
+
+    A scan is named by the sha256 of the uploaded bytes and lives at
+        biometric_storage/objects/<2 hex>/<2 hex>/<digest><ext>
+    so no directory grows past a few hundred entries, identical uploads share one
+    file and nothing is ever overwritten. The `stored_images` table is the manifest
+    (digest -> path); Student.*_image_path points straight at the object.
+    JPEG thumbnails live beside it at biometric_storage/thumbs/<size>/<2>/<2>/<digest>.jpg.
+    """
+
+    def __init__(self, root: str = STORAGE_ROOT, writer: ImageWriter = image_writer,
+                 thumbnails: Optional[ImageWriter] = None):
+        self.root = root
+        self.writer = writer
+        self.thumbnails = thumbnails or ImageWriter(codec="jpeg", quality=THUMBNAIL_QUALITY,
+                                                    max_side=THUMBNAIL_MAX_SIDE, threads=1)
+        self.stored = 0
+        self.deduplicated = 0
+        self.thumbnails_on_demand = 0
+
+    def locate(self, raw: bytes, extension: Optional[str] = None) -> Tuple[str, str]:
+        """(digest, relative object path) of an uploaded image"""
+        digest = hashlib.sha256(raw).hexdigest()
+        extension = extension or self.writer.extension
+        return digest, os.path.join(self.root, "objects", digest[:2], digest[2:4], digest + extension)
+
+    def thumbnail_path(self, digest: str) -> str:
+        size = str(self.thumbnails.max_side)
+        return os.path.join(self.root, "thumbs", size, digest[:2], digest[2:4], digest + ".jpg")
+
+    @staticmethod
+    def digest_of(url: Optional[str]) -> Optional[str]:
+        """Digest of a content-addressed object URL/path (None for legacy flat files)"""
+        if not url or "/objects/" not in url:
+            return None
+        digest = os.path.basename(url).split(".", 1)[0]
+        return digest if _DIGEST.match(digest) else None
+
+    def lookup(self, db: Session, digest: str) -> Optional[StoredImage]:
+        return db.get(StoredImage, digest)
+
+    def record(self, db: Session, entries: Iterable[Dict]):
+        """
+        Add manifest rows (digest, path, kind, source_bytes) to the caller's transaction;
+        the caller commits. Digests that already exist (e.g. stored concurrently by another
+        request) are skipped instead of failing the transaction.
+        """
+        entries = list(entries)
+        if not entries:
+            return
+        dialect = db.get_bind().dialect.name
+        if dialect in ("sqlite", "postgresql"):
+            stmt = (sqlite.insert if dialect == "sqlite" else postgresql.insert)(StoredImage)
+            db.execute(stmt.on_conflict_do_nothing(index_elements=["digest"]), entries)
+            return
+        for entry in entries:
+            if db.get(StoredImage, entry["digest"]) is None:
+                db.add(StoredImage(**entry))
+
+    def save(self, db: Session, data: Union[str, bytes], kind: str) -> str:
+        """
+        Store an uploaded scan and return its URL path.
+        The manifest row joins the caller's transaction and the file is written (in the
+        background) once that transaction commits, so a failed registration leaves
+        neither a manifest row nor a file behind.
+        """
+        raw = to_bytes(data)
+        digest, path = self.locate(raw)
+        pending = self._pending(db)
+        if digest in pending:
+            self.deduplicated += 1  # Same scan twice in one transaction
+            return "/" + pending[digest][0]
+        existing = self.lookup(db, digest)
+        if existing is not None and os.path.exists(existing.path):
+            self.deduplicated += 1
+            return "/" + existing.path
+        if existing is not None:
+            # Committed manifest entry whose write never completed: repair it now
+            self._write(digest, existing.path, raw)
+            return "/" + existing.path
+
+        self.record(db, [{"digest": digest, "path": path, "kind": kind, "source_bytes": len(raw)}])
+        pending[digest] = (path, raw)
+        self.stored += 1
+        return "/" + path
+
+    def _pending(self, db: Session) -> Dict[str, Tuple[str, bytes]]:
+        if _PENDING not in db.info:
+            db.info[_PENDING] = {}
+            event.listen(db, "after_commit", self._write_pending)
+            event.listen(db, "after_transaction_end", self._drop_pending)
+        return db.info[_PENDING]
+
+    def _write_pending(self, session: Session):
+        pending = session.info.get(_PENDING)
+        while pending:
+            digest, (path, raw) = pending.popitem()
+            try:
+                self._write(digest, path, raw)
+            except Exception as e:
+                print(f"Failed to write stored image {path}: {e}")
+
+    def _drop_pending(self, session: Session, transaction):
+        # Rolled back or closed without commit: nothing references these scans
+        if transaction.parent is None and session.info.get(_PENDING):
+            session.info[_PENDING].clear()
+
+    def _write(self, digest: str, path: str, raw: bytes):
+        if not self.writer.submit(path, raw):
+            self.writer.write(path, raw)
+        # Best effort: thumbnail() regenerates it on first request if this is dropped
+        self.thumbnails.submit(self.thumbnail_path(digest), raw)
+
+    def thumbnail(self, db: Session, digest: str) -> Optional[str]:
+        """Path of the thumbnail for a stored scan, generated now if missing"""
+        if not _DIGEST.match(digest):
+            return None
+        path = self.thumbnail_path(digest)
+        if os.path.exists(path):
+            return path
+        stored = self.lookup(db, digest)
+        if stored is None or not os.path.exists(stored.path):
+            return None
+        with open(stored.path, "rb") as f:
+            self.thumbnails.write(path, f.read())
+        self.thumbnails_on_demand += 1
+        return path
+
+    def stats(self) -> Dict:
+        return {"root": self.root, "stored": self.stored, "deduplicated": self.deduplicated}
+
+    def thumbnail_stats(self) -> Dict:
+        return {**self.thumbnails.stats(), "generated_on_demand": self.thumbnails_on_demand}
+
+
+# Global instance
+image_store = ImageStore()
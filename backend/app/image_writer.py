@@ -0,0 +1,178 @@
+import os
+import time
+import queue
+import tempfile
+import threading
+import cv2
+from typing import Dict, List, Optional, Tuple, Union
+
+from app.image_pipeline import decode, to_bytes
+
+# Archival codec: "jpeg", "webp", "png" or "original" (store the uploaded bytes unchanged)
+IMAGE_CODEC = os.getenv("IMAGE_CODEC", "jpeg").lower()
+IMAGE_QUALITY = int(os.getenv("IMAGE_QUALITY", "90"))
+# Longest side of archived scans (0 keeps the capture resolution)
+ARCHIVE_MAX_SIDE = int(os.getenv("ARCHIVE_MAX_SIDE", "0"))
+
+_EXTENSIONS = {"jpeg": ".jpg", "webp": ".webp", "png": ".png", "original": ".jpg"}
+
+
+def _fsync_dir(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class ImageWriter:
+    """
+    Background queue that encodes and persists biometric scans off the request path.
+    Files are written to a temp name, fsynced and renamed, so a reader never sees a
+    partial image; shutdown() drains the queue before the process exits.
+    """
+
+    def __init__(self, codec: str = IMAGE_CODEC, quality: int = IMAGE_QUALITY,
+                 max_side: int = ARCHIVE_MAX_SIDE, threads: Optional[int] = None,
+                 max_queue: int = 256):
+        if codec not in _EXTENSIONS:
+            raise ValueError(f"Unsupported image codec {codec}")
+        self.codec = codec
+        self.quality = quality
+        self.max_side = max_side
+        self.threads = threads or int(os.getenv("IMAGE_WRITER_THREADS", "2"))
+        self._queue: "queue.Queue[Optional[Tuple[str, Union[str, bytes]]]]" = queue.Queue(maxsize=max_queue)
+        self._workers: List[threading.Thread] = []
+        self._lock = threading.Lock()
+
+        # Metrics
+        self.queued = 0
+        self.written = 0
+        self.failed = 0
+        self.inline_writes = 0
+        self.already_present = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.encode_total = 0.0
+        self.write_total = 0.0
+
+    @property
+    def extension(self) -> str:
+        return _EXTENSIONS[self.codec]
+
+    def encode(self, raw: bytes) -> bytes:
+        """Re-encode an uploaded capture with the archival codec (and size)"""
+        if self.codec == "original" and not self.max_side:
+            return raw
+        image = decode(raw, self.max_side or 1 << 30)
+        if self.codec == "webp":
+            extension, params = ".webp", [cv2.IMWRITE_WEBP_QUALITY, self.quality]
+        elif self.codec == "png":
+            extension, params = ".png", [cv2.IMWRITE_PNG_COMPRESSION, 3]
+        else:
+            extension, params = ".jpg", [cv2.IMWRITE_JPEG_QUALITY, self.quality, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+        ok, buffer = cv2.imencode(extension, image, params)
+        if not ok:
+            raise ValueError(f"Failed to encode image as {self.codec}")
+        return buffer.tobytes()
+
+    def write(self, path: str, data: Union[str, bytes]):
+        """Encode and durably write one image (blocking); existing files are left alone"""
+        if os.path.exists(path):
+            with self._lock:
+                self.already_present += 1
+            return
+        start = time.perf_counter()
+        raw = to_bytes(data)
+        payload = self.encode(raw)
+        encoded = time.perf_counter()
+
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        # Private temp name per writer (thread ids repeat across worker processes)
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + ".", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        _fsync_dir(directory)
+
+        with self._lock:
+            self.written += 1
+            self.bytes_in += len(raw)
+            self.bytes_out += len(payload)
+            self.encode_total += encoded - start
+            self.write_total += time.perf_counter() - encoded
+
+    def start(self):
+        with self._lock:
+            if self._workers:
+                return
+            for i in range(self.threads):
+                worker = threading.Thread(target=self._run, name=f"image-writer-{i}", daemon=True)
+                worker.start()
+                self._workers.append(worker)
+
+    def submit(self, path: str, data: Union[str, bytes]) -> bool:
+        """Queue an image; False when the queue is full (the caller should write() it itself)"""
+        self.start()
+        try:
+            self._queue.put_nowait((path, data))
+        except queue.Full:
+            self.inline_writes += 1
+            return False
+        self.queued += 1
+        return True
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            try:
+                if item is None:
+                    return
+                self.write(*item)
+            except Exception as e:
+                self.failed += 1
+                print(f"Failed to persist biometric image {item[0]}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every queued image is on disk"""
+        self._queue.join()
+
+    def shutdown(self):
+        """Drain the queue and stop the writer threads"""
+        with self._lock:
+            workers, self._workers = self._workers, []
+        for _ in workers:
+            self._queue.put(None)
+        for worker in workers:
+            worker.join()
+
+    def stats(self) -> Dict:
+        written = max(1, self.written)
+        return {
+            "codec": self.codec,
+            "quality": self.quality,
+            "archive_max_side": self.max_side,
+            "threads": self.threads,
+            "pending": self._queue.qsize(),
+            "queued": self.queued,
+            "inline_writes": self.inline_writes,
+            "written": self.written,
+            "failed": self.failed,
+            "already_present": self.already_present,
+            "compression_ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else None,
+            "avg_encode_ms": round(self.encode_total / written * 1000, 2),
+            "avg_write_ms": round(self.write_total / written * 1000, 2),
+        }
+
+
+# Global instance
+image_writer = ImageWriter()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, LargeBinary, Float, DateTime, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, LargeBinary, Float, Date, DateTime, ForeignKey, JSON
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
@@ -71,3 +71,22 @@ class AuditLog(Base):
     ip_address = Column(String)
     details = Column(JSON)
     status = Column(String)
+
+class StoredImage(Base):
+    __tablename__ = "stored_images"
+    
+    # Manifest of the content-addressed image store: sha256 of the upload -> stored file
+    digest = Column(String(64), primary_key=True)
+    path = Column(String, nullable=False)
+    kind = Column(String)  # 'eye' or 'thumb'
+    source_bytes = Column(Integer)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class AttendanceRollup(Base):
+    __tablename__ = "attendance_rollups"
+    
+    # Attendance rows per (day, hour, status), kept in step with every insert
+    day = Column(Date, primary_key=True)
+    hour = Column(Integer, primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
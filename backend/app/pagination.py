@@ -0,0 +1,68 @@
+import base64
+import binascii
+from datetime import date, datetime, time, timedelta
+from typing import Any, Callable, List, Optional, Tuple
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Query
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Opaque cursor for the row after which the next page starts"""
+    raw = f"{timestamp.isoformat()}|{row_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        timestamp, row_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+
+def day_bounds(date_from: Optional[date], date_to: Optional[date]) -> Tuple[Optional[datetime], Optional[datetime]]:
+    """[start, end) datetimes covering whole days from date_from through date_to"""
+    start = datetime.combine(date_from, time.min) if date_from else None
+    end = datetime.combine(date_to + timedelta(days=1), time.min) if date_to else None
+    return start, end
+
+
+def page_size(cursor: Optional[str], limit: Optional[int]) -> Optional[int]:
+    """
+    Requested page size. Clients that send neither `limit` nor `cursor` (the admin UI,
+    which filters and pages client-side) get every row, as before pagination existed.
+    """
+    if limit is None and cursor:
+        return DEFAULT_PAGE_SIZE
+    return limit
+
+
+def keyset_page(query: Query, timestamp_column, id_column, key: Callable[[Any], Tuple[datetime, int]],
+                cursor: Optional[str], limit: Optional[int]) -> Tuple[List[Any], Optional[str]]:
+    """
+    One page of `query`, newest first, ordered by (timestamp, id) descending.
+
+    Instead of OFFSET, the page starts strictly after the cursor row, so every page is
+    an index range scan no matter how deep the client has paged. `key` extracts the
+    (timestamp, id) of a result row; the returned cursor is None on the last page.
+    A `limit` of None returns every remaining row.
+    """
+    if cursor:
+        timestamp, row_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            timestamp_column < timestamp,
+            and_(timestamp_column == timestamp, id_column < row_id),
+        ))
+    query = query.order_by(timestamp_column.desc(), id_column.desc())
+    if limit is None:
+        return query.all(), None
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(*key(rows[-1]))
@@ -0,0 +1,282 @@
+import os
+import logging
+import threading
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from app.models import Student
+from app.database import SQLALCHEMY_DATABASE_URL
+from app.encryption import BiometricEncryption
+from app.gallery import BiometricGallery
+from app.gallery_snapshot import GallerySnapshotStore, snapshot_root
+from app.template_codec import decode_template
+
+logger = logging.getLogger(__name__)
+
+# Rows per IN (...) query when fetching rows by id
+FETCH_CHUNK_SIZE = 500
+
+
+class TemplateCache:
+    """
+    Process-level cache of decrypted biometric templates.
+    Rows are decrypted and parsed once. Each lookup compares the row count and highest
+    id with the database; on a difference, rows above the cached max id are fetched
+    first, and if the count still disagrees (an id committed late, or deleted rows)
+    the id sets are diffed. Queries and decryption run outside the lock.
+
+    With a snapshot store, the decoded gallery is also published as a memory-mapped
+    generation that every worker maps read-only, so startup skips the decrypt pass and
+    workers share one copy of the matrices.
+    """
+
+    def __init__(self, encryptor: Optional[BiometricEncryption] = None,
+                 snapshots: Optional[GallerySnapshotStore] = None,
+                 publish_delay: float = 2.0):
+        self.encryptor = encryptor or BiometricEncryption()
+        self.snapshots = snapshots
+        self.publish_delay = publish_delay
+        self._lock = threading.RLock()
+        self._gallery = BiometricGallery.from_templates([])
+        self._unreadable = set()
+        self._loaded = False
+        self._max_id = 0
+        self._generation = None
+        self._publish_timer = None
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.rows_decoded = 0
+        self.decode_failures = 0
+        self.snapshot_swaps = 0
+
+    def _decode(self, student: Student) -> Optional[Tuple[Dict, Dict]]:
+        """Decrypt and parse one row (None for placeholders / corrupt rows)"""
+        try:
+            eye = decode_template(self.encryptor.decrypt_template(student.eye_template))
+            thumb = decode_template(self.encryptor.decrypt_template(student.thumb_template))
+            self.rows_decoded += 1
+            return eye, thumb
+        except Exception as e:
+            self.decode_failures += 1
+            # Placeholders stay unreadable until filled; report each row once
+            if student.id not in self._unreadable:
+                logger.warning("Cannot load templates for student %s: %s", student.id, e)
+            return None
+
+    def _decode_rows(self, students: Iterable[Student]) -> Tuple[List[Tuple[int, Dict, Dict]], List[int]]:
+        templates: List[Tuple[int, Dict, Dict]] = []
+        unreadable = []
+        for student in students:
+            decoded = self._decode(student)
+            if decoded:
+                templates.append((student.id, decoded[0], decoded[1]))
+            else:
+                unreadable.append(student.id)
+        return templates, unreadable
+
+    def _apply(self, templates: List[Tuple[int, Dict, Dict]], unreadable: List[int], removed: Iterable[int] = ()):
+        """Merge decoded rows (caller holds the lock)"""
+        removed = set(removed)
+        self._gallery = self._gallery.merged(templates, remove_ids=list(unreadable) + list(removed))
+        self._unreadable.difference_update(t[0] for t in templates)
+        self._unreadable.difference_update(removed)
+        self._unreadable.update(unreadable)
+        if removed:
+            self._max_id = max(int(self._gallery.student_ids.max(initial=0)), max(self._unreadable, default=0))
+        self._max_id = max([self._max_id] + [t[0] for t in templates] + list(unreadable))
+
+    def _ingest(self, students: Iterable[Student]):
+        self._apply(*self._decode_rows(students))
+
+    def _known_ids(self) -> set:
+        return set(self._gallery.student_ids.tolist()) | self._unreadable
+
+    @staticmethod
+    def _fetch(db: Session, ids: Iterable[int]) -> List[Student]:
+        ids = sorted(ids)
+        rows = []
+        for start in range(0, len(ids), FETCH_CHUNK_SIZE):
+            rows += db.query(Student).filter(Student.id.in_(ids[start:start + FETCH_CHUNK_SIZE])).all()
+        return rows
+
+    def _adopt_snapshot(self, db_max_id: int) -> bool:
+        """Switch to a newer published generation if it is consistent with the database"""
+        pointer = self.snapshots.current()
+        if not pointer or pointer["generation"] == self._generation:
+            return False
+        # Reject generations of a reset database or older than what this worker holds
+        if pointer["max_id"] > db_max_id or (self._loaded and pointer["max_id"] < self._max_id):
+            return False
+        try:
+            self._gallery = self.snapshots.load(pointer)
+        except Exception as e:
+            logger.warning("Failed to map gallery snapshot %s: %s", pointer["generation"], e)
+            return False
+        self._generation = pointer["generation"]
+        self._max_id = pointer["max_id"]
+        self._unreadable = set(pointer.get("unreadable", []))
+        self._loaded = True
+        self.snapshot_swaps += 1
+        return True
+
+    def _load_all(self, db: Session, db_max_id: int):
+        self._gallery = BiometricGallery.from_templates([])
+        self._unreadable.clear()
+        self._max_id = 0
+
+        if self.snapshots is None:
+            self._ingest(db.query(Student).yield_per(500))
+            self._loaded = True
+            return
+
+        # One worker decrypts and publishes; the others wait and map its generation
+        with self.snapshots.lock():
+            if self._adopt_snapshot(db_max_id):
+                return
+            self._ingest(db.query(Student).yield_per(500))
+            self._loaded = True
+            self._publish_now()
+
+    def get_gallery(self, db: Session) -> BiometricGallery:
+        """Return the gallery, loading or reconciling it with the database when needed"""
+        db_count, db_max_id = db.query(func.count(Student.id), func.max(Student.id)).one()
+        db_count, db_max_id = db_count or 0, db_max_id or 0
+        with self._lock:
+            if self.snapshots is not None:
+                self._adopt_snapshot(db_max_id)
+
+            if not self._loaded:
+                self.misses += 1
+                self._load_all(db, db_max_id)
+                return self._gallery
+            known = self._known_ids()
+            if db_count == len(known) and db_max_id == self._max_id:
+                self.hits += 1
+                return self._gallery
+            self.misses += 1
+            max_id = self._max_id
+
+        # Usual case: rows appended above the cached max id
+        rows = db.query(Student).filter(Student.id > max_id).all()
+        removed = set()
+        if db_count != len(known) + len(rows):
+            # A lower id committed late, or rows were deleted: diff the id sets
+            db_ids = set(db.execute(select(Student.id)).scalars())
+            removed = known - db_ids
+            fetched = {s.id for s in rows}
+            rows += self._fetch(db, db_ids - known - fetched)
+        templates, unreadable = self._decode_rows(rows)
+
+        with self._lock:
+            if self._loaded:  # Not invalidated meanwhile
+                self._apply(templates, unreadable, removed)
+                self._schedule_publish()
+            return self._gallery
+
+    def put(self, student_id: int, eye_features: Dict, thumb_features: Dict):
+        """Insert or replace the templates of a freshly written row"""
+        with self._lock:
+            if not self._loaded:
+                return  # Picked up by the initial load
+            self._gallery = self._gallery.merged([(student_id, eye_features, thumb_features)])
+            self._unreadable.discard(student_id)
+            self._max_id = max(self._max_id, student_id)
+            self._schedule_publish()
+
+    def refresh(self, db: Session, student_ids: Iterable[int]):
+        """Re-read specific rows after they were added or changed outside register_student"""
+        ids = list(student_ids)
+        if not ids:
+            return
+        if not self._loaded:
+            return  # Picked up by the initial load
+        found = self._fetch(db, ids)
+        missing = set(ids) - {s.id for s in found}
+        templates, unreadable = self._decode_rows(found)
+        with self._lock:
+            if not self._loaded:
+                return
+            self._apply(templates, unreadable, missing)
+            self._schedule_publish()
+
+    def invalidate(self):
+        """Drop everything; the next lookup reloads from the database"""
+        with self._lock:
+            self._gallery = BiometricGallery.from_templates([])
+            self._unreadable.clear()
+            self._loaded = False
+            self._max_id = 0
+            self._generation = None
+
+    def publish(self):
+        """Publish the current gallery as a new snapshot generation right away"""
+        with self._lock:
+            if self.snapshots is not None and self._loaded:
+                self._publish_now()
+
+    def _publish_now(self):
+        if self._publish_timer is not None:
+            self._publish_timer.cancel()
+            self._publish_timer = None
+        gallery = self._gallery
+        try:
+            generation = self.snapshots.publish(gallery, self._max_id, self._unreadable)
+        except Exception as e:
+            logger.warning("Failed to publish gallery snapshot: %s", e)
+            return
+        # Swap private matrices for the shared mapping of what was just written
+        if self._gallery is gallery:
+            self._adopt_snapshot(self._max_id)
+            self._generation = generation
+
+    def _schedule_publish(self):
+        """Publish after a short delay so bursts of enrollments share one generation"""
+        if self.snapshots is None or self._publish_timer is not None:
+            return
+        self._publish_timer = threading.Timer(self.publish_delay, self._publish_scheduled)
+        self._publish_timer.daemon = True
+        self._publish_timer.start()
+
+    def _publish_scheduled(self):
+        with self._lock:
+            self._publish_timer = None
+            self._publish_now()
+
+    def memory_bytes(self) -> int:
+        """Approximate bytes held by the gallery matrices (shared pages when mapped)"""
+        with self._lock:
+            return self._gallery.nbytes
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "loaded": self._loaded,
+            "students": len(self._gallery),
+            "unreadable_rows": len(self._unreadable),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "rows_decoded": self.rows_decoded,
+            "decode_failures": self.decode_failures,
+            "memory_bytes": self.memory_bytes(),
+            "snapshot_generation": self._generation,
+            "snapshot_swaps": self.snapshot_swaps,
+            "snapshot": self.snapshots.stats() if self.snapshots else None,
+        }
+
+
+def _snapshot_store() -> Optional[GallerySnapshotStore]:
+    if os.getenv("GALLERY_SNAPSHOTS", "true").lower() != "true":
+        return None
+    root = snapshot_root()
+    if root is None:
+        logger.info("Gallery snapshots disabled: no tmpfs or GALLERY_SNAPSHOT_DIR (or no fcntl); using process memory")
+        return None
+    return GallerySnapshotStore(SQLALCHEMY_DATABASE_URL, root)
+
+
+# Global instance
+template_cache = TemplateCache(snapshots=_snapshot_store())
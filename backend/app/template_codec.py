@@ -0,0 +1,113 @@
+import json
+import struct
+import numpy as np
+from typing import Dict
+
+# Binary template layout (little endian):
+#   header  : magic "HBTP" | version (u8) | kind (u8) | field count (u16)
+#   field   : field id (u8) | dtype code (u8) | reserved (u16) | element count (u32)
+#   payload : raw array bytes, zero padded to a 4 byte boundary
+# Arrays are read back with np.frombuffer, so decoding never copies the payload.
+
+MAGIC = b"HBTP"
+VERSION = 1
+
+KIND_EYE = 1
+KIND_THUMB = 2
+
+_HEADER = struct.Struct("<4sBBH")
+_FIELD = struct.Struct("<BBHI")
+
+_DTYPES = {1: np.dtype("<f4"), 2: np.dtype("u1"), 3: np.dtype("<u4")}
+_DTYPE_CODES = {dt: code for code, dt in _DTYPES.items()}
+
+# (field id, feature key, dtype) per template kind
+SCHEMAS = {
+    KIND_EYE: [
+        (1, "feature_vector", np.dtype("<f4")),
+        (2, "landmarks", np.dtype("<f4")),
+        (3, "quality_score", np.dtype("<f4")),
+    ],
+    KIND_THUMB: [
+        (1, "feature_vector", np.dtype("u1")),
+        (2, "texture_histogram", np.dtype("<f4")),
+        (3, "keypoints_count", np.dtype("<u4")),
+    ],
+}
+
+_SCALAR_FIELDS = {"quality_score", "keypoints_count"}
+
+
+def _pack_landmarks(landmarks: Dict) -> list:
+    return list(landmarks.get("left_center", [0, 0])) + list(landmarks.get("right_center", [0, 0]))
+
+
+def _unpack_landmarks(values: np.ndarray) -> Dict:
+    return {"left_center": values[0:2].tolist(), "right_center": values[2:4].tolist()}
+
+
+def encode_template(features: Dict, kind: int) -> bytes:
+    """Serialize a feature dict into the compact binary template format"""
+    chunks = []
+    count = 0
+    for field_id, key, dtype in SCHEMAS[kind]:
+        if key not in features:
+            continue
+        value = features[key]
+        if key == "landmarks":
+            value = _pack_landmarks(value)
+        arr = np.ascontiguousarray(np.asarray(value).ravel(), dtype=dtype)
+        payload = arr.tobytes()
+        chunks.append(_FIELD.pack(field_id, _DTYPE_CODES[dtype], 0, arr.size))
+        chunks.append(payload + b"\0" * (-len(payload) % 4))
+        count += 1
+    return _HEADER.pack(MAGIC, VERSION, kind, count) + b"".join(chunks)
+
+
+def encode_eye_template(features: Dict) -> bytes:
+    return encode_template(features, KIND_EYE)
+
+
+def encode_thumb_template(features: Dict) -> bytes:
+    return encode_template(features, KIND_THUMB)
+
+
+def is_binary_template(data: bytes) -> bool:
+    return data[:4] == MAGIC
+
+
+def _decode_binary(data: bytes) -> Dict:
+    magic, version, kind, count = _HEADER.unpack_from(data, 0)
+    if version != VERSION:
+        raise ValueError(f"Unsupported template version {version}")
+    if kind not in SCHEMAS:
+        raise ValueError(f"Unknown template kind {kind}")
+
+    names = {field_id: key for field_id, key, _ in SCHEMAS[kind]}
+    features = {}
+    offset = _HEADER.size
+    for _ in range(count):
+        field_id, dtype_code, _, size = _FIELD.unpack_from(data, offset)
+        offset += _FIELD.size
+        dtype = _DTYPES[dtype_code]
+        values = np.frombuffer(data, dtype=dtype, count=size, offset=offset)
+        nbytes = size * dtype.itemsize
+        offset += nbytes + (-nbytes % 4)
+
+        key = names.get(field_id)
+        if key is None:
+            continue  # Field from a newer writer
+        if key == "landmarks":
+            features[key] = _unpack_landmarks(values)
+        elif key in _SCALAR_FIELDS:
+            features[key] = values[0].item()
+        else:
+            features[key] = values
+    return features
+
+
+def decode_template(data: bytes) -> Dict:
+    """Read a template in either the binary format or the legacy JSON format"""
+    if is_binary_template(data):
+        return _decode_binary(data)
+    return json.loads(data.decode())
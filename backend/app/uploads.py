@@ -0,0 +1,82 @@
+import os
+from typing import AsyncIterator, Dict, Tuple
+
+from fastapi import HTTPException, Request
+from starlette.datastructures import UploadFile
+from starlette.formparsers import MultiPartException, MultiPartParser
+
+# Upper bound for one request carrying both captures
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(16 * 1024 * 1024)))
+READ_CHUNK_BYTES = 64 * 1024
+
+
+async def _limited(stream: AsyncIterator[bytes], max_bytes: int) -> AsyncIterator[bytes]:
+    """Pass the body through, aborting with 413 once more than max_bytes arrived"""
+    received = 0
+    async for chunk in stream:
+        received += len(chunk)
+        if received > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+        yield chunk
+
+
+async def _read_part(part: UploadFile, max_bytes: int) -> bytes:
+    buffer = bytearray()
+    while True:
+        chunk = await part.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        buffer += chunk
+        if len(buffer) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+    await part.close()
+    return bytes(buffer)
+
+
+async def read_capture_pair(request: Request, max_bytes: int = MAX_UPLOAD_BYTES) -> Tuple[bytes, bytes, Dict[str, str]]:
+    """
+    Read an eye + thumb capture pair without base64 or JSON.
+
+    Accepted bodies:
+      multipart/form-data       parts `eye_image` and `thumb_image`, other fields as text
+      application/octet-stream  eye bytes followed by thumb bytes, split at the
+                                `X-Eye-Length` header; other fields as query parameters
+
+    Returns (eye bytes, thumb bytes, text fields).
+    """
+    declared = request.headers.get("content-length")
+    if declared and declared.isdigit() and int(declared) > max_bytes:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes} bytes")
+
+    content_type = request.headers.get("content-type", "")
+    body = _limited(request.stream(), max_bytes)
+
+    if content_type.startswith("multipart/form-data"):
+        try:
+            form = await MultiPartParser(request.headers, body, max_files=2, max_fields=10).parse()
+        except MultiPartException as e:
+            raise HTTPException(status_code=400, detail=e.message)
+        try:
+            parts = [form.get("eye_image"), form.get("thumb_image")]
+            if not all(isinstance(part, UploadFile) for part in parts):
+                raise HTTPException(status_code=400, detail="eye_image and thumb_image files are required")
+            eye = await _read_part(parts[0], max_bytes)
+            thumb = await _read_part(parts[1], max_bytes)
+        finally:
+            await form.close()
+        fields = {key: value for key, value in form.multi_items() if isinstance(value, str)}
+        return eye, thumb, fields
+
+    if content_type.startswith("application/octet-stream"):
+        eye_length = request.headers.get("x-eye-length", "")
+        if not eye_length.isdigit():
+            raise HTTPException(status_code=400, detail="X-Eye-Length header is required")
+        buffer = bytearray()
+        async for chunk in body:
+            buffer += chunk
+        split = int(eye_length)
+        if not 0 < split < len(buffer):
+            raise HTTPException(status_code=400, detail="X-Eye-Length does not split the body into two images")
+        return bytes(buffer[:split]), bytes(buffer[split:]), dict(request.query_params)
+
+    raise HTTPException(status_code=415, detail="Use multipart/form-data or application/octet-stream")
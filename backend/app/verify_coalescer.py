@@ -0,0 +1,68 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+
+class VerifyCoalescer:
+    """
+    Micro-batches concurrent single verifications.
+    Captures submitted within `window_ms` of the first pending one (or until
+    `max_batch` are waiting) are scored by one call to `handler`, which receives the
+    list of (eye_features, thumb_features) and returns one result per capture.
+    """
+
+    def __init__(self, handler: Callable[[List[Tuple[Dict, Dict]]], List[Any]], max_batch: int = 32):
+        self.handler = handler
+        self.max_batch = max_batch
+        self._pending: List[Tuple[Tuple[Dict, Dict], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+        # Metrics
+        self.batches = 0
+        self.items = 0
+        self.largest_batch = 0
+
+    async def submit(self, eye_features: Dict, thumb_features: Dict, window_ms: float) -> Any:
+        """Queue a capture and wait for the result of the batch it lands in"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((eye_features, thumb_features), future))
+
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(window_ms / 1000, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: List[Tuple[Tuple[Dict, Dict], asyncio.Future]]):
+        self.batches += 1
+        self.items += len(batch)
+        self.largest_batch = max(self.largest_batch, len(batch))
+        try:
+            results = await run_in_threadpool(self.handler, [capture for capture, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def stats(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "pending": len(self._pending),
+            "largest_batch": self.largest_batch,
+            "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0.0,
+        }
@@ -0,0 +1,61 @@
+"""
+Recall / latency benchmark of the IVF eye index against the exact gallery scan.
+
+Usage:
+    python benchmark_ann.py --synthetic 100000      # clustered random eye vectors
+    python benchmark_ann.py --from-db               # enrolled students (DATABASE_URL)
+"""
+import sys
+import os
+import argparse
+import time
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.ann_index import IVFIndex, benchmark
+
+
+def synthetic_gallery(size: int, dim: int = 57, clusters: int = 500, seed: int = 0):
+    """Eye-like vectors: mostly positive, grouped around a few hundred face shapes"""
+    rng = np.random.default_rng(seed)
+    centers = rng.random((clusters, dim)).astype(np.float32)
+    labels = rng.integers(0, clusters, size)
+    vectors = centers[labels] + rng.normal(0, 0.05, (size, dim)).astype(np.float32)
+    return vectors, np.arange(1, size + 1)
+
+
+def gallery_from_db():
+    from app.database import SessionLocal
+    from app.template_cache import template_cache
+
+    db = SessionLocal()
+    try:
+        gallery = template_cache.get_gallery(db)
+    finally:
+        db.close()
+    return gallery.eye_matrix, gallery.student_ids
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the approximate eye index")
+    parser.add_argument("--synthetic", type=int, default=100000, help="Synthetic gallery size")
+    parser.add_argument("--from-db", action="store_true", help="Use enrolled students instead")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=200)
+    parser.add_argument("--probes", type=int, nargs="+", default=[4, 8, 16, 32])
+    args = parser.parse_args()
+
+    vectors, ids = gallery_from_db() if args.from_db else synthetic_gallery(args.synthetic)
+    rng = np.random.default_rng(1)
+    picks = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    # Re-captures are noisy copies of an enrolled vector
+    queries = vectors[picks] + rng.normal(0, 0.02, vectors[picks].shape).astype(np.float32)
+
+    start = time.perf_counter()
+    index = IVFIndex()
+    index.build(vectors, ids)
+    print(f"Built {len(index.centroids)} lists over {len(vectors)} vectors in {time.perf_counter() - start:.2f}s")
+
+    for n_probe in args.probes:
+        print(benchmark(index, vectors, ids, queries, k=args.k, n_probe=n_probe))
@@ -0,0 +1,67 @@
+"""
+Per-call latency of liveness verification: a FaceMesh graph built per request (the
+previous implementation) against long-lived engines checked out of the extractor pool.
+
+Usage:
+    python benchmark_liveness.py --image ../biometric_storage/eye_scans/123103_amit_eye.jpg
+"""
+import sys
+import os
+import argparse
+import base64
+import time
+import numpy as np
+import cv2
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.biometric_extractor import mp_face_mesh
+from app.extractor_pool import ExtractorPool
+from app.liveness_service import LivenessService
+
+DEFAULT_IMAGE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "biometric_storage", "eye_scans", "123103_amit_eye.jpg"
+)
+
+
+def per_request_graph(image_b64: str):
+    """What verify_liveness used to do: decode, build FaceMesh, process, tear down"""
+    img = cv2.imdecode(np.frombuffer(base64.b64decode(image_b64), np.uint8), cv2.IMREAD_COLOR)
+    with mp_face_mesh.FaceMesh(max_num_faces=1, refine_landmarks=True,
+                               min_detection_confidence=0.5, min_tracking_confidence=0.5) as face_mesh:
+        face_mesh.process(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+
+
+def timed(func, iterations: int):
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return np.array(latencies)
+
+
+def report(name: str, latencies: np.ndarray):
+    print(f"{name:<22} mean {latencies.mean():8.2f} ms   p50 {np.percentile(latencies, 50):8.2f} ms   "
+          f"p95 {np.percentile(latencies, 95):8.2f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark liveness verification latency")
+    parser.add_argument("--image", default=DEFAULT_IMAGE, help="Face image to verify")
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+
+    with open(args.image, "rb") as f:
+        image_b64 = base64.b64encode(f.read()).decode()
+
+    before = timed(lambda: per_request_graph(image_b64), args.iterations)
+
+    service = LivenessService(ExtractorPool(size=1))
+    print("Result:", service.verify_liveness(image_b64, "CENTER"))  # Also warms the engine
+    after = timed(lambda: service.verify_liveness(image_b64, "CENTER"), args.iterations)
+
+    report("graph per request", before)
+    report("pooled engine", after)
+    print(f"Speed-up: {before.mean() / after.mean():.1f}x")
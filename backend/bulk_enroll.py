@@ -0,0 +1,52 @@
+"""
+Enroll many students at once from a CSV and a directory or zip of eye/thumb images.
+
+Usage:
+    python bulk_enroll.py students.csv images/            # or images.zip
+    python bulk_enroll.py students.csv images.zip --workers 8 --chunk-size 500
+
+CSV columns: name, registration_number and optionally eye_image / thumb_image (paths
+inside the image source). Without them, images are matched by file name:
+<registration_number>_<anything>_eye.jpg and <registration_number>_<anything>_thumb.jpg.
+
+Rows that already hold templates are skipped, so an interrupted run can be restarted
+with the same arguments. CSV placeholder rows (from /api/admin/students/upload) are filled in.
+"""
+import sys
+import os
+import argparse
+import json
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.bulk_enrollment import EnrollmentJob, run_enrollment
+
+
+def print_progress(job: EnrollmentJob):
+    p = job.progress()
+    eta = f", eta {p['eta_seconds']:.0f}s" if p["eta_seconds"] is not None else ""
+    print(f"[{p['status']}] {p['processed']}/{p['total']} rows: {p['enrolled']} enrolled, "
+          f"{p['skipped']} skipped, {p['failed']} failed ({p['rows_per_second']} rows/s{eta})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk enroll students from a CSV and their scans")
+    parser.add_argument("csv", help="CSV with name and registration_number columns")
+    parser.add_argument("images", help="Directory or zip archive with eye/thumb images")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes (default: CPU count)")
+    parser.add_argument("--chunk-size", type=int, default=200, help="Rows inserted per transaction")
+    parser.add_argument("--failures", help="Write per-row failures to this JSON file")
+    args = parser.parse_args()
+
+    job = run_enrollment(
+        EnrollmentJob(args.csv, args.images),
+        workers=args.workers,
+        chunk_size=args.chunk_size,
+        on_progress=print_progress,
+    )
+    if args.failures:
+        with open(args.failures, "w") as f:
+            json.dump(job.failures, f, indent=2)
+    for failure in job.failures[:20]:
+        print(f"Row {failure['row']} ({failure['registration_number']}): {failure['error']}")
+    sys.exit(0 if job.status == "completed" else 1)
@@ -5,8 +5,12 @@ import os
 # Creating a specific configuration to override any defaults
 bind = f"0.0.0.0:{os.getenv('PORT', '10000')}"
 
-# STRICTLY enforce 1 worker to prevent OOM on free tier
-workers = 1
+# Default to 1 worker to prevent OOM on free tier.
+# Decrypted gallery matrices are shared between workers through the memory-mapped
+# snapshot (/dev/shm, or GALLERY_SNAPSHOT_DIR), so extra workers do not multiply template RAM.
+# Extraction runs in threads unless EXTRACTION_WORKERS asks for a process pool (each
+# pool process loads its own MediaPipe/OpenCV models).
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
 threads = 4
 timeout = 120
 worker_class = "uvicorn.workers.UvicornWorker"
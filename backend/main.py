@@ -1,20 +1,25 @@
-from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Request
+from fastapi import FastAPI, HTTPException, Depends, File, Form, UploadFile, Request, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, JSONResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import Optional, List
-from datetime import datetime, timedelta
+from typing import Dict, Optional, List
+from datetime import date, datetime, timedelta
 import uvicorn
 import os
 import csv
 import io
-from collections import defaultdict
+import shutil
+import tempfile
 
 from app.database import engine, Base, get_db
-from app import auth, biometric_processor, models
-from sqlalchemy.orm import Session
+from app import auth, biometric_processor, models, analytics
+from sqlalchemy.orm import Session, contains_eager
 from sqlalchemy import func
+from app.pagination import keyset_page, day_bounds, page_size, MAX_PAGE_SIZE
+from app.attendance_export import stream_csv, stream_xlsx
+from app.backup import stream_backup
 
 # Initialize Services
 from app.config_service import config_service
@@ -57,7 +62,8 @@ app.add_middleware(SecurityMiddleware)
 # Mount static files for biometric images
 os.makedirs("biometric_storage/eye_scans", exist_ok=True)
 os.makedirs("biometric_storage/thumb_scans", exist_ok=True)
-app.mount("/biometric_storage", StaticFiles(directory="biometric_storage"), name="biometric_storage")
+from app.image_http import ImmutableStaticFiles, immutable_file_response
+app.mount("/biometric_storage", ImmutableStaticFiles(directory="biometric_storage"), name="biometric_storage")
 
 # Request/Response Models
 class RegistrationRequest(BaseModel):
@@ -70,6 +76,9 @@ class VerificationRequest(BaseModel):
     eye_image: str  # base64 encoded
     thumb_image: str  # base64 encoded
 
+class BatchVerificationRequest(BaseModel):
+    captures: List[VerificationRequest]
+
 class LoginRequest(BaseModel):
     username: str
     password: str
@@ -162,6 +171,75 @@ app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
 
 # Cache Service
 from app.cache_service import cache_service
+from app.template_cache import template_cache
+from app.gallery import cascade_stats
+from app.ann_index import eye_ann
+
+# Biometric Extraction Pool
+from app.extraction_executor import extraction_executor
+from app.extractor_pool import extractor_pool
+from app.uploads import read_capture_pair
+from app.bulk_enrollment import enrollment_jobs
+
+@app.on_event("startup")
+def start_extraction_pool():
+    extraction_executor.start()
+
+@app.on_event("shutdown")
+def stop_extraction_pool():
+    extraction_executor.shutdown()
+
+# Background Image Persistence
+from app.image_writer import image_writer
+from app.image_store import image_store
+
+@app.on_event("startup")
+def start_image_writer():
+    image_writer.start()
+    image_store.thumbnails.start()
+
+@app.on_event("shutdown")
+def flush_image_writer():
+    # Durable flush: every queued scan is fsynced before the worker exits
+    image_writer.shutdown()
+    image_store.thumbnails.shutdown()
+
+# Write-behind Attendance Inserts
+from app.attendance_writer import attendance_writer
+
+@app.on_event("startup")
+def start_attendance_writer():
+    attendance_writer.start()
+
+@app.on_event("shutdown")
+def flush_attendance_writer():
+    # Every acknowledged verification is already committed; this drains the rest
+    attendance_writer.shutdown()
+
+# Duplicate Check-in Suppression
+from app.checkin_index import recent_checkins
+from app.database import SessionLocal
+
+@app.on_event("startup")
+def rebuild_recent_checkins():
+    try:
+        with SessionLocal() as db:
+            recent_checkins.rebuild(db, config_service.get_float(db, "DUPLICATE_CHECKIN_WINDOW_SECONDS"))
+    except Exception as e:
+        print(f"Warning: could not rebuild recent check-ins: {e}")
+
+# Attendance Rollup (dashboards)
+from app import attendance_rollup
+
+@app.on_event("startup")
+def backfill_attendance_rollup():
+    # First start after upgrading: build the rollup once from the raw rows
+    try:
+        with SessionLocal() as db:
+            if attendance_rollup.needs_backfill(db):
+                print(f"Attendance rollup backfilled: {attendance_rollup.rebuild(db)} buckets")
+    except Exception as e:
+        print(f"Warning: could not backfill attendance rollup: {e}")
 
 # Liveness Service
 from app.liveness_service import LivenessService
@@ -192,7 +270,7 @@ async def verify_liveness_action(request: Request, payload: LivenessRequest):
     """
     Verifies if the submitted image matches the requested challenge.
     """
-    result = liveness_service.verify_liveness(payload.image, payload.challenge)
+    result = await run_in_threadpool(liveness_service.verify_liveness, payload.image, payload.challenge)
     return result
 
 # Serve static files if built
@@ -209,52 +287,101 @@ else:
     def read_root():
         return {"message": "Biometric Attendance API is running. (Static files not found)", "status": "running"}
 
-@app.post("/api/register")
-async def register_student(request: RegistrationRequest, db: Session = Depends(get_db)):
-    """Register a new student with biometric data"""
+async def _register(db: Session, name: str, reg_no: str, eye_image, thumb_image):
     try:
         result = await biometric_processor.register_student(
             db=db,
-            name=request.name,
-            reg_no=request.registration_number,
-            eye_image_b64=request.eye_image,
-            thumb_image_b64=request.thumb_image
+            name=name,
+            reg_no=reg_no,
+            eye_image_b64=eye_image,
+            thumb_image_b64=thumb_image
         )
         return {"success": True, "student_id": result["student_id"], "message": "Registration successful"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+def _verification_response(result: Dict) -> Dict:
+    if result["matched"] and result.get("duplicate"):
+        # Already checked in within the duplicate window: nothing new to record or broadcast
+        return {
+            "success": True,
+            "duplicate": True,
+            "student": {
+                "name": result["student"].name,
+                "registration_number": result["student"].registration_number
+            },
+            "message": "Attendance already marked"
+        }
+    if result["matched"]:
+        # Broadcast Attendance Event
+        asyncio.create_task(sse_service.broadcast("attendance_update", {
+            "student_name": result["student"].name,
+            "registration_number": result["student"].registration_number,
+            "status": "success",
+            "time": datetime.now().strftime("%H:%M:%S")
+        }))
+
+        return {
+            "success": True,
+            "student": {
+                "name": result["student"].name,
+                "registration_number": result["student"].registration_number
+            },
+            "message": "Attendance marked successfully"
+        }
+    else:
+        return {"success": False, "message": "Student not found or biometric mismatch"}
+
+async def _verify(db: Session, eye_image, thumb_image):
+    try:
+        result = await biometric_processor.verify_student(
+            db=db,
+            eye_image_b64=eye_image,
+            thumb_image_b64=thumb_image
+        )
+        return _verification_response(result)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.post("/api/register")
+async def register_student(request: RegistrationRequest, db: Session = Depends(get_db)):
+    """Register a new student with biometric data"""
+    return await _register(db, request.name, request.registration_number, request.eye_image, request.thumb_image)
+
+@app.post("/api/register/upload")
+async def register_student_upload(request: Request, db: Session = Depends(get_db)):
+    """Register a new student from raw image parts (multipart/form-data or binary body)"""
+    eye_image, thumb_image, fields = await read_capture_pair(request)
+    if not fields.get("name") or not fields.get("registration_number"):
+        raise HTTPException(status_code=400, detail="name and registration_number are required")
+    return await _register(db, fields["name"], fields["registration_number"], eye_image, thumb_image)
+
 @app.post("/api/verify")
 async def verify_attendance(request: VerificationRequest, db: Session = Depends(get_db)):
     """Verify student identity and mark attendance"""
+    return await _verify(db, request.eye_image, request.thumb_image)
+
+@app.post("/api/verify/upload")
+async def verify_attendance_upload(request: Request, db: Session = Depends(get_db)):
+    """Verify from raw image parts (multipart/form-data or binary body) and mark attendance"""
+    eye_image, thumb_image, _ = await read_capture_pair(request)
+    return await _verify(db, eye_image, thumb_image)
+
+@app.post("/api/verify/batch")
+async def verify_attendance_batch(request: BatchVerificationRequest, db: Session = Depends(get_db)):
+    """Verify several captures in one pass (e.g. kiosks flushing a queue); results keep request order"""
+    max_items = config_service.get_int(db, "VERIFY_BATCH_MAX_ITEMS")
+    if not request.captures:
+        raise HTTPException(status_code=400, detail="No captures submitted")
+    if len(request.captures) > max_items:
+        raise HTTPException(status_code=413, detail=f"At most {max_items} captures per batch")
     try:
-        result = await biometric_processor.verify_student(
-            db=db,
-            eye_image_b64=request.eye_image,
-            thumb_image_b64=request.thumb_image
+        results = await biometric_processor.verify_batch(
+            db, [(capture.eye_image, capture.thumb_image) for capture in request.captures]
         )
-        
-        if result["matched"]:
-            # Broadcast Attendance Event
-            asyncio.create_task(sse_service.broadcast("attendance_update", {
-                "student_name": result["student"].name,
-                "registration_number": result["student"].registration_number,
-                "status": "success",
-                "time": datetime.now().strftime("%H:%M:%S")
-            }))
-
-            return {
-                "success": True,
-                "student": {
-                    "name": result["student"].name,
-                    "registration_number": result["student"].registration_number
-                },
-                "message": "Attendance marked successfully"
-            }
-        else:
-            return {"success": False, "message": "Student not found or biometric mismatch"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
+    return {"results": [_verification_response(result) for result in results]}
 
 @app.post("/api/admin/login")
 def admin_login(request: LoginRequest, db: Session = Depends(get_db)):
@@ -282,9 +409,32 @@ def refresh_token(request: RefreshRequest):
         raise HTTPException(status_code=401, detail="Invalid refresh token")
 
 @app.get("/api/admin/students")
-def get_students(db: Session = Depends(get_db), current_user: dict = Depends(auth.get_current_user)):
-    """Get all registered students (admin only)"""
-    students = db.query(models.Student).all()
+def get_students(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    search: Optional[str] = None,
+    created_from: Optional[date] = None,
+    created_to: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """Registered students, newest first; keyset-paged when limit/cursor is given (admin only)"""
+    query = db.query(models.Student)
+    if search:
+        pattern = f"%{search}%"
+        query = query.filter(models.Student.name.ilike(pattern) | models.Student.registration_number.ilike(pattern))
+    start, end = day_bounds(created_from, created_to)
+    if start:
+        query = query.filter(models.Student.created_at >= start)
+    if end:
+        query = query.filter(models.Student.created_at < end)
+    try:
+        students, next_cursor = keyset_page(
+            query, models.Student.created_at, models.Student.id,
+            lambda s: (s.created_at, s.id), cursor, page_size(cursor, limit)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
         "students": [
             {
@@ -293,16 +443,65 @@ def get_students(db: Session = Depends(get_db), current_user: dict = Depends(aut
                 "registration_number": s.registration_number,
                 "created_at": s.created_at.isoformat(),
                 "eye_image_path": s.eye_image_path,
-                "thumb_image_path": s.thumb_image_path
+                "thumb_image_path": s.thumb_image_path,
+                "eye_thumbnail_path": _thumbnail_url(s.eye_image_path),
+                "thumb_thumbnail_path": _thumbnail_url(s.thumb_image_path)
             }
             for s in students
-        ]
+        ],
+        "next_cursor": next_cursor
     }
 
+def _thumbnail_url(image_path: Optional[str]) -> Optional[str]:
+    digest = image_store.digest_of(image_path)
+    return f"/api/images/{digest}/thumbnail" if digest else image_path
+
+@app.get("/api/images/{digest}/thumbnail")
+def get_thumbnail(digest: str, request: Request, db: Session = Depends(get_db)):
+    """Small JPEG of a stored scan, generated on first request and cached forever by the browser"""
+    path = image_store.thumbnail(db, digest)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    size = image_store.thumbnails.max_side
+    return immutable_file_response(request.headers, path, f'"{digest}-{size}"')
+
 @app.get("/api/admin/attendance")
-def get_attendance(db: Session = Depends(get_db), current_user: dict = Depends(auth.get_current_user)):
-    """Get attendance records (admin only)"""
-    records = db.query(models.Attendance).join(models.Student).all()
+def get_attendance(
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    status: Optional[str] = None,
+    student_id: Optional[int] = None,
+    registration_number: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """Attendance records, newest first; keyset-paged when limit/cursor is given (admin only)"""
+    # One joined query: the student columns come back with each row, no per-row lazy load
+    query = (
+        db.query(models.Attendance)
+        .join(models.Attendance.student)
+        .options(contains_eager(models.Attendance.student))
+    )
+    start, end = day_bounds(date_from, date_to)
+    if start:
+        query = query.filter(models.Attendance.timestamp >= start)
+    if end:
+        query = query.filter(models.Attendance.timestamp < end)
+    if status:
+        query = query.filter(models.Attendance.verification_status == status)
+    if student_id is not None:
+        query = query.filter(models.Attendance.student_id == student_id)
+    if registration_number:
+        query = query.filter(models.Student.registration_number == registration_number)
+    try:
+        records, next_cursor = keyset_page(
+            query, models.Attendance.timestamp, models.Attendance.id,
+            lambda r: (r.timestamp, r.id), cursor, page_size(cursor, limit)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
         "attendance": [
             {
@@ -315,43 +514,30 @@ def get_attendance(db: Session = Depends(get_db), current_user: dict = Depends(a
                 "thumb_match_score": r.thumb_match_score
             }
             for r in records
-        ]
+        ],
+        "next_cursor": next_cursor
     }
 
 @app.get("/api/admin/attendance/export")
-def export_attendance(db: Session = Depends(get_db), current_user: dict = Depends(auth.get_current_user)):
-    """Export attendance to Excel (admin only)"""
-    try:
-        import pandas as pd
-        from io import BytesIO
-        from fastapi.responses import StreamingResponse
-        
-        records = db.query(models.Attendance).join(models.Student).all()
-        data = [
-            {
-                "Student Name": r.student.name,
-                "Registration Number": r.student.registration_number,
-                "Date & Time": r.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-                "Status": r.verification_status,
-                "Eye Match Score": f"{r.eye_match_score:.2f}" if r.eye_match_score else "N/A",
-                "Thumb Match Score": f"{r.thumb_match_score:.2f}" if r.thumb_match_score else "N/A"
-            }
-            for r in records
-        ]
-        
-        df = pd.DataFrame(data)
-        output = BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            df.to_excel(writer, index=False, sheet_name='Attendance')
-        output.seek(0)
-        
+def export_attendance(
+    format: str = Query("xlsx", pattern="^(xlsx|csv)$"),
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    status: Optional[str] = None,
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """Export attendance to Excel or CSV, streamed in constant memory (admin only)"""
+    if format == "csv":
         return StreamingResponse(
-            output,
-            media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-            headers={"Content-Disposition": "attachment; filename=attendance.xlsx"}
+            stream_csv(date_from, date_to, status),
+            media_type="text/csv; charset=utf-8",
+            headers={"Content-Disposition": "attachment; filename=attendance.csv"}
         )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    return StreamingResponse(
+        stream_xlsx(date_from, date_to, status),
+        media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        headers={"Content-Disposition": "attachment; filename=attendance.xlsx"}
+    )
 
 @app.post("/api/admin/students/upload")
 async def upload_students_csv(
@@ -368,6 +554,7 @@ async def upload_students_csv(
         
         imported_count = 0
         errors = []
+        created = []
         
         for row_num, row in enumerate(csv_reader, start=2):
             try:
@@ -396,12 +583,14 @@ async def upload_students_csv(
                 )
                 
                 db.add(student)
+                created.append(student)
                 imported_count += 1
                 
             except Exception as e:
                 errors.append(f"Row {row_num}: {str(e)}")
         
         db.commit()
+        template_cache.refresh(db, [s.id for s in created])
         
         return {
             "success": True,
@@ -413,53 +602,64 @@ async def upload_students_csv(
     except Exception as e:
         raise HTTPException(status_code=400, detail=f"CSV processing failed: {str(e)}")
 
+@app.post("/api/admin/students/bulk-enroll")
+async def start_bulk_enrollment(
+    csv_file: UploadFile = File(...),
+    archive: Optional[UploadFile] = File(None),
+    images_dir: Optional[str] = Form(None),
+    current_user: dict = Depends(auth.get_current_user)
+):
+    """Start a bulk enrollment job from a CSV plus a zip of scans or a directory on the server (admin only)"""
+    if archive is None and not images_dir:
+        raise HTTPException(status_code=400, detail="Provide an archive upload or images_dir")
+    if images_dir and not os.path.isdir(images_dir):
+        raise HTTPException(status_code=400, detail=f"Directory {images_dir} not found")
+
+    job_dir = tempfile.mkdtemp(prefix="bulk_enroll_")
+    csv_path = os.path.join(job_dir, "students.csv")
+    await run_in_threadpool(_save_upload, csv_file, csv_path)
+    images_path = images_dir
+    if archive is not None:
+        images_path = os.path.join(job_dir, "images.zip")
+        await run_in_threadpool(_save_upload, archive, images_path)
+
+    try:
+        job = enrollment_jobs.start(csv_path, images_path, cleanup_dir=job_dir)
+    except ValueError as e:
+        shutil.rmtree(job_dir, ignore_errors=True)
+        raise HTTPException(status_code=409, detail=str(e))
+    return job.progress()
+
+@app.get("/api/admin/students/bulk-enroll/{job_id}")
+def get_bulk_enrollment(job_id: str, current_user: dict = Depends(auth.get_current_user)):
+    """Progress and per-row failures of a bulk enrollment job (admin only)"""
+    job = enrollment_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.progress()
+
+def _save_upload(upload: UploadFile, path: str):
+    with open(path, "wb") as f:
+        shutil.copyfileobj(upload.file, f, 1024 * 1024)
+
 # Analytics Endpoints
 @app.get("/api/admin/analytics/overview")
 @cache_service.cache_response(ttl=60)
 def get_analytics_overview(db: Session = Depends(get_db), current_user: dict = Depends(auth.get_current_user)):
     """Get overall analytics overview (admin only)"""
     try:
-        # Total students
-        total_students = db.query(models.Student).count()
-        
-        # Today's attendance
-        today = datetime.now().date()
-        today_start = datetime.combine(today, datetime.min.time())
-        today_end = datetime.combine(today, datetime.max.time())
-        
-        attendance_today = db.query(models.Attendance).filter(
-            models.Attendance.timestamp >= today_start,
-            models.Attendance.timestamp <= today_end,
-            models.Attendance.verification_status == 'success'
-        ).count()
-        
-        # This week's attendance
-        week_start = today - timedelta(days=today.weekday())
-        week_start_dt = datetime.combine(week_start, datetime.min.time())
-        
-        attendance_week = db.query(models.Attendance).filter(
-            models.Attendance.timestamp >= week_start_dt,
-            models.Attendance.verification_status == 'success'
-        ).count()
-        
-        # This month's attendance
-        month_start = today.replace(day=1)
-        month_start_dt = datetime.combine(month_start, datetime.min.time())
-        
-        attendance_month = db.query(models.Attendance).filter(
-            models.Attendance.timestamp >= month_start_dt,
-            models.Attendance.verification_status == 'success'
-        ).count()
-        
+        counts = analytics.overview(db, datetime.now().date())
+        total_students = counts["total_students"]
+
         # Calculate attendance rate
-        attendance_rate = (attendance_today / total_students * 100) if total_students > 0 else 0
-        
+        attendance_rate = (counts["attendance_today"] / total_students * 100) if total_students > 0 else 0
+
         return {
             "total_students": total_students,
-            "attendance_today": attendance_today,
+            "attendance_today": counts["attendance_today"],
             "attendance_rate_today": round(attendance_rate, 1),
-            "attendance_week": attendance_week,
-            "attendance_month": attendance_month
+            "attendance_week": counts["attendance_week"],
+            "attendance_month": counts["attendance_month"]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -467,33 +667,23 @@ def get_analytics_overview(db: Session = Depends(get_db), current_user: dict = D
 @app.get("/api/admin/analytics/attendance-trend")
 @cache_service.cache_response(ttl=300)
 def get_attendance_trend(
-    days: int = 7,
+    days: int = Query(7, ge=1, le=3660),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
     db: Session = Depends(get_db),
     current_user: dict = Depends(auth.get_current_user)
 ):
-    """Get attendance trend for the last N days (admin only)"""
+    """Get attendance trend for the last N days, or for start_date..end_date (admin only)"""
+    end = end_date or datetime.now().date()
+    start = start_date or end - timedelta(days=days - 1)
+    if start > end or (end - start).days >= 3660:
+        raise HTTPException(status_code=400, detail="Invalid date range")
     try:
-        today = datetime.now().date()
-        trend_data = []
-        labels = []
-        
-        for i in range(days - 1, -1, -1):
-            date = today - timedelta(days=i)
-            date_start = datetime.combine(date, datetime.min.time())
-            date_end = datetime.combine(date, datetime.max.time())
-            
-            count = db.query(models.Attendance).filter(
-                models.Attendance.timestamp >= date_start,
-                models.Attendance.timestamp <= date_end,
-                models.Attendance.verification_status == 'success'
-            ).count()
-            
-            trend_data.append(count)
-            labels.append(date.strftime("%a %d"))
-        
+        counts = analytics.daily_counts(db, start, end)
+        span = [start + timedelta(days=i) for i in range((end - start).days + 1)]
         return {
-            "labels": labels,
-            "data": trend_data
+            "labels": [day.strftime("%a %d") for day in span],
+            "data": [counts.get(day, 0) for day in span]
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -507,79 +697,47 @@ def get_system_stats(current_user: dict = Depends(auth.get_current_user)):
     """Get real-time system telemetry"""
     return system_monitor.get_system_stats()
 
+@app.get("/api/admin/system/metrics")
+def get_biometric_metrics(current_user: dict = Depends(auth.get_current_user)):
+    """Get matching pipeline counters"""
+    return {
+        "template_cache": template_cache.stats(),
+        "cascade": cascade_stats.stats(),
+        "eye_index": eye_ann.stats(),
+        "extraction": extraction_executor.stats(),
+        "extractor_pool": extractor_pool.stats(),
+        "verify_coalescer": biometric_processor.verify_coalescer.stats(),
+        "image_writer": image_writer.stats(),
+        "image_store": image_store.stats(),
+        "thumbnails": image_store.thumbnail_stats(),
+        "attendance_writer": attendance_writer.stats(),
+        "recent_checkins": recent_checkins.stats(),
+        "response_cache": cache_service.stats()
+    }
+
 @app.get("/api/admin/system/backup")
-def download_backup(db: Session = Depends(get_db), current_user: dict = Depends(auth.get_current_user)):
-    """Dump database to JSON"""
-    try:
-        # Fetch all data
-        students = db.query(models.Student).all()
-        attendance = db.query(models.Attendance).all()
-        logs = db.query(models.AuditLog).all()
-        
-        backup_data = {
-            "generated_at": datetime.now().isoformat(),
-            "students": [
-                {
-                    "id": s.id, 
-                    "name": s.name, 
-                    "reg_no": s.registration_number,
-                    "created_at": s.created_at.isoformat()
-                } for s in students
-            ],
-            "attendance": [
-                {
-                    "student_id": a.student_id,
-                    "timestamp": a.timestamp.isoformat(),
-                    "status": a.verification_status,
-                    "score": a.eye_match_score
-                } for a in attendance
-            ],
-            "audit_logs": [
-                {
-                    "timestamp": l.timestamp.isoformat(),
-                    "action": l.action_type,
-                    "actor": l.actor_id,
-                    "details": l.details
-                } for l in logs
-            ]
-        }
-        
-        import json
-        output = io.StringIO()
-        json.dump(backup_data, output, indent=4)
-        output.seek(0)
-        
-        return StreamingResponse(
-            io.BytesIO(output.getvalue().encode()),
-            media_type="application/json",
-            headers={"Content-Disposition": f"attachment; filename=backup_{datetime.now().strftime('%Y%m%d')}.json"}
-        )
-        
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Backup failed: {str(e)}")
+def download_backup(since: Optional[datetime] = None, current_user: dict = Depends(auth.get_current_user)):
+    """Stream a gzip-compressed NDJSON dump; `since` limits it to rows created at or after that time"""
+    suffix = "_incremental" if since else ""
+    return StreamingResponse(
+        stream_backup(since),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f"attachment; filename=backup_{datetime.now().strftime('%Y%m%d')}{suffix}.ndjson.gz"}
+    )
 
 # ... (Previous analytics imports)
 @app.get("/api/admin/analytics/hourly-distribution")
-def get_hourly_distribution(db: Session = Depends(get_db), current_user: dict = Depends(auth.get_current_user)):
+def get_hourly_distribution(
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    db: Session = Depends(get_db),
+    current_user: dict = Depends(auth.get_current_user)
+):
     """Get hourly attendance distribution (admin only)"""
     try:
-        # Get all attendance records
-        records = db.query(models.Attendance).filter(
-            models.Attendance.verification_status == 'success'
-        ).all()
-        
-        # Group by hour
-        hourly_counts = defaultdict(int)
-        for record in records:
-            hour = record.timestamp.hour
-            hourly_counts[hour] += 1
-        
-        # Create labels and data for all hours (0-23)
-        labels = [f"{h:02d}:00" for h in range(24)]
-        data = [hourly_counts.get(h, 0) for h in range(24)]
-        
+        data = analytics.hourly_counts(db, date_from, date_to)
         return {
-            "labels": labels,
+            "labels": [f"{h:02d}:00" for h in range(24)],
             "data": data
         }
     except Exception as e:
@@ -0,0 +1,133 @@
+"""
+Move scans referenced by students from the flat eye_scans/thumb_scans directories into
+the content-addressed image store (biometric_storage/objects/ab/cd/<sha256>.<ext>).
+
+Usage:
+    python migrate_image_store.py [--batch-size 200] [--dry-run] [--keep-originals]
+
+Files are copied without re-encoding, identical files collapse into one object and the
+students' image paths are rewritten. An original is only deleted after the rows that
+pointed at it have been committed with their new path, so an interrupted run leaves
+every row pointing at a file that exists; rows already in the store are skipped on the
+re-run.
+"""
+import sys
+import os
+import argparse
+import tempfile
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import or_
+
+from app.database import SessionLocal
+from app.models import Student
+from app.image_store import image_store
+
+
+def _copy(raw: bytes, target: str):
+    """Durably write an object (temp name + rename, so a crash never leaves a partial file)"""
+    if os.path.exists(target):
+        return  # Duplicate content already in the store
+    directory = os.path.dirname(target)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".migrate-", dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(raw)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, target)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def _remove_originals(db, paths):
+    """Delete flat files that no student row points at any more (rows of later batches may)"""
+    for path in set(paths):
+        urls = [path, "/" + path]
+        still_used = db.query(Student.id).filter(
+            or_(Student.eye_image_path.in_(urls), Student.thumb_image_path.in_(urls))
+        ).first()
+        if still_used is not None:
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def migrate(batch_size: int = 200, dry_run: bool = False, keep_originals: bool = False) -> dict:
+    counts = {"moved": 0, "deduplicated": 0, "already_migrated": 0, "missing": 0}
+    relocated = {}  # old relative path -> new relative path (files shared by several rows)
+
+    db = SessionLocal()
+    try:
+        last_id = 0
+        while True:
+            batch = (
+                db.query(Student)
+                .filter(Student.id > last_id)
+                .order_by(Student.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+
+            entries = []
+            originals = []
+            for student in batch:
+                last_id = student.id
+                for kind, attr in (("eye", "eye_image_path"), ("thumb", "thumb_image_path")):
+                    url = getattr(student, attr)
+                    if not url:
+                        continue
+                    old_path = url.lstrip("/")
+                    if old_path.startswith(os.path.join(image_store.root, "objects")):
+                        counts["already_migrated"] += 1
+                        continue
+
+                    new_path = relocated.get(old_path)
+                    if new_path is None:
+                        if not os.path.exists(old_path):
+                            counts["missing"] += 1
+                            continue
+                        with open(old_path, "rb") as f:
+                            raw = f.read()
+                        digest, new_path = image_store.locate(raw, os.path.splitext(old_path)[1].lower())
+                        if os.path.exists(new_path) or any(e["digest"] == digest for e in entries):
+                            counts["deduplicated"] += 1
+                        else:
+                            counts["moved"] += 1
+                        if not dry_run:
+                            _copy(raw, new_path)
+                        relocated[old_path] = new_path
+                        entries.append({"digest": digest, "path": new_path, "kind": kind, "source_bytes": len(raw)})
+                    originals.append(old_path)
+
+                    if not dry_run:
+                        setattr(student, attr, "/" + new_path)
+
+            if not dry_run:
+                image_store.record(db, entries)
+                db.commit()
+                if not keep_originals:
+                    _remove_originals(db, originals)
+            print(f"Processed up to student id {last_id}: {counts}")
+    finally:
+        db.close()
+
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move biometric scans into the content-addressed store")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true", help="Report what would move without touching files")
+    parser.add_argument("--keep-originals", action="store_true", help="Copy instead of move")
+    args = parser.parse_args()
+
+    result = migrate(batch_size=args.batch_size, dry_run=args.dry_run, keep_originals=args.keep_originals)
+    print(f"Migration finished: {result}")
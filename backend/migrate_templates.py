@@ -0,0 +1,79 @@
+"""
+Convert stored biometric templates from JSON-in-Fernet to the binary template format.
+
+Usage:
+    python migrate_templates.py [--batch-size 200] [--dry-run]
+
+Rows that are already binary, or that hold no template (CSV placeholders), are left untouched.
+"""
+import sys
+import os
+import argparse
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app.models import Student
+from app.encryption import BiometricEncryption
+from app.template_codec import decode_template, encode_eye_template, encode_thumb_template, is_binary_template
+
+
+def migrate(batch_size: int = 200, dry_run: bool = False) -> dict:
+    encryptor = BiometricEncryption()
+    counts = {"converted": 0, "already_binary": 0, "skipped": 0, "bytes_before": 0, "bytes_after": 0}
+
+    db = SessionLocal()
+    try:
+        last_id = 0
+        while True:
+            batch = (
+                db.query(Student)
+                .filter(Student.id > last_id)
+                .order_by(Student.id)
+                .limit(batch_size)
+                .all()
+            )
+            if not batch:
+                break
+
+            for student in batch:
+                last_id = student.id
+                try:
+                    eye_raw = encryptor.decrypt_template(student.eye_template)
+                    thumb_raw = encryptor.decrypt_template(student.thumb_template)
+                except Exception:
+                    counts["skipped"] += 1
+                    continue
+
+                if is_binary_template(eye_raw) and is_binary_template(thumb_raw):
+                    counts["already_binary"] += 1
+                    continue
+
+                new_eye = encryptor.encrypt_template(encode_eye_template(decode_template(eye_raw)))
+                new_thumb = encryptor.encrypt_template(encode_thumb_template(decode_template(thumb_raw)))
+
+                counts["bytes_before"] += len(student.eye_template) + len(student.thumb_template)
+                counts["bytes_after"] += len(new_eye) + len(new_thumb)
+                counts["converted"] += 1
+
+                if not dry_run:
+                    student.eye_template = new_eye
+                    student.thumb_template = new_thumb
+
+            if not dry_run:
+                db.commit()
+            print(f"Processed up to student id {last_id}: {counts}")
+    finally:
+        db.close()
+
+    return counts
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate biometric templates to the binary format")
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--dry-run", action="store_true", help="Report sizes without writing")
+    args = parser.parse_args()
+
+    result = migrate(batch_size=args.batch_size, dry_run=args.dry_run)
+    print(f"Migration finished: {result}")
@@ -0,0 +1,30 @@
+"""
+Regenerate the attendance_rollups table (counts per day, hour and status) from the raw
+attendance rows.
+
+Usage:
+    python rebuild_rollups.py [--from 2024-03-01] [--to 2024-03-31]
+
+Without a range the whole rollup is rebuilt. Run it after editing or deleting attendance
+rows by hand; normal inserts keep the rollup up to date in the same transaction.
+"""
+import sys
+import os
+import argparse
+from datetime import date
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app.database import SessionLocal
+from app import attendance_rollup
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the attendance rollup from raw rows")
+    parser.add_argument("--from", dest="start", type=date.fromisoformat, help="First day to rebuild (inclusive)")
+    parser.add_argument("--to", dest="end", type=date.fromisoformat, help="Last day to rebuild (inclusive)")
+    args = parser.parse_args()
+
+    with SessionLocal() as db:
+        buckets = attendance_rollup.rebuild(db, args.start, args.end)
+    print(f"Rollup rebuilt: {buckets} buckets stored")
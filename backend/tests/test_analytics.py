@@ -0,0 +1,71 @@
+import sys
+import os
+from datetime import date, datetime
+from sqlalchemy import event
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import analytics, attendance_rollup
+from app.models import Attendance, Student
+
+
+def seed(db):
+    students = [Student(name=n, registration_number=n, eye_template=b"", thumb_template=b"") for n in "ABC"]
+    db.add_all(students)
+    db.commit()
+    sid = students[0].id
+    stamps = [
+        (datetime(2024, 2, 28, 9, 15), "success"),  # Previous month
+        (datetime(2024, 3, 4, 8, 0), "success"),    # Monday of the current week
+        (datetime(2024, 3, 6, 9, 5), "success"),
+        (datetime(2024, 3, 6, 9, 55), "success"),
+        (datetime(2024, 3, 6, 14, 0), "failed"),
+        (datetime(2024, 3, 6, 23, 59), "success"),
+    ]
+    db.add_all([Attendance(student_id=sid, timestamp=ts, verification_status=status) for ts, status in stamps])
+    db.commit()
+    attendance_rollup.rebuild(db)
+
+
+class CountQueries:
+    def __init__(self, db):
+        self.bind = db.get_bind()
+        self.count = 0
+
+    def _on(self, *args):
+        self.count += 1
+
+    def __enter__(self):
+        event.listen(self.bind, "before_cursor_execute", self._on)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.bind, "before_cursor_execute", self._on)
+
+
+class TestAnalytics:
+    def test_overview_in_one_query(self, db_session):
+        seed(db_session)
+        with CountQueries(db_session) as queries:
+            result = analytics.overview(db_session, date(2024, 3, 6))  # A Wednesday
+        assert queries.count == 1
+        assert result == {"total_students": 3, "attendance_today": 3, "attendance_week": 4, "attendance_month": 4}
+
+    def test_daily_counts_over_a_range(self, db_session):
+        seed(db_session)
+        with CountQueries(db_session) as queries:
+            counts = analytics.daily_counts(db_session, date(2024, 2, 27), date(2024, 3, 6))
+        assert queries.count == 1
+        assert counts == {date(2024, 2, 28): 1, date(2024, 3, 4): 1, date(2024, 3, 6): 3}
+        assert analytics.daily_counts(db_session, date(2024, 3, 6), date(2024, 3, 6), status="failed") == {
+            date(2024, 3, 6): 1
+        }
+
+    def test_hourly_counts(self, db_session):
+        seed(db_session)
+        counts = analytics.hourly_counts(db_session)
+        assert len(counts) == 24
+        assert counts[9] == 3 and counts[8] == 1 and counts[23] == 1 and counts[14] == 0
+        assert analytics.hourly_counts(db_session, date(2024, 3, 1), date(2024, 3, 5))[8] == 1
+        assert sum(analytics.hourly_counts(db_session, date(2024, 3, 1), date(2024, 3, 5))) == 1
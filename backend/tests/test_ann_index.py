@@ -0,0 +1,165 @@
+import sys
+import os
+import time
+import numpy as np
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import ann_index
+from app.ann_index import IVFIndex, EyeAnnService, benchmark
+from app.gallery import BiometricGallery
+
+
+def clustered(size, dim=57, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.random((40, dim))
+    return centers[rng.integers(0, 40, size)] + rng.normal(0, 0.05, (size, dim))
+
+
+class TestIVFIndex:
+    def test_finds_exact_vector(self):
+        vectors = clustered(2000)
+        index = IVFIndex(n_probe=4)
+        index.build(vectors, np.arange(2000) + 100)
+
+        ids, scores = index.search(vectors[321], k=5)
+        assert ids[0] == 421
+        assert scores[0] > 0.999
+
+    def test_incremental_add_and_persistence(self, tmp_path):
+        vectors = clustered(600)
+        index = IVFIndex()
+        index.build(vectors[:500], np.arange(500))
+        index.add(vectors[500:], np.arange(500, 600))
+        assert len(index) == 600
+
+        path = str(tmp_path / "eye.npz")
+        index.save(path)
+        loaded = IVFIndex.load(path)
+        ids, _ = loaded.search(vectors[550], k=1)
+        assert ids.tolist() == [550]
+        # Each writer uses its own temp file, which is renamed away
+        assert os.listdir(tmp_path) == ["eye.npz"]
+
+    def test_remove(self):
+        vectors = clustered(500)
+        index = IVFIndex()
+        index.build(vectors, np.arange(500))
+        index.remove(np.array([7, 8]))
+        assert len(index) == 498
+        ids, _ = index.search(vectors[7], k=5, n_probe=len(index.centroids))
+        assert 7 not in ids.tolist()
+
+    def test_benchmark_reports_recall(self):
+        vectors = clustered(3000, seed=2)
+        index = IVFIndex()
+        index.build(vectors, np.arange(3000))
+        report = benchmark(index, vectors, np.arange(3000), vectors[:20], k=10, n_probe=len(index.centroids))
+        # Probing every list is an exact scan
+        assert report["recall_at_k"] == 1.0
+
+
+def gallery_of(vectors, ids=None):
+    ids = range(1, len(vectors) + 1) if ids is None else ids
+    hist = np.random.default_rng(0).random(256).tolist()
+    thumb = {"feature_vector": np.zeros(1000, dtype=np.uint8), "texture_histogram": hist}
+    return BiometricGallery.from_templates([(int(i), {"feature_vector": v}, thumb) for i, v in zip(ids, vectors)])
+
+
+class TestEyeAnnService:
+    def test_candidates_follow_gallery(self, tmp_path):
+        rng = np.random.default_rng(3)
+        vectors = clustered(300, seed=3)
+
+        def templates(n):
+            hist = rng.random(256).tolist()
+            thumb = {"feature_vector": np.zeros(1000, dtype=np.uint8), "texture_histogram": hist}
+            return [(i + 1, {"feature_vector": vectors[i]}, thumb) for i in range(n)]
+
+        service = EyeAnnService(path=str(tmp_path / "eye.npz"))
+        gallery = BiometricGallery.from_templates(templates(200))
+        rows = service.candidates(gallery, {"feature_vector": vectors[10]}, k=5, n_probe=4)
+        assert gallery.student_ids[rows[0]] == 11
+
+        # New enrollments are added without a rebuild
+        bigger = BiometricGallery.from_templates(templates(300))
+        rows = service.candidates(bigger, {"feature_vector": vectors[250]}, k=5, n_probe=4)
+        assert bigger.student_ids[rows[0]] == 251
+        assert service.stats()["indexed"] == 300
+        assert service.stats()["builds"] == 1
+
+    def test_changed_and_removed_vectors_are_reindexed(self, tmp_path):
+        vectors = clustered(300, seed=4)
+        service = EyeAnnService(path=str(tmp_path / "eye.npz"), persist_delay=60)
+        gallery = gallery_of(vectors[:200])
+        service.sync(gallery)
+
+        # Student 11 re-enrolled with a new scan, student 12 deleted
+        updated = vectors[:200].copy()
+        updated[10] = vectors[250]
+        ids = [i for i in range(1, 201) if i != 12]
+        service.sync(gallery_of(np.delete(updated, 11, axis=0), ids))
+
+        found, _ = service.index.search(vectors[250], k=1, n_probe=len(service.index.centroids))
+        assert found.tolist() == [11]
+        assert 12 not in service.index.ids.tolist()
+        assert service.stats()["updated"] == 1
+        assert service.stats()["removed"] == 1
+        assert service.stats()["builds"] == 1
+
+    def test_index_from_another_gallery_is_rebuilt(self, tmp_path):
+        path = str(tmp_path / "eye.npz")
+        old = EyeAnnService(path=path, persist_delay=60)
+        old.sync(gallery_of(clustered(200, seed=5)))
+        old.persist()
+
+        # Database reset: the same ids now belong to other students
+        vectors = clustered(200, seed=6)
+        service = EyeAnnService(path=path, persist_delay=60)
+        gallery = gallery_of(vectors)
+        rows = service.candidates(gallery, {"feature_vector": vectors[42]}, k=5, n_probe=4)
+        assert gallery.student_ids[rows[0]] == 43
+        assert service.stats()["builds"] == 1
+
+    def test_persist_is_deferred(self, tmp_path):
+        path = tmp_path / "eye.npz"
+        service = EyeAnnService(path=str(path), persist_delay=60)
+        service.sync(gallery_of(clustered(200, seed=7)))
+        # Nothing is written on the verify path
+        assert not path.exists()
+
+        service.persist()
+        assert path.exists()
+        assert len(IVFIndex.load(str(path))) == 200
+        assert service.stats()["persisted"] == 1
+
+    def test_retrain_runs_in_background(self, tmp_path):
+        vectors = clustered(500, seed=8)
+        service = EyeAnnService(path=str(tmp_path / "eye.npz"), persist_delay=60)
+        service.sync(gallery_of(vectors[:200]))
+
+        # Doubling the gallery retrains off the request path; searches use the grown index meanwhile
+        gallery = gallery_of(vectors)
+        rows = service.candidates(gallery, {"feature_vector": vectors[450]}, k=5, n_probe=4)
+        assert gallery.student_ids[rows[0]] == 451
+        deadline = time.time() + 30
+        while service.stats()["builds"] < 2 and time.time() < deadline:
+            time.sleep(0.01)
+
+        assert service.stats()["builds"] == 2
+        assert service.index.trained_size == 500
+        assert len(service.index) == 500
+
+    def test_index_stays_off_persistent_disk(self, monkeypatch, tmp_path):
+        monkeypatch.delenv("ANN_INDEX_PATH", raising=False)
+        monkeypatch.setattr(ann_index, "snapshot_root", lambda: None)
+        service = EyeAnnService(persist_delay=0)
+        assert service.path is None
+        service.sync(gallery_of(clustered(100, seed=9)))
+        service.persist()
+        assert service.stats()["persisted"] == 0
+
+        monkeypatch.setattr(ann_index, "snapshot_root", lambda: str(tmp_path))
+        path = ann_index.default_index_path()
+        assert path.startswith(str(tmp_path)) and path.endswith("eye_ivf.npz")
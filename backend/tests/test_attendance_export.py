@@ -0,0 +1,53 @@
+import sys
+import os
+import io
+import csv
+from datetime import date, datetime, timedelta
+from openpyxl import load_workbook
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import attendance_export
+from app.attendance_export import EXPORT_HEADERS, stream_csv, stream_xlsx
+from app.models import Attendance, Student
+from conftest import TestingSessionLocal
+
+
+def seed(db, count):
+    student = Student(name="Ärne", registration_number="R1", eye_template=b"", thumb_template=b"")
+    db.add(student)
+    db.commit()
+    start = datetime(2024, 3, 1, 9, 0)
+    db.add_all([
+        Attendance(student_id=student.id, timestamp=start + timedelta(hours=i), eye_match_score=0.91,
+                   thumb_match_score=None, verification_status="failed" if i % 4 == 0 else "success")
+        for i in range(count)
+    ])
+    db.commit()
+
+
+class TestAttendanceExport:
+    def test_csv_streams_in_chunks(self, db_session, monkeypatch):
+        monkeypatch.setattr(attendance_export, "EXPORT_FETCH_SIZE", 7)
+        monkeypatch.setattr(attendance_export, "STREAM_CHUNK_BYTES", 256)
+        seed(db_session, 40)
+
+        chunks = list(stream_csv(session_factory=TestingSessionLocal))
+        assert len(chunks) > 1
+        rows = list(csv.reader(io.StringIO(b"".join(chunks).decode("utf-8-sig"))))
+        assert rows[0] == EXPORT_HEADERS
+        assert len(rows) == 41
+        assert rows[1] == ["Ärne", "R1", "2024-03-01 09:00:00", "failed", "0.91", "N/A"]
+
+    def test_xlsx_with_filters(self, db_session):
+        seed(db_session, 40)  # 09:00 on 2024-03-01 onwards, one row per hour
+
+        data = b"".join(stream_xlsx(date_from=date(2024, 3, 1), date_to=date(2024, 3, 1), status="success",
+                                    session_factory=TestingSessionLocal))
+        sheet = load_workbook(io.BytesIO(data), read_only=True)["Attendance"]
+        rows = list(sheet.iter_rows(values_only=True))
+        assert list(rows[0]) == EXPORT_HEADERS
+        # 15 hours left on March 1st, minus the failed ones at i = 0, 4, 8, 12
+        assert len(rows) - 1 == 11
+        assert all(row[3] == "success" and row[2].startswith("2024-03-01") for row in rows[1:])
@@ -0,0 +1,78 @@
+import sys
+import os
+import asyncio
+import pytest
+from datetime import datetime
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Attendance, Student
+from app.attendance_writer import AttendanceWriter
+
+
+def row(student_id, status="success"):
+    return dict(student_id=student_id, timestamp=datetime.utcnow(), eye_match_score=0.9,
+                thumb_match_score=0.9, verification_status=status, verification_method="dual_biometric")
+
+
+@pytest.fixture
+def student(db_session):
+    s = Student(name="A", registration_number="R1", eye_template=b"", thumb_template=b"")
+    db_session.add(s)
+    db_session.commit()
+    return s.id
+
+
+class TestAttendanceWriter:
+    def test_groups_rows_into_one_flush(self, db_session, student):
+        writer = AttendanceWriter(flush_ms=200, batch_size=50)
+        writer.start()
+        bind = db_session.get_bind()
+        futures = [writer.submit(bind, [row(student)]) for _ in range(10)]
+        assert [f.result(timeout=5) for f in futures] == [1] * 10
+        writer.shutdown()
+
+        assert db_session.query(Attendance).count() == 10
+        stats = writer.stats()
+        assert stats["flushes"] == 1 and stats["largest_flush"] == 10
+        assert stats["queue_depth"] == 0 and stats["inline_rows"] == 0
+
+    def test_batch_size_closes_the_window(self, db_session, student):
+        writer = AttendanceWriter(flush_ms=10000, batch_size=3)
+        writer.start()
+        futures = [writer.submit(db_session.get_bind(), [row(student)]) for _ in range(3)]
+        for future in futures:
+            future.result(timeout=5)
+        writer.shutdown()
+        assert writer.stats()["flushes"] == 1
+
+    def test_bad_row_fails_only_its_caller(self, db_session, student):
+        writer = AttendanceWriter(flush_ms=200, batch_size=50)
+        writer.start()
+        bind = db_session.get_bind()
+        good = writer.submit(bind, [row(student)])
+        bad = writer.submit(bind, [row(None, "failed")])  # student_id is NOT NULL
+        assert good.result(timeout=5) == 1
+        with pytest.raises(Exception):
+            bad.result(timeout=5)
+        writer.shutdown()
+        assert db_session.query(Attendance).count() == 1
+        assert writer.stats()["failed_rows"] == 1
+
+    def test_inline_when_disabled_and_record_awaits(self, db_session, student):
+        writer = AttendanceWriter(flush_ms=0)
+        writer.start()
+        asyncio.run(writer.record(db_session.get_bind(), [row(student), row(student)]))
+        assert db_session.query(Attendance).count() == 2
+        assert writer.stats()["inline_rows"] == 2
+
+    def test_shutdown_drains_queue(self, db_session, student):
+        writer = AttendanceWriter(flush_ms=10000, batch_size=1000)
+        writer.start()
+        futures = [writer.submit(db_session.get_bind(), [row(student)]) for _ in range(5)]
+        writer.shutdown()
+        assert all(f.done() for f in futures)
+        assert db_session.query(Attendance).count() == 5
+        # Stopped writers fall back to inline inserts
+        assert writer.submit(db_session.get_bind(), [row(student)]).result() == 1
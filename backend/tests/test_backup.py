@@ -0,0 +1,109 @@
+import sys
+import os
+import io
+import gzip
+import json
+import pytest
+from datetime import datetime, timedelta
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.backup import BACKUP_WATERMARK_MARGIN_SECONDS, iter_ndjson, restore, stream_backup
+from app.database import Base
+from app.models import Attendance, AuditLog, Student
+from conftest import TestingSessionLocal, engine
+
+
+def seed(db):
+    old, new = datetime(2024, 3, 1, 9, 0), datetime(2024, 3, 2, 9, 0)
+    students = [
+        Student(id=1, name="A", registration_number="R1", eye_template=b"\x00\xffeye", thumb_template=b"t",
+                eye_landmarks=[[1, 2]], created_at=old),
+        Student(id=2, name="B", registration_number="R2", eye_template=b"e", thumb_template=b"t", created_at=new),
+    ]
+    db.add_all(students)
+    db.add_all([Attendance(student_id=1, timestamp=old + timedelta(minutes=i), verification_status="success")
+                for i in range(30)])
+    db.add(Attendance(student_id=2, timestamp=new, verification_status="success"))
+    db.add(AuditLog(timestamp=new, action_type="LOGIN", details={"ip": "1.2.3.4"}))
+    db.commit()
+
+
+def lines(data):
+    return [json.loads(line) for line in gzip.decompress(data).splitlines()]
+
+
+def wipe(db):
+    db.close()
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+
+
+class TestBackup:
+    def test_full_round_trip(self, db_session):
+        seed(db_session)
+        data = b"".join(stream_backup(session_factory=TestingSessionLocal, chunk_bytes=256))
+        header, end = lines(data)[0], lines(data)[-1]
+        assert end["rows"] == {"students": 2, "stored_images": 0, "attendance": 31, "audit_logs": 1}
+        # The watermark is taken before any table is read, minus the safety margin
+        assert datetime.fromisoformat(end["watermark"]) == (
+            datetime.fromisoformat(header["until"]) - timedelta(seconds=BACKUP_WATERMARK_MARGIN_SECONDS)
+        )
+
+        wipe(db_session)
+        result = restore(io.BytesIO(data), session_factory=TestingSessionLocal, batch_size=7)
+        assert result == {"students": 2, "stored_images": 0, "attendance": 31, "audit_logs": 1}
+
+        with TestingSessionLocal() as db:
+            student = db.get(Student, 1)
+            assert student.eye_template == b"\x00\xffeye" and student.eye_landmarks == [[1, 2]]
+            assert db.query(Attendance).count() == 31
+            assert db.query(AuditLog).one().details == {"ip": "1.2.3.4"}
+
+    def test_incremental_since_and_overlapping_restore(self, db_session):
+        seed(db_session)
+        full = b"".join(stream_backup(session_factory=TestingSessionLocal))
+        incremental = b"".join(stream_backup(datetime(2024, 3, 2), session_factory=TestingSessionLocal))
+        rows = lines(incremental)
+        assert rows[0]["since"] == "2024-03-02T00:00:00"
+        assert rows[-1]["rows"] == {"students": 1, "stored_images": 0, "attendance": 1, "audit_logs": 1}
+
+        wipe(db_session)
+        restore(io.BytesIO(full), session_factory=TestingSessionLocal)
+        # Rows already restored are skipped
+        assert restore(io.BytesIO(incremental), session_factory=TestingSessionLocal) == {
+            "students": 0, "stored_images": 0, "attendance": 0, "audit_logs": 0
+        }
+
+    def test_rows_created_mid_dump_go_to_the_next_incremental(self, db_session):
+        seed(db_session)
+        dump = []
+        with TestingSessionLocal() as session:
+            for line in iter_ndjson(session):
+                dump.append(json.loads(line))
+                if dump[-1] == {"table": "stored_images"}:
+                    # Students are already dumped when this registration and its check-in commit
+                    db_session.add(Student(id=3, name="C", registration_number="R3", eye_template=b"e",
+                                           thumb_template=b"t"))
+                    db_session.add(Attendance(student_id=3, verification_status="success"))
+                    db_session.commit()
+
+        dumped = [row for row in dump if "registration_number" in row]
+        dumped_attendance = [row for row in dump if "verification_status" in row]
+        assert {row["id"] for row in dumped} == {1, 2}
+        # No attendance row without its student
+        assert {row["student_id"] for row in dumped_attendance} <= {1, 2}
+
+        watermark = datetime.fromisoformat(dump[-1]["watermark"])
+        incremental = lines(b"".join(stream_backup(watermark, session_factory=TestingSessionLocal)))
+        assert any(row.get("registration_number") == "R3" for row in incremental)
+        assert any(row.get("student_id") == 3 for row in incremental)
+
+    def test_truncated_backup_is_rejected(self, db_session):
+        seed(db_session)
+        data = gzip.compress(b"\n".join(gzip.decompress(b"".join(
+            stream_backup(session_factory=TestingSessionLocal))).splitlines()[:-1]) + b"\n")
+        wipe(db_session)
+        with pytest.raises(ValueError, match="truncated"):
+            restore(io.BytesIO(data), session_factory=TestingSessionLocal)
@@ -0,0 +1,72 @@
+import sys
+import os
+import csv
+import zipfile
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import bulk_enrollment
+from app.bulk_enrollment import EnrollmentJob, index_images, run_enrollment
+from app.models import Student
+from app.template_cache import TemplateCache
+from test_template_cache import add_student, encryptor
+
+STORAGE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "biometric_storage"
+)
+EYE = os.path.join(STORAGE, "eye_scans", "123103_amit_eye.jpg")
+THUMB = os.path.join(STORAGE, "thumb_scans", "123103_amit_thumb.jpg")
+
+
+def write_csv(path, rows):
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=["name", "registration_number"])
+        writer.writeheader()
+        writer.writerows({"name": n, "registration_number": r} for n, r in rows)
+
+
+class TestBulkEnrollment:
+    def test_index_images_by_registration_number(self):
+        index = index_images(["a/R1_Amit_K_eye.jpg", "a/R1_Amit_K_thumb.png", "R2_eye.JPG", "notes.jpg"])
+        assert index == {"r1": {"eye": "a/R1_Amit_K_eye.jpg", "thumb": "a/R1_Amit_K_thumb.png"}, "r2": {"eye": "R2_eye.JPG"}}
+
+    def test_enrolls_from_zip_and_resumes(self, db_session, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        cache = TemplateCache(encryptor)
+        monkeypatch.setattr(bulk_enrollment, "template_cache", cache)
+
+        add_student(db_session, "P1")           # CSV placeholder, gets filled
+        add_student(db_session, "E1", seed=1)   # already enrolled, skipped
+
+        archive = tmp_path / "scans.zip"
+        with zipfile.ZipFile(archive, "w") as z:
+            for reg_no in ("N1", "P1", "E1"):
+                z.write(EYE, f"scans/{reg_no}_x_eye.jpg")
+                z.write(THUMB, f"scans/{reg_no}_x_thumb.jpg")
+        write_csv(tmp_path / "students.csv", [("New", "N1"), ("Placeholder", "P1"), ("Done", "E1"), ("Missing", "M1"), ("", "X")])
+
+        job = run_enrollment(
+            EnrollmentJob(str(tmp_path / "students.csv"), str(archive)),
+            session_factory=lambda: db_session, workers=1, chunk_size=1,
+        )
+        progress = job.progress()
+        assert progress["status"] == "completed", progress
+        assert (progress["enrolled"], progress["skipped"], progress["failed"], progress["processed"]) == (2, 1, 2, 5)
+        assert {f["row"] for f in progress["failures"]} == {5, 6}
+
+        filled = db_session.query(Student).filter(Student.registration_number == "P1").one()
+        assert filled.id == 1 and len(filled.eye_template) > 0
+        assert os.path.exists(tmp_path / filled.eye_image_path.lstrip("/"))
+        assert db_session.query(Student).count() == 3
+
+        # Re-running after a crash skips everything already enrolled
+        again = run_enrollment(
+            EnrollmentJob(str(tmp_path / "students.csv"), str(archive)),
+            session_factory=lambda: db_session, workers=1,
+        )
+        assert (again.enrolled, again.skipped) == (0, 3)
+
+        # Enrolled templates are matchable
+        gallery = cache.get_gallery(db_session)
+        assert len(gallery) == 3
@@ -4,6 +4,7 @@ import pytest
 from unittest.mock import MagicMock, patch
 import json
 import asyncio
+import threading
 
 # Adjust path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -62,3 +63,120 @@ class TestCacheService:
             result = asyncio.run(expensive_op())
             assert result == {"cached": True}
             # Function should NOT have been called (hard to test without a spy, but result proves it)
+
+    def test_redis_hit_fills_l1(self):
+        mock_redis = MagicMock()
+        mock_redis.get.return_value = '{"cached": true}'
+
+        with patch('redis.from_url', return_value=mock_redis):
+            service = CacheService()
+
+            @service.cache_response(ttl=60)
+            async def shared():
+                return {"cached": False}
+
+            async def run():
+                return [await shared(), await shared()]
+
+            assert asyncio.run(run()) == [{"cached": True}] * 2
+            # The second lookup is served in-process
+            assert mock_redis.get.call_count == 1
+            stats = service.stats()["prefixes"]["shared"]
+            assert stats["l2_hits"] == 1 and stats["l1_hits"] == 1
+
+    def test_key_binds_positional_args_and_defaults(self):
+        """Positional, keyword and defaulted calls share one entry"""
+        mock_redis = MagicMock()
+        mock_redis.get.return_value = None
+
+        with patch('redis.from_url', return_value=mock_redis):
+            service = CacheService()
+            calls = []
+
+            @service.cache_response(ttl=60)
+            def trend(days=7, db=None):
+                calls.append(days)
+                return {"days": days}
+
+            async def run():
+                return [await trend(7, db=object()), await trend(days=7), await trend(), await trend(days=30)]
+
+            assert asyncio.run(run()) == [{"days": 7}] * 3 + [{"days": 30}]
+            assert calls == [7, 30]
+            assert service.stats()["prefixes"]["trend"]["l1_hits"] == 2
+
+    def test_sync_function_runs_off_the_event_loop(self):
+        with patch('redis.from_url', side_effect=Exception("Connection refused")):
+            service = CacheService()
+            threads = []
+
+            @service.cache_response(ttl=60)
+            def blocking():
+                threads.append(threading.get_ident())
+                return {"ok": True}
+
+            async def run():
+                return threading.get_ident(), await blocking()
+
+            loop_thread, result = asyncio.run(run())
+            assert result == {"ok": True}
+            assert threads and threads[0] != loop_thread
+
+    def test_concurrent_misses_compute_once(self):
+        with patch('redis.from_url', side_effect=Exception("Connection refused")):
+            service = CacheService()
+            calls = []
+
+            @service.cache_response(ttl=60)
+            async def slow(arg):
+                calls.append(arg)
+                await asyncio.sleep(0.05)
+                return {"value": arg}
+
+            async def run():
+                return await asyncio.gather(*(slow("x") for _ in range(10)))
+
+            assert asyncio.run(run()) == [{"value": "x"}] * 10
+            assert calls == ["x"]
+            stats = service.stats()["prefixes"]["slow"]
+            assert stats["misses"] == 1 and stats["coalesced"] == 9
+
+    def test_reconnects_after_backoff(self):
+        mock_redis = MagicMock()
+        mock_redis.get.side_effect = [Exception("Connection reset"), "cached"]
+
+        with patch('redis.from_url', return_value=mock_redis):
+            service = CacheService()
+            assert service.get("key") is None
+            assert service.enabled is False
+            # Inside the backoff window Redis is not touched
+            assert service.get("key") is None
+            assert mock_redis.get.call_count == 1
+
+            service._retry_at = 0  # Backoff elapsed
+            assert service.get("key") == "cached"
+            assert service.enabled is True
+            mock_redis.ping.assert_called_once()
+
+    def test_request_path_is_part_of_the_key(self):
+        from fastapi import FastAPI
+        from fastapi.testclient import TestClient
+
+        with patch('redis.from_url', side_effect=Exception("Connection refused")):
+            service = CacheService()
+            app = FastAPI()
+            calls = []
+
+            @service.cache_response(ttl=60)
+            def handler(days: int = 7):
+                calls.append(days)
+                return {"days": days}
+
+            app.get("/a")(handler)
+            app.get("/b")(handler)
+            client = TestClient(app)
+
+            assert client.get("/a?days=3").json() == {"days": 3}
+            assert client.get("/a?days=3").json() == {"days": 3}
+            assert client.get("/b?days=3").json() == {"days": 3}
+            assert calls == [3, 3]
@@ -0,0 +1,64 @@
+import sys
+import os
+from datetime import datetime, timedelta
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import checkin_index
+from app.checkin_index import RecentCheckins
+from app.models import Attendance, Student
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestRecentCheckins:
+    def test_repeats_inside_window_are_duplicates(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(checkin_index.time, "monotonic", clock)
+        index = RecentCheckins(sweep_interval=10)
+
+        assert index.check_in(1, 60)
+        assert not index.check_in(1, 60)
+        assert index.check_in(2, 60)
+
+        clock.now += 61
+        assert index.check_in(1, 60)
+        assert index.stats()["duplicates"] == 1
+
+        # Expired entries are swept on access
+        clock.now += 120
+        index.check_in(3, 60)
+        assert index.stats()["tracked"] == 1
+
+    def test_disabled_and_forget(self):
+        index = RecentCheckins()
+        assert index.check_in(1, 0) and index.check_in(1, 0)
+        assert index.check_in(2, 60)
+        index.forget(2)
+        assert index.check_in(2, 60)
+
+    def test_rebuild_from_recent_attendance(self, db_session):
+        students = [Student(name=n, registration_number=n, eye_template=b"", thumb_template=b"") for n in "ABC"]
+        db_session.add_all(students)
+        db_session.commit()
+        now = datetime.utcnow()
+        db_session.add_all([
+            Attendance(student_id=students[0].id, timestamp=now - timedelta(seconds=30), verification_status="success"),
+            Attendance(student_id=students[1].id, timestamp=now - timedelta(seconds=600), verification_status="success"),
+            Attendance(student_id=students[2].id, timestamp=now - timedelta(seconds=10), verification_status="failed"),
+        ])
+        db_session.commit()
+
+        index = RecentCheckins()
+        index.rebuild(db_session, 300)
+        assert index.stats()["rebuilt_from_db"] == 1
+        assert not index.check_in(students[0].id, 300)
+        assert index.check_in(students[1].id, 300)
+        assert index.check_in(students[2].id, 300)
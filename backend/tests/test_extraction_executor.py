@@ -0,0 +1,50 @@
+import sys
+import os
+import base64
+import asyncio
+import pytest
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.extraction_executor import ExtractionExecutor
+
+SAMPLE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "biometric_storage", "eye_scans", "123103_amit_eye.jpg"
+)
+
+
+def sample_b64():
+    with open(SAMPLE, "rb") as f:
+        return "data:image/jpeg;base64," + base64.b64encode(f.read()).decode()
+
+
+class TestExtractionExecutor:
+    @pytest.mark.parametrize("workers", [0, 1])
+    def test_extracts_off_loop(self, workers):
+        executor = ExtractionExecutor(workers=workers)
+        try:
+            image = sample_b64()
+            result = asyncio.run(executor.extract(image, image))
+        finally:
+            executor.shutdown()
+
+        assert len(result["eye_features"]["feature_vector"]) == 57
+        assert result["thumb_features"]["keypoints_count"] > 0
+        stats = executor.stats()
+        assert stats["completed"] == 1
+        assert stats["avg_compute_ms"] > 0
+
+    def test_process_pool_is_opt_in(self, monkeypatch):
+        monkeypatch.delenv("EXTRACTION_WORKERS", raising=False)
+        assert ExtractionExecutor().workers == 0
+        monkeypatch.setenv("EXTRACTION_WORKERS", "2")
+        assert ExtractionExecutor().workers == 2
+
+    def test_errors_are_counted(self):
+        executor = ExtractionExecutor(workers=0)
+        with pytest.raises(ValueError):
+            asyncio.run(executor.extract("not-an-image", "not-an-image"))
+        assert executor.stats()["failed"] == 1
+        assert executor.stats()["in_flight"] == 0
@@ -0,0 +1,73 @@
+import sys
+import os
+import threading
+import time
+import pytest
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.extractor_pool import ExtractorPool
+
+
+class FakeExtractor:
+    def __init__(self):
+        self.active = 0
+
+
+class TestExtractorPool:
+    def test_instances_are_never_shared(self):
+        pool = ExtractorPool(size=2, factory=FakeExtractor)
+        errors = []
+
+        def worker():
+            for _ in range(20):
+                with pool.checkout() as extractor:
+                    extractor.active += 1
+                    if extractor.active != 1:
+                        errors.append("shared")
+                    time.sleep(0.001)
+                    extractor.active -= 1
+
+        threads = [threading.Thread(target=worker) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        stats = pool.stats()
+        assert not errors
+        assert stats["created"] == 2
+        assert stats["peak_busy"] == 2
+        assert stats["checkouts"] == 120
+        assert stats["busy"] == 0
+
+    def test_warm_and_timeout(self):
+        pool = ExtractorPool(size=1, factory=FakeExtractor, timeout=0.05)
+        pool.warm()
+        assert pool.stats()["idle"] == 1
+
+        with pool.checkout():
+            with pytest.raises(RuntimeError):
+                with pool.checkout():
+                    pass
+        assert pool.stats()["timeouts"] == 1
+        assert pool.stats()["idle"] == 1
+
+    def test_failed_warm_up_releases_the_slot(self):
+        calls = []
+
+        def flaky():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("model download failed")
+            return FakeExtractor()
+
+        pool = ExtractorPool(size=2, factory=flaky)
+        with pytest.raises(RuntimeError):
+            pool.warm()
+        assert pool.stats()["created"] == 0
+
+        pool.warm()
+        assert pool.stats()["created"] == 2
+        assert pool.stats()["idle"] == 2
@@ -0,0 +1,119 @@
+import sys
+import os
+import cv2
+import numpy as np
+import pytest
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.fingerprint_matcher import FingerprintMatcher, TEMPLATE_DESCRIPTORS, to_descriptors
+
+
+def random_vector(rng, descriptors=31):
+    vec = np.zeros(1000, dtype=np.uint8)
+    vec[:descriptors * 32] = rng.integers(1, 256, descriptors * 32)
+    return vec
+
+
+def synthetic_print(seed, size=320):
+    """Ridge pattern following a smooth random orientation field, with pores"""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size].astype(np.float32)
+    field = cv2.GaussianBlur(rng.normal(0, 1, (size, size)).astype(np.float32), (0, 0), 30)
+    field = field / np.abs(field).max() * np.pi
+    freq = cv2.GaussianBlur(rng.normal(0, 1, (size, size)).astype(np.float32), (0, 0), 20)
+    period = 8 + 2 * freq / np.abs(freq).max()
+    img = np.sin((x * np.cos(field) + y * np.sin(field)) / period * 2 * np.pi) * 90 + 128
+    pores = cv2.GaussianBlur((rng.random((size, size)) > 0.997).astype(np.float32), (0, 0), 2.5)
+    img -= pores / pores.max() * 120
+    return cv2.GaussianBlur(np.clip(img, 0, 255).astype(np.uint8), (0, 0), 1)
+
+
+def recapture(image, angle=0.0, shift=(0, 0), noise=0.0, seed=0):
+    h, w = image.shape
+    matrix = cv2.getRotationMatrix2D((w / 2, h / 2), angle, 1.0)
+    matrix[:, 2] += shift
+    out = cv2.warpAffine(image, matrix, (w, h), borderMode=cv2.BORDER_REFLECT)
+    if noise:
+        out = out + np.random.default_rng(seed).normal(0, noise, out.shape)
+    return np.clip(out, 0, 255).astype(np.uint8)
+
+
+class TestFingerprintMatcher:
+    def test_padding_is_dropped(self):
+        rng = np.random.default_rng(0)
+        desc = to_descriptors(random_vector(rng, descriptors=5))
+        assert desc.shape == (5, 32)
+
+    def test_distances_match_bit_count(self):
+        rng = np.random.default_rng(1)
+        sets = [to_descriptors(random_vector(rng, n)) for n in (31, 12, 3)]
+        matcher = FingerprintMatcher.from_descriptor_sets(sets, batch_size=2)
+        probe = to_descriptors(random_vector(rng, 7))
+
+        dist = matcher.distances(probe, 0, 3)
+        expected = np.unpackbits(sets[1][4] ^ probe[2]).sum()
+        assert dist[1, 4, 2] == expected
+        # Padding slots are out of range
+        assert dist[2, 3:].min() > 256
+
+    def test_same_print_scores_highest(self):
+        rng = np.random.default_rng(2)
+        vectors = [random_vector(rng) for _ in range(300)]
+        matcher = FingerprintMatcher.from_descriptor_sets([to_descriptors(v) for v in vectors], batch_size=64)
+
+        scores = matcher.scores(vectors[123])
+        assert int(np.argmax(scores)) == 123
+        assert scores[123] == 1.0
+        assert np.delete(scores, 123).max() < 0.2
+
+    def test_empty_probe_scores_zero(self):
+        rng = np.random.default_rng(3)
+        matcher = FingerprintMatcher.from_descriptor_sets([to_descriptors(random_vector(rng))])
+        assert matcher.scores(np.zeros(1000, dtype=np.uint8)).tolist() == [0.0]
+
+
+class TestFingerprintCalibration:
+    """Scores of real ORB features against the _is_match thresholds"""
+
+    @pytest.fixture(scope="class")
+    def extractor(self):
+        from app.biometric_extractor import BiometricExtractor
+        features = lambda image: BiometricExtractor._fingerprint_features(None, image)
+        compare = lambda probe, stored: BiometricExtractor.compare_fingerprint_features(None, probe, stored)
+        return features, compare
+
+    def test_template_keeps_more_descriptors(self, extractor):
+        features, _ = extractor
+        stored = features(synthetic_print(0))
+        assert len(stored["feature_vector"]) == TEMPLATE_DESCRIPTORS * 32
+        assert len(to_descriptors(stored["feature_vector"])) == TEMPLATE_DESCRIPTORS
+
+    @pytest.mark.parametrize("capture", [
+        dict(angle=3, noise=8),
+        dict(angle=8),
+        dict(shift=(6, 4)),
+    ])
+    def test_genuine_recapture_passes(self, extractor, capture):
+        from app.biometric_processor import _is_match
+        features, compare = extractor
+        base_threshold = 0.6  # MIN_MATCH_SCORE default
+        for seed in range(4):
+            stored = features(synthetic_print(seed))
+            probe = features(recapture(synthetic_print(seed), seed=seed, **capture))
+            thumb_score = compare(probe, stored)
+            assert thumb_score >= 0.8
+            # Eye just at the base threshold: the thumb threshold alone decides
+            assert _is_match(base_threshold, base_threshold, thumb_score)
+            # Adaptive fallback (strong eye, thumb > 0.6) also holds
+            assert _is_match(base_threshold, 0.95, thumb_score)
+
+    def test_other_print_is_rejected(self, extractor):
+        from app.biometric_processor import _is_match
+        features, compare = extractor
+        stored = features(synthetic_print(0))
+        for seed in range(100, 104):
+            thumb_score = compare(features(synthetic_print(seed)), stored)
+            assert thumb_score < 0.55
+            assert not _is_match(0.6, 0.95, thumb_score)
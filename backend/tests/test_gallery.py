@@ -0,0 +1,116 @@
+import sys
+import os
+import numpy as np
+import pytest
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.gallery import BiometricGallery, CascadeStats
+
+
+def make_eye(rng, length=57):
+    return {"feature_vector": rng.random(length).tolist()}
+
+
+def make_thumb(rng):
+    hist = rng.random(256)
+    return {
+        "feature_vector": rng.integers(0, 256, 1000).tolist(),
+        "texture_histogram": (hist / hist.sum()).tolist(),
+    }
+
+
+class TestBiometricGallery:
+    def test_empty_gallery_has_no_match(self):
+        gallery = BiometricGallery.from_templates([])
+        rng = np.random.default_rng(0)
+        assert len(gallery) == 0
+        assert gallery.best_match(make_eye(rng), make_thumb(rng)) is None
+
+    def test_matches_pairwise_eye_scores(self):
+        """Vectorized eye scores agree with the per-student comparison"""
+        from app.biometric_extractor import BiometricExtractor
+        compare = BiometricExtractor.compare_eye_features
+
+        rng = np.random.default_rng(1)
+        # Mixed lengths exercise the legacy zero-padding path
+        eyes = [make_eye(rng, length) for length in (57, 57, 33, 57)]
+        templates = [(i + 1, eye, make_thumb(rng)) for i, eye in enumerate(eyes)]
+        gallery = BiometricGallery.from_templates(templates)
+
+        probe = make_eye(rng)
+        expected = [compare(None, probe, eye) for eye in eyes]
+        assert np.allclose(gallery.eye_scores(probe), expected, atol=1e-4)
+
+    def test_matches_pairwise_thumb_scores(self):
+        """Vectorized fingerprint scores agree with the per-student comparison"""
+        from app.biometric_extractor import BiometricExtractor
+        compare = BiometricExtractor.compare_fingerprint_features
+
+        rng = np.random.default_rng(3)
+        thumbs = [make_thumb(rng) for _ in range(5)]
+        gallery = BiometricGallery.from_templates([(i, make_eye(rng), t) for i, t in enumerate(thumbs)])
+
+        probe = make_thumb(rng)
+        expected = [compare(None, probe, thumb) for thumb in thumbs]
+        assert np.allclose(gallery.thumb_scores(probe), expected, atol=1e-4)
+
+    def test_identical_capture_wins(self):
+        rng = np.random.default_rng(2)
+        templates = [(i + 10, make_eye(rng), make_thumb(rng)) for i in range(50)]
+        gallery = BiometricGallery.from_templates(templates)
+
+        _, eye, thumb = templates[17]
+        match = gallery.best_match(eye, thumb)
+        assert match.student_id == 27
+        assert match.eye_score == pytest.approx(1.0, abs=1e-4)
+        assert match.total_score == pytest.approx(0.6 * match.eye_score + 0.4 * match.thumb_score)
+
+    def test_cascade_shortlist_matches_full_scan(self):
+        rng = np.random.default_rng(4)
+        templates = [(i, make_eye(rng), make_thumb(rng)) for i in range(200)]
+        gallery = BiometricGallery.from_templates(templates)
+
+        _, eye, thumb = templates[42]
+        full = gallery.best_match(eye, thumb)
+        cascade = gallery.best_match(eye, thumb, top_k=10)
+        assert cascade.student_id == full.student_id == 42
+        assert cascade.total_score == pytest.approx(full.total_score)
+
+    @pytest.mark.parametrize("top_k", [None, 10])
+    def test_batch_matches_single_captures(self, top_k):
+        rng = np.random.default_rng(5)
+        templates = [(i, make_eye(rng), make_thumb(rng)) for i in range(100)]
+        gallery = BiometricGallery.from_templates(templates)
+
+        captures = [(templates[i][1], templates[i][2]) for i in (3, 50, 99)] + [(make_eye(rng), make_thumb(rng))]
+        batch = gallery.best_matches(captures, top_k=top_k)
+        for (eye, thumb), match in zip(captures, batch):
+            single = gallery.best_match(eye, thumb, top_k=top_k)
+            assert match.student_id == single.student_id
+            assert match.total_score == pytest.approx(single.total_score, abs=1e-5)
+        assert [m.student_id for m in batch[:3]] == [3, 50, 99]
+
+        empty = BiometricGallery.from_templates([])
+        assert empty.best_matches(captures) == [None] * 4
+        assert gallery.best_matches([]) == []
+
+    def test_shortlist_is_ranked_by_eye_score(self):
+        gallery = BiometricGallery.from_templates([])
+        scores = np.array([0.1, 0.9, 0.5, 0.7])
+        assert gallery.shortlist(scores, 2).tolist() == [1, 3]
+        assert gallery.shortlist(scores, 10).tolist() == [1, 3, 2, 0]
+
+    def test_cascade_stats_counts_misses(self):
+        rng = np.random.default_rng(5)
+        templates = [(i, make_eye(rng), make_thumb(rng)) for i in range(3)]
+        gallery = BiometricGallery.from_templates(templates)
+        a = gallery.best_match(templates[0][1], templates[0][2])
+        b = gallery.best_match(templates[1][1], templates[1][2])
+
+        stats = CascadeStats()
+        stats.record_audit(a, a)
+        stats.record_audit(a, b)
+        assert stats.stats()["shortlist_misses"] == 1
+        assert stats.stats()["shortlist_miss_rate"] == 0.5
@@ -0,0 +1,62 @@
+import sys
+import os
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.image_http import ImmutableStaticFiles, IMMUTABLE_CACHE_CONTROL
+
+DIGEST = "ab" * 32
+BODY = bytes(range(256)) * 4
+
+
+def client_for(tmp_path):
+    objects = tmp_path / "objects" / "ab" / "ab"
+    objects.mkdir(parents=True)
+    (objects / f"{DIGEST}.jpg").write_bytes(BODY)
+    (tmp_path / "legacy.jpg").write_bytes(b"legacy")
+    app = FastAPI()
+    app.mount("/store", ImmutableStaticFiles(directory=str(tmp_path)))
+    return TestClient(app)
+
+
+class TestImmutableStaticFiles:
+    def test_strong_etag_and_revalidation(self, tmp_path):
+        client = client_for(tmp_path)
+        url = f"/store/objects/ab/ab/{DIGEST}.jpg"
+        response = client.get(url)
+        assert response.status_code == 200 and response.content == BODY
+        assert response.headers["etag"] == f'"{DIGEST}"'
+        assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+        assert response.headers["accept-ranges"] == "bytes"
+
+        assert client.get(url, headers={"If-None-Match": f'W/"{DIGEST}"'}).status_code == 304
+        assert client.get(url, headers={"If-None-Match": '"other"'}).status_code == 200
+
+        legacy = client.get("/store/legacy.jpg")
+        assert legacy.status_code == 200 and "cache-control" not in legacy.headers
+
+    def test_ranges(self, tmp_path):
+        client = client_for(tmp_path)
+        url = f"/store/objects/ab/ab/{DIGEST}.jpg"
+
+        partial = client.get(url, headers={"Range": "bytes=10-19"})
+        assert partial.status_code == 206
+        assert partial.content == BODY[10:20]
+        assert partial.headers["content-range"] == f"bytes 10-19/{len(BODY)}"
+
+        suffix = client.get(url, headers={"Range": "bytes=-100"})
+        assert suffix.status_code == 206 and suffix.content == BODY[-100:]
+
+        tail = client.get(url, headers={"Range": "bytes=1000-"})
+        assert tail.content == BODY[1000:]
+
+        unsatisfiable = client.get(url, headers={"Range": f"bytes={len(BODY)}-"})
+        assert unsatisfiable.status_code == 416
+        assert unsatisfiable.headers["content-range"] == f"bytes */{len(BODY)}"
+
+        # A stale If-Range validator gets the whole file
+        stale = client.get(url, headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+        assert stale.status_code == 200 and stale.content == BODY
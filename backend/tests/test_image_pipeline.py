@@ -0,0 +1,64 @@
+import sys
+import os
+import base64
+import cv2
+import numpy as np
+import pytest
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.image_pipeline import decode, fit, image_size, to_bytes
+from app.biometric_extractor import BiometricExtractor
+
+SAMPLE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "biometric_storage", "eye_scans", "123103_amit_eye.jpg"
+)
+
+
+def jpeg(image):
+    return cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+
+
+class TestImagePipeline:
+    def test_large_capture_decodes_reduced(self):
+        big = np.random.default_rng(0).integers(0, 256, (3000, 4000, 3), dtype=np.uint8)
+        buffer = jpeg(big)
+        assert image_size(buffer) == (4000, 3000)
+
+        image = decode(buffer, 960)
+        assert max(image.shape[:2]) == 960
+        assert image.shape[2] == 3
+
+        # Never upscales
+        assert decode(jpeg(big[:300, :400]), 960).shape[:2] == (300, 400)
+
+    def test_base64_and_bytes_inputs(self):
+        with open(SAMPLE, "rb") as f:
+            raw = f.read()
+        data_url = "data:image/jpeg;base64," + base64.b64encode(raw).decode()
+        assert to_bytes(data_url) == raw
+        assert to_bytes(raw) == raw
+
+        with pytest.raises(ValueError):
+            decode(b"not an image", 960)
+
+    def test_features_stable_across_capture_size(self):
+        extractor = BiometricExtractor()
+        original = cv2.imread(SAMPLE)
+        h, w = original.shape[:2]
+        scale = 4000 / max(h, w)
+        large = cv2.resize(original, (round(w * scale), round(h * scale)), interpolation=cv2.INTER_CUBIC)
+
+        timings = {}
+        small_features = extractor.extract_eye_features(original)
+        large_features = extractor.extract_eye_features(
+            extractor.base64_to_image(jpeg(large)), timings
+        )
+        assert extractor.compare_eye_features(small_features, large_features) > 0.95
+        assert {"eye_resize", "eye_color", "eye_landmarks"} <= set(timings)
+
+    def test_fit_keeps_aspect(self):
+        image = np.zeros((1000, 2000), dtype=np.uint8)
+        assert fit(image, 500).shape == (250, 500)
@@ -0,0 +1,153 @@
+import sys
+import os
+import pytest
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cv2
+import migrate_image_store
+from app.models import Student, StoredImage
+from app.image_store import ImageStore
+from app.image_writer import ImageWriter
+from test_image_writer import capture
+
+
+class TestImageStore:
+    def test_sharded_and_deduplicated(self, db_session, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        store = ImageStore(writer=ImageWriter(codec="original", max_side=0, threads=1))
+        data = capture(64, 48)
+
+        first = store.save(db_session, data, "eye")
+        db_session.commit()
+        store.writer.flush()
+        second = store.save(db_session, data, "eye")
+        other = store.save(db_session, capture(32, 32), "thumb")
+        db_session.commit()
+        store.writer.shutdown()
+
+        digest = first.rsplit("/", 1)[1].split(".")[0]
+        assert first == f"/biometric_storage/objects/{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+        assert second == first and other != first
+        assert os.path.exists(first.lstrip("/"))
+        assert store.stats() == {"root": "biometric_storage", "stored": 2, "deduplicated": 1}
+        assert db_session.get(StoredImage, digest).kind == "eye"
+        assert db_session.query(StoredImage).count() == 2
+
+    def test_failed_registration_leaves_no_row_or_file(self, db_session, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        store = ImageStore(writer=ImageWriter(codec="original", max_side=0, threads=1),
+                           thumbnails=ImageWriter(codec="jpeg", quality=80, max_side=64, threads=1))
+
+        # Manifest rows are part of the caller's transaction; files wait for its commit
+        url = store.save(db_session, capture(64, 48), "eye")
+        assert db_session.query(StoredImage).count() == 1
+        db_session.rollback()
+        store.writer.shutdown()
+        assert db_session.query(StoredImage).count() == 0
+        assert not os.path.exists(url.lstrip("/"))
+
+        # Nothing from the rolled back registration is written by a later commit
+        db_session.commit()
+        assert not os.path.exists("biometric_storage")
+
+        # The retried registration stores it normally
+        assert store.save(db_session, capture(64, 48), "eye") == url
+        db_session.commit()
+        store.writer.shutdown()
+        store.thumbnails.shutdown()
+        assert os.path.exists(url.lstrip("/"))
+        assert db_session.query(StoredImage).count() == 1
+
+    def test_migrates_flat_files(self, db_session, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(migrate_image_store, "SessionLocal", lambda: db_session)
+        os.makedirs("biometric_storage/eye_scans")
+        os.makedirs("biometric_storage/thumb_scans")
+        for path, data in (("eye_scans/R1_eye.jpg", b"eye-1"), ("thumb_scans/R1_thumb.jpg", b"same"),
+                           ("thumb_scans/R2_thumb.jpg", b"same")):
+            with open(f"biometric_storage/{path}", "wb") as f:
+                f.write(data)
+
+        db_session.add_all([
+            Student(name="A", registration_number="R1", eye_template=b"", thumb_template=b"",
+                    eye_image_path="/biometric_storage/eye_scans/R1_eye.jpg",
+                    thumb_image_path="/biometric_storage/thumb_scans/R1_thumb.jpg"),
+            Student(name="B", registration_number="R2", eye_template=b"", thumb_template=b"",
+                    eye_image_path="/biometric_storage/eye_scans/gone.jpg",
+                    thumb_image_path="/biometric_storage/thumb_scans/R2_thumb.jpg"),
+        ])
+        db_session.commit()
+
+        # Batches of one: R2 still points at the shared thumb when R1's batch commits
+        counts = migrate_image_store.migrate(batch_size=1)
+        assert counts == {"moved": 2, "deduplicated": 1, "already_migrated": 0, "missing": 1}
+
+        r1, r2 = db_session.query(Student).order_by(Student.id).all()
+        assert r1.thumb_image_path == r2.thumb_image_path
+        assert "/objects/" in r1.eye_image_path and os.path.exists(r1.eye_image_path.lstrip("/"))
+        assert not os.listdir("biometric_storage/thumb_scans")
+
+        # Re-running is a no-op for migrated rows
+        assert migrate_image_store.migrate()["already_migrated"] == 3
+
+    def test_interrupted_migration_is_repaired_by_rerun(self, db_session, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setattr(migrate_image_store, "SessionLocal", lambda: db_session)
+        os.makedirs("biometric_storage/eye_scans")
+        with open("biometric_storage/eye_scans/shared.jpg", "wb") as f:
+            f.write(b"eye-1")
+        db_session.add_all([
+            Student(name=reg, registration_number=reg, eye_template=b"", thumb_template=b"",
+                    eye_image_path="/biometric_storage/eye_scans/shared.jpg")
+            for reg in ("R1", "R2")
+        ])
+        db_session.commit()
+
+        # Killed after R1's batch committed and R2's object was written, before R2's commit
+        commit = db_session.commit
+        calls = []
+        def interrupted():
+            calls.append(1)
+            if len(calls) == 2:
+                raise KeyboardInterrupt()
+            commit()
+        monkeypatch.setattr(db_session, "commit", interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            migrate_image_store.migrate(batch_size=1)
+        monkeypatch.setattr(db_session, "commit", commit)
+
+        r1, r2 = db_session.query(Student).order_by(Student.id).all()
+        assert "/objects/" in r1.eye_image_path
+        # R2 still points at the original, which must therefore still exist
+        assert r2.eye_image_path == "/biometric_storage/eye_scans/shared.jpg"
+        assert os.path.exists("biometric_storage/eye_scans/shared.jpg")
+
+        counts = migrate_image_store.migrate(batch_size=1)
+        assert counts == {"moved": 0, "deduplicated": 1, "already_migrated": 1, "missing": 0}
+        r1, r2 = db_session.query(Student).order_by(Student.id).all()
+        assert r2.eye_image_path == r1.eye_image_path and os.path.exists(r2.eye_image_path.lstrip("/"))
+        assert not os.listdir("biometric_storage/eye_scans")
+
+    def test_thumbnail_generated_at_save_or_on_demand(self, db_session, tmp_path, monkeypatch):
+        monkeypatch.chdir(tmp_path)
+        thumbnails = ImageWriter(codec="jpeg", quality=80, max_side=64, threads=1)
+        store = ImageStore(writer=ImageWriter(codec="original", max_side=0, threads=1), thumbnails=thumbnails)
+
+        url = store.save(db_session, capture(640, 480), "eye")
+        db_session.commit()
+        store.writer.shutdown()
+        thumbnails.shutdown()
+        digest = store.digest_of(url)
+        path = store.thumbnail_path(digest)
+        assert path == f"biometric_storage/thumbs/64/{digest[:2]}/{digest[2:4]}/{digest}.jpg"
+        assert os.path.exists(path)
+        assert max(cv2.imread(path).shape[:2]) == 64
+
+        os.remove(path)
+        assert store.thumbnail(db_session, digest) == path
+        assert os.path.getsize(path) < os.path.getsize(url.lstrip("/"))
+        assert store.thumbnail_stats()["generated_on_demand"] == 1
+        assert store.thumbnail(db_session, "0" * 64) is None
+        assert store.digest_of("/biometric_storage/eye_scans/R1_eye.jpg") is None
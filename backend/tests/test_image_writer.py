@@ -0,0 +1,62 @@
+import sys
+import os
+import base64
+import cv2
+import numpy as np
+import pytest
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.image_writer import ImageWriter
+
+
+def capture(width=1600, height=1200):
+    image = np.random.default_rng(0).integers(0, 256, (height, width, 3), dtype=np.uint8)
+    image = cv2.GaussianBlur(image, (31, 31), 0)
+    return cv2.imencode(".png", image)[1].tobytes()
+
+
+class TestImageWriter:
+    @pytest.mark.parametrize("codec", ["jpeg", "webp"])
+    def test_background_write_is_compressed_and_durable(self, tmp_path, codec):
+        writer = ImageWriter(codec=codec, quality=80, max_side=800, threads=2)
+        data = capture()
+        paths = [str(tmp_path / "scans" / f"{i}{writer.extension}") for i in range(5)]
+        for path in paths:
+            assert writer.submit(path, data)
+        writer.shutdown()
+
+        for path in paths:
+            image = cv2.imread(path)
+            assert max(image.shape[:2]) == 800
+        assert sorted(os.listdir(tmp_path / "scans")) == sorted(os.path.basename(p) for p in paths)
+        stats = writer.stats()
+        assert stats["written"] == 5 and stats["pending"] == 0
+        assert stats["compression_ratio"] < 1
+
+    def test_original_codec_keeps_upload_bytes(self, tmp_path):
+        writer = ImageWriter(codec="original", max_side=0)
+        data = capture(64, 48)
+        path = str(tmp_path / "a.jpg")
+        writer.write(path, "data:image/png;base64," + base64.b64encode(data).decode())
+        with open(path, "rb") as f:
+            assert f.read() == data
+
+    def test_full_queue_asks_caller_to_write(self, tmp_path):
+        writer = ImageWriter(threads=1, max_queue=1)
+        writer._workers.append(None)  # pretend started, nothing drains the queue
+        assert writer.submit(str(tmp_path / "1.jpg"), b"x")
+        assert not writer.submit(str(tmp_path / "2.jpg"), b"x")
+        assert writer.stats()["inline_writes"] == 1
+
+    def test_failed_write_leaves_no_temp_file(self, tmp_path, monkeypatch):
+        writer = ImageWriter(codec="original", max_side=0)
+
+        def broken_fsync(fd):
+            raise OSError("disk full")
+
+        monkeypatch.setattr(os, "fsync", broken_fsync)
+        with pytest.raises(OSError):
+            writer.write(str(tmp_path / "a.jpg"), capture(64, 48))
+        assert os.listdir(tmp_path) == []
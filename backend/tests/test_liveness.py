@@ -0,0 +1,56 @@
+import sys
+import os
+import base64
+import numpy as np
+import cv2
+from types import SimpleNamespace
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.biometric_extractor import BiometricExtractor, HEAD_POSE_LANDMARKS, HEAD_POSE_MODEL
+from app.extractor_pool import ExtractorPool
+from app.liveness_service import LivenessService
+
+SAMPLE = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))),
+    "biometric_storage", "eye_scans", "123103_amit_eye.jpg"
+)
+
+
+def project_face(pitch, yaw, w=640, h=480):
+    """Synthetic landmarks of the head-pose model rotated by a known pose"""
+    rvec = cv2.Rodrigues(
+        cv2.Rodrigues(np.radians([0.0, yaw, 0.0]))[0] @ cv2.Rodrigues(np.radians([pitch, 0.0, 0.0]))[0]
+    )[0]
+    camera = np.array([[w, 0, w / 2], [0, w, h / 2], [0, 0, 1]], dtype=np.float64)
+    points, _ = cv2.projectPoints(HEAD_POSE_MODEL, rvec, np.array([0.0, 0.0, 1500.0]), camera, np.zeros(4))
+    landmarks = [SimpleNamespace(x=0.0, y=0.0)] * 478
+    for idx, (x, y) in zip(HEAD_POSE_LANDMARKS, points.reshape(-1, 2)):
+        landmarks[idx] = SimpleNamespace(x=x / w, y=y / h)
+    return landmarks
+
+
+class TestHeadPose:
+    def test_recovers_known_pose(self):
+        extractor = BiometricExtractor()
+        for pitch, yaw in [(0, 0), (0, 25), (0, -20), (12, 0)]:
+            p, y, r = extractor.get_head_pose(project_face(pitch, yaw), 640, 480)
+            assert abs(p - pitch) < 0.5
+            assert abs(y - yaw) < 0.5
+            assert abs(r) < 0.5
+
+
+class TestLivenessService:
+    def test_reuses_pooled_engine(self):
+        with open(SAMPLE, "rb") as f:
+            image = base64.b64encode(f.read()).decode()
+        pool = ExtractorPool(size=1)
+        service = LivenessService(pool)
+
+        first = service.verify_liveness(image, "CENTER")
+        second = service.verify_liveness(image, "CENTER")
+        assert "yaw" in first["details"]
+        assert first["details"] == second["details"]
+        assert pool.stats()["created"] == 1
+        assert pool.stats()["checkouts"] == 2
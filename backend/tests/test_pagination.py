@@ -0,0 +1,86 @@
+import sys
+import os
+import pytest
+from datetime import date, datetime, timedelta
+from sqlalchemy.orm import contains_eager
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Attendance, Student
+from app.pagination import day_bounds, decode_cursor, encode_cursor, keyset_page
+
+
+def attendance_query(db):
+    return db.query(Attendance).join(Attendance.student).options(contains_eager(Attendance.student))
+
+
+class TestKeysetPagination:
+    def test_cursor_round_trip(self):
+        stamp = datetime(2024, 3, 1, 8, 30, 15, 123456)
+        assert decode_cursor(encode_cursor(stamp, 42)) == (stamp, 42)
+        with pytest.raises(ValueError):
+            decode_cursor("not-a-cursor")
+
+    def test_pages_cover_every_row_once(self, db_session):
+        student = Student(name="A", registration_number="R1", eye_template=b"", thumb_template=b"")
+        db_session.add(student)
+        db_session.commit()
+        start = datetime(2024, 3, 1, 9, 0)
+        # Several rows share a timestamp, so the id tie-breaker matters
+        db_session.add_all([
+            Attendance(student_id=student.id, timestamp=start + timedelta(minutes=i // 3), verification_status="success")
+            for i in range(25)
+        ])
+        db_session.commit()
+
+        seen, cursor, pages = [], None, 0
+        while True:
+            rows, cursor = keyset_page(attendance_query(db_session), Attendance.timestamp, Attendance.id,
+                                       lambda r: (r.timestamp, r.id), cursor, 10)
+            seen += [(r.timestamp, r.id) for r in rows]
+            pages += 1
+            assert all(r.student.name == "A" for r in rows)
+            if cursor is None:
+                break
+        assert pages == 3
+        assert len(seen) == 25 and len(set(seen)) == 25
+        assert seen == sorted(seen, reverse=True)
+
+    def test_day_bounds_cover_whole_days(self, db_session):
+        student = Student(name="A", registration_number="R1", eye_template=b"", thumb_template=b"")
+        db_session.add(student)
+        db_session.commit()
+        for stamp, status in ((datetime(2024, 3, 1, 23, 59), "success"), (datetime(2024, 3, 2, 0, 0), "success"),
+                              (datetime(2024, 3, 1, 10, 0), "failed")):
+            db_session.add(Attendance(student_id=student.id, timestamp=stamp, verification_status=status))
+        db_session.commit()
+
+        start, end = day_bounds(date(2024, 3, 1), date(2024, 3, 1))
+        query = attendance_query(db_session).filter(
+            Attendance.timestamp >= start, Attendance.timestamp < end, Attendance.verification_status == "success"
+        )
+        rows, cursor = keyset_page(query, Attendance.timestamp, Attendance.id, lambda r: (r.timestamp, r.id), None, 10)
+        assert [r.timestamp for r in rows] == [datetime(2024, 3, 1, 23, 59)] and cursor is None
+
+    def test_unpaginated_without_limit_or_cursor(self, db_session):
+        from app.pagination import DEFAULT_PAGE_SIZE, page_size
+        student = Student(name="A", registration_number="R1", eye_template=b"", thumb_template=b"")
+        db_session.add(student)
+        db_session.commit()
+        start = datetime(2024, 3, 1, 9, 0)
+        db_session.add_all([
+            Attendance(student_id=student.id, timestamp=start + timedelta(minutes=i), verification_status="success")
+            for i in range(DEFAULT_PAGE_SIZE + 5)
+        ])
+        db_session.commit()
+
+        # The admin UI sends neither and filters client-side: it must see every row
+        assert page_size(None, None) is None
+        rows, cursor = keyset_page(attendance_query(db_session), Attendance.timestamp, Attendance.id,
+                                   lambda r: (r.timestamp, r.id), None, page_size(None, None))
+        assert len(rows) == DEFAULT_PAGE_SIZE + 5 and cursor is None
+
+        # A cursor alone pages with the default size
+        assert page_size("abc", None) == DEFAULT_PAGE_SIZE
+        assert page_size(None, 20) == 20
@@ -0,0 +1,186 @@
+import sys
+import os
+import json
+import numpy as np
+import pytest
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models import Student
+from app.encryption import BiometricEncryption
+from app.template_cache import TemplateCache
+from app.gallery_snapshot import GallerySnapshotStore
+
+encryptor = BiometricEncryption()
+
+
+def make_features(seed):
+    rng = np.random.default_rng(seed)
+    eye = {"feature_vector": rng.random(57).tolist()}
+    thumb = {
+        "feature_vector": rng.integers(0, 256, 1000).tolist(),
+        "texture_histogram": rng.random(256).tolist(),
+    }
+    return eye, thumb
+
+
+def add_student(db, reg_no, seed=None):
+    if seed is None:
+        eye_blob, thumb_blob = b'', b''  # CSV placeholder row
+    else:
+        eye, thumb = make_features(seed)
+        eye_blob = encryptor.encrypt_template(json.dumps(eye).encode())
+        thumb_blob = encryptor.encrypt_template(json.dumps(thumb).encode())
+    student = Student(name=reg_no, registration_number=reg_no, eye_template=eye_blob, thumb_template=thumb_blob)
+    db.add(student)
+    db.commit()
+    return student
+
+
+class TestTemplateCache:
+    def test_lazy_load_then_hits(self, db_session):
+        add_student(db_session, "A1", seed=1)
+        add_student(db_session, "A2", seed=2)
+        add_student(db_session, "A3")  # placeholder is skipped
+
+        cache = TemplateCache(encryptor)
+        gallery = cache.get_gallery(db_session)
+        assert len(gallery) == 2
+        assert cache.get_gallery(db_session) is gallery
+
+        stats = cache.stats()
+        assert stats["misses"] == 1
+        assert stats["hits"] == 1
+        assert stats["rows_decoded"] == 2
+        assert stats["unreadable_rows"] == 1
+        assert stats["memory_bytes"] > 0
+
+    def test_picks_up_rows_added_elsewhere(self, db_session):
+        add_student(db_session, "B1", seed=1)
+        cache = TemplateCache(encryptor)
+        assert len(cache.get_gallery(db_session)) == 1
+
+        # Row written by another worker / process
+        add_student(db_session, "B2", seed=2)
+        assert len(cache.get_gallery(db_session)) == 2
+        assert cache.stats()["rows_decoded"] == 2
+
+    def test_lower_id_committed_late_is_picked_up(self, db_session):
+        add_student(db_session, "L1", seed=1)
+        late = add_student(db_session, "L2", seed=2)
+        add_student(db_session, "L3", seed=3)
+        late_id = late.id
+        db_session.delete(late)
+        db_session.commit()
+
+        cache = TemplateCache(encryptor)
+        assert len(cache.get_gallery(db_session)) == 2
+
+        # A transaction that took its id earlier commits after a higher id
+        eye, thumb = make_features(2)
+        db_session.add(Student(id=late_id, name="L2", registration_number="L2",
+                               eye_template=encryptor.encrypt_template(json.dumps(eye).encode()),
+                               thumb_template=encryptor.encrypt_template(json.dumps(thumb).encode())))
+        db_session.commit()
+        gallery = cache.get_gallery(db_session)
+        assert late_id in gallery.student_ids.tolist()
+        assert len(gallery) == 3
+
+    def test_deleted_rows_are_dropped(self, db_session):
+        first = add_student(db_session, "D1", seed=1)
+        add_student(db_session, "D2", seed=2)
+        cache = TemplateCache(encryptor)
+        assert len(cache.get_gallery(db_session)) == 2
+
+        first_id = first.id
+        db_session.delete(first)
+        db_session.commit()
+        gallery = cache.get_gallery(db_session)
+        assert gallery.student_ids.tolist() == [first_id + 1]
+        assert cache.get_gallery(db_session) is gallery
+
+    def test_placeholder_is_reported_once(self, db_session, caplog):
+        add_student(db_session, "P1")
+        cache = TemplateCache(encryptor)
+        with caplog.at_level("WARNING", logger="app.template_cache"):
+            cache.get_gallery(db_session)
+            add_student(db_session, "P2", seed=2)
+            cache.refresh(db_session, [s.id for s in db_session.query(Student)])
+            cache.get_gallery(db_session)
+        assert len([r for r in caplog.records if "Cannot load templates" in r.getMessage()]) == 1
+        assert cache.stats()["unreadable_rows"] == 1
+
+    def test_put_replaces_templates(self, db_session):
+        student = add_student(db_session, "C1", seed=1)
+        cache = TemplateCache(encryptor)
+        cache.get_gallery(db_session)
+
+        eye, thumb = make_features(99)
+        cache.put(student.id, eye, thumb)
+        match = cache.get_gallery(db_session).best_match(eye, thumb)
+        assert match.student_id == student.id
+        assert match.eye_score > 0.99
+
+
+class TestGallerySnapshots:
+    def test_second_worker_maps_published_generation(self, db_session, tmp_path):
+        add_student(db_session, "D1", seed=1)
+        add_student(db_session, "D2", seed=2)
+        add_student(db_session, "D3")
+
+        first = TemplateCache(encryptor, snapshots=GallerySnapshotStore("sqlite://", root=str(tmp_path)))
+        assert len(first.get_gallery(db_session)) == 2
+        assert first.stats()["snapshot"]["generation"] == 1
+
+        # A fresh worker maps the snapshot instead of decrypting every row
+        second = TemplateCache(encryptor, snapshots=GallerySnapshotStore("sqlite://", root=str(tmp_path)))
+        gallery = second.get_gallery(db_session)
+        assert len(gallery) == 2
+        assert second.rows_decoded == 0
+        assert second.stats()["unreadable_rows"] == 1
+        assert isinstance(gallery.eye_matrix, np.memmap)
+
+        eye, thumb = make_features(2)
+        assert gallery.best_match(eye, thumb).student_id == 2
+
+    def test_newer_generation_is_swapped_in(self, db_session, tmp_path):
+        add_student(db_session, "E1", seed=1)
+        store_a = GallerySnapshotStore("sqlite://", root=str(tmp_path))
+        store_b = GallerySnapshotStore("sqlite://", root=str(tmp_path))
+        worker_a = TemplateCache(encryptor, snapshots=store_a)
+        worker_b = TemplateCache(encryptor, snapshots=store_b)
+        worker_a.get_gallery(db_session)
+        worker_b.get_gallery(db_session)
+
+        # Worker A enrolls and publishes; worker B swaps generations without decoding
+        student = add_student(db_session, "E2", seed=2)
+        eye, thumb = make_features(2)
+        worker_a.put(student.id, eye, thumb)
+        worker_a._publish_now()
+
+        assert len(worker_b.get_gallery(db_session)) == 2
+        assert worker_b.rows_decoded == 0
+        assert worker_b.stats()["snapshot_generation"] == 2
+
+    def test_snapshots_only_on_tmpfs_or_explicit_dir(self, monkeypatch, tmp_path):
+        from app import gallery_snapshot, template_cache
+        monkeypatch.delenv("GALLERY_SNAPSHOT_DIR", raising=False)
+
+        # Decrypted templates must not land on persistent disk by default
+        monkeypatch.setattr(gallery_snapshot, "_is_tmpfs", lambda path: False)
+        assert gallery_snapshot.snapshot_root() is None
+        assert template_cache._snapshot_store() is None
+
+        monkeypatch.setenv("GALLERY_SNAPSHOT_DIR", str(tmp_path))
+        assert gallery_snapshot.snapshot_root() == str(tmp_path)
+        assert template_cache._snapshot_store() is not None
+
+    def test_snapshots_off_without_fcntl(self, monkeypatch, tmp_path):
+        from app import gallery_snapshot, template_cache
+        monkeypatch.setattr(gallery_snapshot, "fcntl", None)
+        monkeypatch.setenv("GALLERY_SNAPSHOT_DIR", str(tmp_path))
+        assert gallery_snapshot.snapshot_root() is None
+        assert template_cache._snapshot_store() is None
+        with pytest.raises(RuntimeError):
+            GallerySnapshotStore("sqlite://", root=str(tmp_path))
@@ -0,0 +1,53 @@
+import sys
+import os
+import json
+import numpy as np
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.template_codec import decode_template, encode_eye_template, encode_thumb_template, is_binary_template
+
+
+def make_features():
+    rng = np.random.default_rng(7)
+    eye = {
+        "feature_vector": rng.random(57).tolist(),
+        "landmarks": {"left_center": [0.4, 0.5], "right_center": [0.6, 0.5]},
+        "quality_score": 0.95,
+    }
+    thumb = {
+        "feature_vector": rng.integers(0, 256, 1000).tolist(),
+        "texture_histogram": rng.random(256).tolist(),
+        "keypoints_count": 312,
+    }
+    return eye, thumb
+
+
+class TestTemplateCodec:
+    def test_eye_round_trip(self):
+        eye, _ = make_features()
+        blob = encode_eye_template(eye)
+        assert is_binary_template(blob)
+
+        decoded = decode_template(blob)
+        assert decoded["feature_vector"].dtype == np.float32
+        assert np.allclose(decoded["feature_vector"], eye["feature_vector"], atol=1e-6)
+        assert np.allclose(decoded["landmarks"]["right_center"], [0.6, 0.5])
+        assert abs(decoded["quality_score"] - 0.95) < 1e-6
+
+    def test_thumb_round_trip_is_compact(self):
+        _, thumb = make_features()
+        blob = encode_thumb_template(thumb)
+
+        decoded = decode_template(blob)
+        assert decoded["feature_vector"].dtype == np.uint8
+        assert decoded["feature_vector"].tolist() == thumb["feature_vector"]
+        assert decoded["keypoints_count"] == 312
+        # 1000 bytes of ORB + 256 float32 bins + headers
+        assert len(blob) < 2100 < len(json.dumps(thumb))
+
+    def test_reads_legacy_json(self):
+        eye, _ = make_features()
+        decoded = decode_template(json.dumps(eye).encode())
+        assert decoded == eye
@@ -0,0 +1,71 @@
+import sys
+import os
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.uploads import read_capture_pair
+
+app = FastAPI()
+
+
+@app.post("/echo")
+async def echo(request: Request):
+    eye, thumb, fields = await read_capture_pair(request, max_bytes=1024)
+    return {"eye": eye.decode(), "thumb": thumb.decode(), "fields": fields}
+
+
+client = TestClient(app)
+
+
+class TestReadCapturePair:
+    def test_multipart(self):
+        response = client.post(
+            "/echo",
+            files={"eye_image": ("eye.jpg", b"EYE", "image/jpeg"), "thumb_image": ("thumb.jpg", b"THUMB", "image/jpeg")},
+            data={"name": "Amit", "registration_number": "R1"},
+        )
+        assert response.status_code == 200
+        assert response.json() == {
+            "eye": "EYE", "thumb": "THUMB", "fields": {"name": "Amit", "registration_number": "R1"}
+        }
+
+    def test_binary_body(self):
+        response = client.post(
+            "/echo?name=Amit",
+            content=b"EYETHUMB",
+            headers={"Content-Type": "application/octet-stream", "X-Eye-Length": "3"},
+        )
+        assert response.json() == {"eye": "EYE", "thumb": "THUMB", "fields": {"name": "Amit"}}
+
+    def test_missing_part_and_bad_split(self):
+        response = client.post("/echo", files={"eye_image": ("eye.jpg", b"EYE", "image/jpeg")})
+        assert response.status_code == 400
+        response = client.post(
+            "/echo", content=b"EYE", headers={"Content-Type": "application/octet-stream", "X-Eye-Length": "3"}
+        )
+        assert response.status_code == 400
+
+    def test_oversized_upload_is_rejected(self):
+        big = b"x" * 2048
+        response = client.post(
+            "/echo",
+            files={"eye_image": ("eye.jpg", big, "image/jpeg"), "thumb_image": ("thumb.jpg", b"T", "image/jpeg")},
+        )
+        assert response.status_code == 413
+
+        def chunks():
+            for _ in range(4):
+                yield b"x" * 512
+
+        # Chunked transfer without Content-Length is cut off while streaming
+        response = client.post(
+            "/echo", content=chunks(), headers={"Content-Type": "application/octet-stream", "X-Eye-Length": "1"}
+        )
+        assert response.status_code == 413
+
+    def test_unsupported_content_type(self):
+        response = client.post("/echo", json={"eye_image": "..."})
+        assert response.status_code == 415
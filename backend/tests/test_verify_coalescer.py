@@ -0,0 +1,46 @@
+import sys
+import os
+import asyncio
+import pytest
+
+# Adjust path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.verify_coalescer import VerifyCoalescer
+
+
+class TestVerifyCoalescer:
+    def test_concurrent_calls_share_a_batch(self):
+        batches = []
+
+        def handler(captures):
+            batches.append(len(captures))
+            return [eye["id"] * 10 for eye, _ in captures]
+
+        coalescer = VerifyCoalescer(handler)
+
+        async def run():
+            return await asyncio.gather(*(coalescer.submit({"id": i}, {}, window_ms=20) for i in range(5)))
+
+        assert asyncio.run(run()) == [0, 10, 20, 30, 40]
+        assert batches == [5]
+        assert coalescer.stats()["avg_batch_size"] == 5
+
+    def test_full_batch_flushes_early_and_errors_propagate(self):
+        def handler(captures):
+            if any(eye.get("fail") for eye, _ in captures):
+                raise ValueError("boom")
+            return [True] * len(captures)
+
+        coalescer = VerifyCoalescer(handler, max_batch=2)
+
+        async def run():
+            ok = await asyncio.wait_for(
+                asyncio.gather(coalescer.submit({}, {}, 10_000), coalescer.submit({}, {}, 10_000)), timeout=2
+            )
+            with pytest.raises(ValueError):
+                await coalescer.submit({"fail": True}, {}, 1)
+            return ok
+
+        assert asyncio.run(run()) == [True, True]
+        assert coalescer.stats()["batches"] == 2